@@ -1,27 +1,25 @@
 import logging
 from telegram.ext import ApplicationBuilder, CommandHandler
-from os.path import join, dirname, abspath
-import json
 
-from bot.commands import start, competitions, matches, routes, help
+from bot.commands import start, competitions, matches, routes, cancel, help
+from interfaces.config import load_config
 
 
-ROOT_DIR = join(dirname(abspath(__file__)), '../..')
-
-with open(join(ROOT_DIR, 'etc/config.json'), 'r') as f:
-    config = json.load(f)
-TOKEN = config['telegram']['token']
+TOKEN = load_config()['telegram']['token']
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO)
 
-application = ApplicationBuilder().token(TOKEN).build()
+# the heavy commands run in bot.commands.WORKERS, so updates are handled concurrently and cheap ones are not queued
+# behind them
+application = ApplicationBuilder().token(TOKEN).concurrent_updates(True).build()
 
 application.add_handler(CommandHandler('start', start))
 application.add_handler(CommandHandler('help', help))
 application.add_handler(CommandHandler('competitions', competitions))
 application.add_handler(CommandHandler('matches', matches))
 application.add_handler(CommandHandler('routes', routes))
+application.add_handler(CommandHandler('cancel', cancel))
 
 application.run_polling()
@@ -1,12 +1,14 @@
+from contextlib import aclosing
 import logging
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
 from interfaces.database import MongoDBDatabaseProxy
-from matchday import Matchday
+from matchday import MatchdayCache
 
 from .parsers import *
+from .workers import WorkerPool, WorkerPoolBusy, ChatBusy
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -15,35 +17,60 @@ logging.basicConfig(
 
 DB_PROXY = MongoDBDatabaseProxy()
 SEASON = 'TEMPORADA 2022-2023'
+WORKERS = WorkerPool()
+# the matchdays are shared by every chat, which only keeps the date it asked for in its user_data
+MATCHDAYS = MatchdayCache()
 
-def send_markdown_message(func: callable):
-    """ Sends a message containing the return of func.
+def send_markdown_message(func: callable = None, offload: bool | callable = False):
+    """ Sends a message containing every string yielded by func.
+
+    With offload, the steps of func run in WORKERS instead of the event loop, so that heavy commands do not delay the
+    commands of the other chats. offload can also be a function of the update and the context, which tells whether
+    this call is heavy.
     """
+    if func is None:
+        return lambda func: send_markdown_message(func, offload)
+
+    async def send(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=text,
+            parse_mode=ParseMode.MARKDOWN)
+
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            message = func(update, context)
-            for m in message:
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=m,
-                    parse_mode=ParseMode.MARKDOWN)
+            if offload(update, context) if callable(offload) else offload:
+                async with aclosing(WORKERS.run(update.effective_chat.id, func(update, context))) as messages:
+                    async for m in messages:
+                        await send(update, context, m)
+            else:
+                for m in func(update, context):
+                    await send(update, context, m)
         except NotImplementedError:
-            await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text="""🚧 Aquesta funció encara no està implementada. 🚧""",
-                parse_mode=ParseMode.MARKDOWN)
+            await send(update, context, """🚧 Aquesta funció encara no està implementada. 🚧""")
+        except ChatBusy:
+            await send(update, context, """⏳ Encara estic treballant en la teva última petició. Espera que acabi o escriu /cancel per cancel·lar-la.""")
+        except WorkerPoolBusy:
+            await send(update, context, """🚦 Ara mateix tinc massa feina. Torna-ho a provar d'aquí a una estona.""")
     return wrapper
 
 
-@send_markdown_message
+def chat_matchday_not_cached(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """ Whether the matchday of the chat has to be built or checked against the crawl states before answering """
+    return MATCHDAYS.get_cached(context.user_data['date'], season=SEASON) is None
+
+def chat_matchday(context: ContextTypes.DEFAULT_TYPE):
+    return MATCHDAYS.get_cached(context.user_data['date'], season=SEASON) or MATCHDAYS.get(context.user_data['date'], season=SEASON)
+
+
+@send_markdown_message(offload=True)
 def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.args:
         message = str(' '.join(context.args))
         try:
             context.user_data['date'] = parse_date(message)
             yield f"""Espera mentres busco els partits de futbol del dia {context.user_data['date'].date()}... ⏳"""
-            context.user_data['matchday'] = Matchday(date=context.user_data['date'])
-            if not context.user_data['matchday'].matches:
+            if not len(MATCHDAYS.get(context.user_data['date'], season=SEASON).table):
                 yield f"""❌ No he trobat cap partit de futbol per al dia {context.user_data['date'].date()}."""
             else:
                 yield f"""🔎 Ja tinc tota la informació que necessito, que vols saber?"""
@@ -63,11 +90,12 @@ Per començar, només has de dir-me quin dia tens pensat fer scouting. 📅
 
 Si no saps com fer-ho, pots escriure /help i t'ajudo."""
 
-@send_markdown_message
+# a matchday that is already cached is answered on the event loop, without waiting behind the heavy commands
+@send_markdown_message(offload=chat_matchday_not_cached)
 def competitions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     competitions_msg = f"""🏆 *Competicions* disponibles per al dia {context.user_data['date'].date()}:"""
     competitions_msg += "\n\n"
-    for competition, v in context.user_data['matchday'].competitions.items():
+    for competition, v in chat_matchday(context).competitions.items():
         n_matches = v['matches']
         matchdays = list(v['matchday'])
 
@@ -76,14 +104,14 @@ def competitions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     yield competitions_msg
 
-@send_markdown_message
+@send_markdown_message(offload=chat_matchday_not_cached)
 def matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    matches = context.user_data['matchday'].matches
-    competitions = context.user_data['matchday'].competitions.keys()
+    matchday = chat_matchday(context)
+    competitions = matchday.competitions.keys()
     for competition in competitions:
         message = f"""🏆 **{competition}**"""
         message += "\n\n"
-        for match in filter(lambda m: m.competition == competition, matches):
+        for match in matchday.competition_matches(competition):
             if not match.finished:
                 day = str(match.timestamp.day)
                 month = str(match.timestamp.month)
@@ -97,9 +125,10 @@ def matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
             message += match_markdown + "\n"
         yield message
 
-@send_markdown_message
+@send_markdown_message(offload=True)
 def routes(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    routes = context.user_data['matchday'].routes()
+    yield """🗺 Buscant les millors rutes... ⏳"""
+    routes = MATCHDAYS.get(context.user_data['date'], season=SEASON).routes()
     for i, route in enumerate(routes):
         route_markdown = f"""📍🗺 _Ruta {i+1}:_"""
         route_markdown += "\n\n"
@@ -112,6 +141,13 @@ def routes(update: Update, context: ContextTypes.DEFAULT_TYPE):
             route_markdown += match_markdown + "\n"
         yield route_markdown
 
+@send_markdown_message
+def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if WORKERS.cancel(update.effective_chat.id):
+        yield """🛑 He cancel·lat la teva última petició."""
+    else:
+        yield """🤷 No tens cap petició en curs."""
+
 @send_markdown_message
 def help(update: Update, context: ContextTypes.DEFAULT_TYPE):
     yield """
@@ -122,5 +158,6 @@ def help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /competitions - Mostra les competicions disponibles 🏆
 /matches - Mostra els partits d'un dia concret ⚽🆚
 /routes - Ajuda a trobar la millor ruta per arribar al partit 📍🗺
+/cancel - Cancel·la la petició en curs 🛑
 /feedback - Per enviar comentaris o suggeriments al meu equip de desenvolupament 👨‍💻
 """
@@ -0,0 +1,79 @@
+from contextlib import aclosing
+from time import perf_counter, sleep
+import asyncio
+import pytest
+
+from bot.workers import WorkerPool, WorkerPoolBusy, ChatBusy
+
+
+def slow_command(steps: int, seconds: float, closed: list):
+    try:
+        for i in range(steps):
+            sleep(seconds)
+            yield f'step {i}'
+    finally:
+        closed.append(True)
+
+
+async def collect(pool: WorkerPool, chat_id: int, generator) -> list[str]:
+    async with aclosing(pool.run(chat_id, generator)) as messages:
+        return [message async for message in messages]
+
+
+def test_heavy_jobs_do_not_block_the_event_loop():
+    async def main():
+        pool = WorkerPool(max_workers=2, max_queued=2)
+        jobs = [asyncio.create_task(collect(pool, chat_id, slow_command(2, 0.2, []))) for chat_id in range(4)]
+
+        latencies = []
+        for _ in range(10):
+            started_at = perf_counter()
+            await asyncio.sleep(0.01)
+            latencies.append(perf_counter() - started_at - 0.01)
+        messages = await asyncio.gather(*jobs)
+        pool.shutdown()
+        return latencies, messages
+
+    latencies, messages = asyncio.run(main())
+    assert max(latencies) < 0.1
+    assert messages[0] == ['step 0', 'step 1']
+    # the last two jobs waited for a worker
+    assert messages[3][0].startswith('⏳') and messages[3][1:] == ['step 0', 'step 1']
+
+
+def test_queue_limits_and_one_job_per_chat():
+    async def main():
+        pool = WorkerPool(max_workers=1, max_queued=1)
+        first = asyncio.create_task(collect(pool, 1, slow_command(1, 0.2, [])))
+        second = asyncio.create_task(collect(pool, 2, slow_command(1, 0.2, [])))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(ChatBusy):
+            await collect(pool, 1, slow_command(1, 0.0, []))
+        with pytest.raises(WorkerPoolBusy):
+            await collect(pool, 3, slow_command(1, 0.0, []))
+        await asyncio.gather(first, second)
+        assert await collect(pool, 3, slow_command(1, 0.0, [])) == ['step 0']
+        pool.shutdown()
+
+    asyncio.run(main())
+
+
+def test_cancel_stops_the_job_after_the_running_step():
+    async def main():
+        pool = WorkerPool(max_workers=1)
+        closed = []
+        job = asyncio.create_task(collect(pool, 1, slow_command(5, 0.1, closed)))
+        await asyncio.sleep(0.15)
+
+        assert pool.cancel(1)
+        assert not pool.cancel(2)
+        messages = await job
+        await asyncio.sleep(0.1)
+        pool.shutdown()
+        return messages, closed, pool.active_jobs
+
+    messages, closed, active_jobs = asyncio.run(main())
+    assert messages == ['step 0']
+    assert closed == [True]
+    assert active_jobs == 0
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Generator
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class WorkerPoolBusy(Exception):
+    """Raised when the pool already has as many jobs as it can queue."""
+    pass
+
+class ChatBusy(Exception):
+    """Raised when the chat already has a job in the pool."""
+    pass
+
+
+@dataclass
+class Job:
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    waiting: asyncio.Future | None = None
+
+
+class WorkerPool:
+    """Bounded thread pool that runs the steps of the heavy command generators, so that the event loop only sends
+    messages and the cheap commands of every chat are answered while routes are being planned.
+
+    Every chat can have one job at a time, and at most max_workers jobs run while max_queued more wait for a worker.
+    A job runs its generator one step at a time in a worker, which makes it cancellable between steps: the step that
+    is running when the job is cancelled finishes in its worker, but its message is dropped and the generator closed.
+    """
+
+    MAX_WORKERS = 4
+    MAX_QUEUED = 16
+
+    def __init__(self, max_workers: int | None = None, max_queued: int | None = None):
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.max_queued = self.MAX_QUEUED if max_queued is None else max_queued
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='bot-worker')
+        self.jobs: dict[int, Job] = {}
+        self.active_jobs = 0
+        self.lock = threading.Lock()
+
+    async def run(self, chat_id: int, generator: Generator[str, None, None]) -> AsyncIterator[str]:
+        """Yields the messages of generator, running its steps in the pool. A message is yielded first if the job has
+        to wait for a worker."""
+
+        if chat_id in self.jobs:
+            generator.close()
+            raise ChatBusy()
+        with self.lock:
+            if self.active_jobs >= self.max_workers + self.max_queued:
+                generator.close()
+                raise WorkerPoolBusy()
+            jobs_ahead = self.active_jobs - self.max_workers + 1
+            self.active_jobs += 1
+
+        job = self.jobs[chat_id] = Job()
+        step = None
+        try:
+            if jobs_ahead > 0:
+                yield f"""⏳ Hi ha {jobs_ahead} petici{'ó' if jobs_ahead == 1 else 'ons'} per davant de la teva, de seguida hi som."""
+            while not job.cancelled.is_set():
+                step = self.executor.submit(next, generator, _DONE)
+                job.waiting = asyncio.wrap_future(step)
+                message = await job.waiting
+                if message is _DONE:
+                    break
+                yield message
+        except asyncio.CancelledError:
+            if not job.cancelled.is_set():
+                raise
+        finally:
+            del self.jobs[chat_id]
+            if step is not None and not step.done():
+                # the generator can only be closed once the running step has finished
+                step.add_done_callback(lambda _: self._release(generator))
+            else:
+                self._release(generator)
+
+    def cancel(self, chat_id: int) -> bool:
+        """Cancels the job of a chat, returning whether it had one."""
+
+        if (job := self.jobs.get(chat_id)) is None:
+            return False
+        job.cancelled.set()
+        if job.waiting is not None:
+            job.waiting.cancel()
+        return True
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, generator: Generator):
+        try:
+            generator.close()
+        except Exception as e:
+            logger.error(f'[WorkerPool] could not close a cancelled job: {e}')
+        with self.lock:
+            self.active_jobs -= 1
@@ -0,0 +1,25 @@
+from os import environ
+from os.path import join
+import json
+import shutil
+import tempfile
+
+# placeholder secrets, the modules that read the configuration do it when they are imported
+TEST_CONFIG = {
+    'telegram': {'token': 'test-token'},
+    'mongoDB': {'uri': 'mongodb://localhost', 'certificate_path': 'etc/cert.pem'},
+    'openrouteservice': {'api_key': 'test-api-key'}
+}
+
+
+def pytest_configure(config):
+    """ Points the configuration at the placeholder secrets before the test modules are imported, so that the tests
+    never need, nor read, etc/config.json """
+    config.test_config_dir = tempfile.mkdtemp()
+    with open(join(config.test_config_dir, 'config.json'), 'w') as f:
+        json.dump(TEST_CONFIG, f)
+    environ['SCOUTINGPLANNER_CONFIG'] = join(config.test_config_dir, 'config.json')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.test_config_dir, ignore_errors=True)
@@ -0,0 +1,18 @@
+from os import environ
+from os.path import join, dirname, abspath
+import json
+
+ROOT_DIR = abspath(join(dirname(abspath(__file__)), '../..'))
+CONFIG_PATH_VARIABLE = 'SCOUTINGPLANNER_CONFIG'
+
+
+def config_path() -> str:
+    """ Returns the path of the configuration file with the secrets, etc/config.json unless the SCOUTINGPLANNER_CONFIG
+    environment variable points to another one """
+    return environ.get(CONFIG_PATH_VARIABLE, join(ROOT_DIR, 'etc/config.json'))
+
+
+def load_config() -> dict:
+    """ Returns the configuration of the bot, the database and the routes provider """
+    with open(config_path()) as f:
+        return json.load(f)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import Iterable
 from networkx import DiGraph
 
 from scraper.scoutingplanner_scrapy.items import Match
@@ -15,13 +16,39 @@ class AbstractDatabaseProxy(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_matchday_graph(self, day: datetime) -> DiGraph | None:
+    def save_matches(self, matches: Iterable[Match]):
         raise NotImplementedError
 
     @abstractmethod
-    def save_matchday_graph(self, day: datetime, graph: DiGraph):
+    def get_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, csr: bool = False) -> DiGraph | None:
+        """ Returns the graph built for the day from exactly the matches with matches_hash and with the travel times
+        of router_version, or None if it has not been stored. With csr it is returned as a CSRGraph """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_previous_matchday_graph(self, season: str, day: datetime, router_version: str) -> DiGraph | None:
+        """ Returns the graph stored for the day with the travel times of router_version, whatever matches it was
+        built from, or None if there is none """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, graph: DiGraph):
+        """ Stores the graph of the day, a DiGraph or a CSRGraph, replacing the ones built from other matches or travel times """
         raise NotImplementedError
     
     @abstractmethod
     def get_competitions(self, season: str) -> list[str]:
         raise NotImplementedError
+
+    @abstractmethod
+    def get_crawl_states(self, urls: list[str] | None = None) -> dict[str, dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_crawl_states(self, states: dict[str, dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_last_changed_at(self) -> datetime | None:
+        """ Returns when the matches of a crawled page last changed, whatever page it was, or None if none has """
+        raise NotImplementedError
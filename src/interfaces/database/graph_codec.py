@@ -0,0 +1,133 @@
+from networkx import DiGraph
+import numpy as np
+import zlib
+
+FORMAT_VERSION = 1
+NODE_SEPARATOR = '\x00'
+SNAPSHOT_COLUMNS = {'timestamps': np.int64, 'lat': np.float64, 'lon': np.float64}
+
+
+def encode_graph(graph: 'DiGraph | CSRGraph') -> dict:
+    """ Returns the fields of the document of a matchday graph, a DiGraph or a CSRGraph, with the nodes and the edges as
+    binary arrays.
+
+    The edges are kept in CSR order with the successors of every node sorted and delta encoded, so the zlib compressed
+    arrays stay far below the document size limit. The reachability index in the graph attributes is stored as the raw
+    bytes of its bitsets, the snapshot of the matches the graph was built from as binary arrays, and the rest of the
+    attributes as they are.
+    """
+    nodes = list(graph.nodes)
+    if isinstance(graph, DiGraph):
+        node_index = {node: i for i, node in enumerate(nodes)}
+        node_weights = np.fromiter((weight for _, weight in graph.nodes(data='weight', default=0.0)), dtype=np.float64, count=len(nodes))
+
+        edges = list(graph.edges(data='weight', default=0.0))
+        origins = np.fromiter((node_index[origin] for origin, _, _ in edges), dtype=np.int32, count=len(edges))
+        destinations = np.fromiter((node_index[destination] for _, destination, _ in edges), dtype=np.int32, count=len(edges))
+        edge_weights = np.fromiter((weight for _, _, weight in edges), dtype=np.float64, count=len(edges))
+    else:
+        node_weights = graph.node_weights
+        origins = np.repeat(np.arange(len(nodes), dtype=np.int32), np.diff(graph.indptr))
+        destinations, edge_weights = graph.indices, graph.edge_weights
+    order = np.lexsort((destinations, origins))
+    origins, destinations, edge_weights = origins[order], destinations[order], edge_weights[order]
+
+    # the first successor of a node is stored as is and the rest as the difference with the previous one
+    deltas = destinations.copy()
+    same_origin = np.flatnonzero(origins[1:] == origins[:-1]) + 1
+    deltas[same_origin] -= destinations[same_origin - 1]
+
+    attributes = dict(graph.graph)
+    document = {
+        'format': FORMAT_VERSION,
+        'nodes': _encode_names(nodes),
+        'node_weights': _compress(node_weights),
+        'out_degrees': _compress(np.bincount(origins, minlength=len(nodes)).astype(np.int32)),
+        'successors': _compress(deltas),
+        'edge_weights': _compress(edge_weights),
+    }
+    if (reachability := attributes.pop('reachability', None)) is not None:
+        document['reachability'] = _encode_reachability(reachability)
+    if (snapshot := attributes.pop('snapshot', None)) is not None:
+        document['snapshot'] = {column: _compress(np.asarray(snapshot[column], dtype=dtype)) for column, dtype in SNAPSHOT_COLUMNS.items()}
+    document['attributes'] = attributes
+    return document
+
+
+def decode_graph(document: dict, csr: bool = False) -> 'DiGraph | CSRGraph':
+    """ Returns the graph of a document written by encode_graph, as a DiGraph or, with csr, as a CSRGraph read straight
+    from the stored arrays """
+    if document.get('format') != FORMAT_VERSION:
+        raise ValueError(f"unknown matchday graph format {document.get('format')}")
+
+    node_weights = _decompress(document['node_weights'], np.float64)
+    nodes = _decode_names(document['nodes'], len(node_weights))
+    out_degrees = _decompress(document['out_degrees'], np.int32)
+    deltas = _decompress(document['successors'], np.int32)
+    edge_weights = _decompress(document['edge_weights'], np.float64)
+
+    # undo the delta encoding with a cumulative sum that restarts at the first successor of every node
+    sums = np.concatenate([[0], np.cumsum(deltas, dtype=np.int64)])
+    indptr = np.concatenate([[0], np.cumsum(out_degrees)]).astype(np.int32)
+    destinations = sums[1:] - np.repeat(sums[indptr[:-1]], out_degrees)
+
+    if csr:
+        # imported here as the matchday package depends on this one
+        from matchday.csr import CSRGraph
+        graph = CSRGraph(nodes, node_weights, indptr, destinations.astype(np.int32), edge_weights)
+    else:
+        graph = DiGraph()
+    graph.graph.update(document.get('attributes', {}))
+    if (reachability := document.get('reachability')) is not None:
+        graph.graph['reachability'] = _decode_reachability(reachability)
+    if (snapshot := document.get('snapshot')) is not None:
+        graph.graph['snapshot'] = {column: _decompress(snapshot[column], dtype) for column, dtype in SNAPSHOT_COLUMNS.items()}
+    if csr:
+        return graph
+
+    origins = np.repeat(np.arange(len(nodes)), out_degrees)
+    graph.add_nodes_from((node, {'weight': weight}) for node, weight in zip(nodes, node_weights.tolist()))
+    names = np.array(nodes, dtype=object)
+    graph.add_weighted_edges_from(zip(names[origins].tolist(), names[destinations].tolist(), edge_weights.tolist()))
+    return graph
+
+
+def _encode_reachability(reachability: dict) -> dict:
+    # a bitset has at most one bit per node, so all of them fit in the same number of bytes
+    size = (len(reachability['nodes']) + 7) // 8
+    return {
+        'nodes': _encode_names(reachability['nodes']),
+        'n_nodes': len(reachability['nodes']),
+        'descendants': zlib.compress(b''.join(int(bits, 16).to_bytes(size, 'little') for bits in reachability['descendants'])),
+        'ancestors': zlib.compress(b''.join(int(bits, 16).to_bytes(size, 'little') for bits in reachability['ancestors'])),
+    }
+
+
+def _decode_reachability(document: dict) -> dict:
+    size = (document['n_nodes'] + 7) // 8
+    def bitsets(data: bytes) -> list[str]:
+        data = zlib.decompress(data)
+        if not size:
+            return []
+        return [format(int.from_bytes(data[i:i+size], 'little'), 'x') for i in range(0, len(data), size)]
+    return {
+        'nodes': _decode_names(document['nodes'], document['n_nodes']),
+        'descendants': bitsets(document['descendants']),
+        'ancestors': bitsets(document['ancestors'])
+    }
+
+
+def _encode_names(names: list[str]) -> bytes:
+    return zlib.compress(NODE_SEPARATOR.join(names).encode('utf-8'))
+
+
+def _decode_names(data: bytes, n_names: int) -> list[str]:
+    return zlib.decompress(data).decode('utf-8').split(NODE_SEPARATOR) if n_names else []
+
+
+def _compress(array: np.ndarray) -> bytes:
+    return zlib.compress(array.astype(array.dtype.newbyteorder('<')).tobytes())
+
+
+def _decompress(data: bytes, dtype: type) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(data), dtype=np.dtype(dtype).newbyteorder('<')).astype(dtype)
@@ -1,32 +1,90 @@
-from os.path import join, dirname, abspath
-from pymongo import MongoClient
+from os import getpid
+from os.path import join
+from collections import defaultdict
+from threading import Lock
+from typing import Iterable
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
 from datetime import datetime, timedelta
-from networkx import DiGraph, readwrite
+from networkx import DiGraph
 from itemadapter import ItemAdapter
-import json
+import logging
 
 from scraper.scoutingplanner_scrapy.items import Match
 
+from interfaces.config import ROOT_DIR, load_config
+
 from .base_proxy import AbstractDatabaseProxy
+from .graph_codec import encode_graph, decode_graph
+
+logger = logging.getLogger(__name__)
 
 
 class MongoDBDatabaseProxy(AbstractDatabaseProxy):
-    _ROOT_DIR = join(dirname(abspath(__file__)), './../../../')
-    with open(join(_ROOT_DIR, 'etc/config.json')) as f:
-        _config = json.load(f)
-        _uri = _config['mongoDB']['uri']
-        _certificate_path = join(
-            _ROOT_DIR, _config['mongoDB']['certificate_path'])
-
-    def database_connection(func):
-        def wrapper(self, *args, **kwargs):
-            self.client = MongoClient(
-                self._uri, tls=True, tlsCertificateKeyFile=self._certificate_path)
-            result = func(self, *args, **kwargs)
-            self.client.close()
-            return result
-        return wrapper
-    
+    _config = load_config()
+    _uri = _config['mongoDB']['uri']
+    _certificate_path = join(ROOT_DIR, _config['mongoDB']['certificate_path'])
+
+    MATCH_KEYS = ('season', 'competition', 'group', 'matchday', 'home_team', 'away_team')
+    MAX_POOL_SIZE = 50
+
+    # MongoClient is thread-safe and pools its connections, so one client is shared by the whole process
+    _client = None
+    _client_pid = None
+    _client_lock = Lock()
+    _indexed_collections = set()
+
+    @classmethod
+    def _get_client(cls) -> MongoClient:
+        """ Returns the client of the process, creating it and the indexes of the graph store and of the matches
+        collections the first time """
+        with cls._client_lock:
+            # a client inherited through fork is not safe to use, the child process opens its own
+            if cls._client is None or cls._client_pid != getpid():
+                cls._client = MongoClient(
+                    cls._uri, tls=True, tlsCertificateKeyFile=cls._certificate_path, maxPoolSize=cls.MAX_POOL_SIZE)
+                cls._client_pid = getpid()
+                cls._indexed_collections = set()
+                cls._client.matchday_graphs.graph_store.create_index(
+                    [(key, ASCENDING) for key in ('season', 'day', 'matches_hash', 'router_version')], name='graph_key')
+                for season in cls._client.matches.list_collection_names():
+                    cls._create_indexes(season)
+        return cls._client
+
+    @classmethod
+    def _create_indexes(cls, season: str):
+        """ Creates the indexes of the matches collection of a season, if they have not been created yet """
+        if season in cls._indexed_collections:
+            return
+        collection = cls._client.matches[season]
+        natural_key = [(key, ASCENDING) for key in cls.MATCH_KEYS]
+        try:
+            collection.create_index(natural_key, name='natural_key', unique=True)
+        except OperationFailure as e:
+            # the collections indexed before the upserts were keyed on the natural key have a non unique index, and
+            # may hold duplicated matches
+            if e.code not in (85, 86, 11000): # IndexOptionsConflict, IndexKeySpecsConflict, DuplicateKey
+                raise
+            if e.code != 11000:
+                collection.drop_index('natural_key')
+            cls._deduplicate(collection)
+            collection.create_index(natural_key, name='natural_key', unique=True)
+        collection.create_index([('timestamp', ASCENDING)], name='timestamp')
+        cls._indexed_collections.add(season)
+
+    @classmethod
+    def _deduplicate(cls, collection):
+        """ Deletes all but the last inserted of the matches of a collection that share a natural key """
+        duplicates = collection.aggregate([
+            {'$sort': {'_id': DESCENDING}},
+            {'$group': {'_id': {key: f'${key}' for key in cls.MATCH_KEYS}, 'ids': {'$push': '$_id'}}},
+            {'$match': {'ids.1': {'$exists': True}}}
+        ], allowDiskUse=True)
+        stale_ids = [stale_id for duplicate in duplicates for stale_id in duplicate['ids'][1:]]
+        if stale_ids:
+            collection.delete_many({'_id': {'$in': stale_ids}})
+            logger.warning(f'[MongoDBDatabaseProxy] deleted {len(stale_ids)} duplicated matches from {collection.name}')
+
     def _kwargs_to_query(self, kwargs: dict) -> tuple[dict]:
         """ Converts kwargs to a tuple of query, sort and projection dicts."""
         query = kwargs
@@ -58,64 +116,98 @@ class MongoDBDatabaseProxy(AbstractDatabaseProxy):
             
         return query, sort, projection
 
-    @database_connection
     def get_matches(self, season: str, as_dict: bool = False, **kwargs) -> list[Match | dict]:
         query, sort, projection = self._kwargs_to_query(kwargs)
 
-        self.db = self.client.matches
-        result = self.db[season].find(query, projection=projection)
+        db = self._get_client().matches
+        result = db[season].find(query, projection=projection)
         if sort:
             result = result.sort(sort)
         if as_dict:
             return [dict for dict in result]
         return [Match(**dict) for dict in result]
 
-    @database_connection
     def save_match(self, match: Match):
-        self.db = self.client.matches
-        collection = self.db[match.season]
-
-        keys_dict = {
-            'season': match.season,
-            'competition': match.competition,
-            'group': match.group,
-            'matchday': match.matchday,
-            'home_team': match.home_team,
-            'away_team': match.away_team
+        self.save_matches([match])
+
+    def save_matches(self, matches: Iterable[Match]):
+        """ Upserts the matches on their natural key with one unordered bulk write per season. Fields of a match that
+        are None do not overwrite the stored ones. """
+        db = self._get_client().matches
+
+        operations = defaultdict(list)
+        for match in matches:
+            match_dict = ItemAdapter(match).asdict()
+            keys_dict = {key: match_dict[key] for key in self.MATCH_KEYS}
+            update = {'$set': {k: v for k, v in match_dict.items() if v is not None}}
+            if (unset_fields := {k: v for k, v in match_dict.items() if v is None}):
+                update['$setOnInsert'] = unset_fields
+            operations[match_dict['season']].append(UpdateOne(keys_dict, update, upsert=True))
+
+        for season, season_operations in operations.items():
+            with self._client_lock:
+                self._create_indexes(season)
+            db[season].bulk_write(season_operations, ordered=False)
+
+    @staticmethod
+    def _graph_key(season: str, day: datetime, matches_hash: str, router_version: str) -> dict:
+        return {
+            'season': season,
+            'day': day.replace(hour=0, minute=0, second=0, microsecond=0),
+            'matches_hash': matches_hash,
+            'router_version': router_version
         }
 
-        if collection.find_one(keys_dict):
-            aux = ItemAdapter(match).asdict()
-            match_dict = {k: v for k, v in aux.items() if v is not None}
-            print(match_dict)
-            collection.update_one(
-                keys_dict, {'$set': match_dict})
-        else:
-            collection.insert_one(ItemAdapter(match).asdict())
-
-    @database_connection
-    def get_matchday_graph(self, day: datetime) -> DiGraph | None:
-        self.db = self.client.matchday_graphs
-        result = self.db.graphs.find_one({'day': day})
+    def get_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, csr: bool = False) -> DiGraph | None:
+        """ Returns the stored graph with the given key, decoding its binary arrays """
+        db = self._get_client().matchday_graphs
+        result = db.graph_store.find_one(self._graph_key(season, day, matches_hash, router_version), projection={'_id': False})
         if result is None:
             return None
-        return readwrite.json_graph.adjacency_graph(result['graph'], directed=True)
-
-    @database_connection
-    def save_matchday_graph(self, day: datetime, graph: DiGraph):
-        self.db = self.client.matchday_graphs
+        return decode_graph(result, csr)
 
+    def get_previous_matchday_graph(self, season: str, day: datetime, router_version: str) -> DiGraph | None:
+        """ Returns the graph stored for the day with router_version, which save_matchday_graph keeps unique """
+        db = self._get_client().matchday_graphs
         day = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        data = readwrite.json_graph.adjacency_data(graph)
-
-        if self.db.graphs.find_one({'day': day}):
-            self.db.graphs.update_one({'day': day}, {'$set': {'graph': data}})
-        else:
-            self.db.graphs.insert_one({'day': day, 'graph': data})
+        result = db.graph_store.find_one(
+            {'season': season, 'day': day, 'router_version': router_version}, projection={'_id': False})
+        if result is None:
+            return None
+        return decode_graph(result)
+
+    def save_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, graph: DiGraph):
+        """ Stores the graph with its nodes and edges as compressed binary arrays and removes the other graphs of the
+        day, which were built from other matches or travel times and can not be served anymore """
+        db = self._get_client().matchday_graphs
+        key = self._graph_key(season, day, matches_hash, router_version)
+        db.graph_store.replace_one(key, {**key, **encode_graph(graph)}, upsert=True)
+        db.graph_store.delete_many({
+            'season': season, 'day': key['day'],
+            '$or': [{'matches_hash': {'$ne': matches_hash}}, {'router_version': {'$ne': router_version}}]})
 
-    @database_connection
     def get_competitions(self, season: str, **kwargs) -> list[str]:
         query, _, _ = self._kwargs_to_query(kwargs)
 
-        self.db = self.client.matches
-        return self.db[season].distinct('competition')
+        db = self._get_client().matches
+        return db[season].distinct('competition')
+
+    def get_crawl_states(self, urls: list[str] | None = None) -> dict[str, dict]:
+        """ Returns the state of the last crawl of every url that has been crawled, keyed by url, or of every crawled
+        page if no urls are given """
+        db = self._get_client().scraper
+        query = {} if urls is None else {'url': {'$in': list(urls)}}
+        return {state['url']: state for state in db.crawl_states.find(query, projection={'_id': False})}
+
+    def save_crawl_states(self, states: dict[str, dict]):
+        db = self._get_client().scraper
+        if states:
+            db.crawl_states.bulk_write([
+                UpdateOne({'url': url}, {'$set': {**state, 'url': url}}, upsert=True)
+                for url, state in states.items()], ordered=False)
+
+    def get_last_changed_at(self) -> datetime | None:
+        db = self._get_client().scraper
+        state = db.crawl_states.find_one(
+            {'changed_at': {'$ne': None}}, sort=[('changed_at', DESCENDING)], projection={'_id': False, 'changed_at': True})
+        return None if state is None else state['changed_at']
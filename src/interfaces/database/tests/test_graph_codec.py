@@ -0,0 +1,65 @@
+from networkx import DiGraph, readwrite, utils
+import bson
+import numpy as np
+
+from interfaces.database.graph_codec import encode_graph, decode_graph
+from matchday.csr import CSRGraph
+from matchday.reachability import ReachabilityIndex
+from matchday.tests.helpers import matchday_graph
+from matchday.tests.test_paths import random_matchday_graph
+
+
+def test_graphs_round_trip_through_bson():
+    for seed in range(5):
+        graph = random_matchday_graph(40, 0.2, seed)
+        for origin, destination in graph.edges:
+            graph[origin][destination]['weight'] = seed + 0.25 * len(origin + destination)
+        graph.graph['reachability'] = ReachabilityIndex.from_graph(graph).to_dict()
+        graph.graph['built_by'] = 'test'
+
+        decoded = decode_graph(bson.decode(bson.encode(encode_graph(graph))))
+        assert utils.graphs_equal(decoded, graph)
+        assert list(decoded.nodes) == list(graph.nodes)
+
+    assert utils.graphs_equal(decode_graph(encode_graph(DiGraph())), DiGraph())
+
+
+def test_graphs_decode_straight_to_csr_graphs():
+    for seed in range(5):
+        graph = random_matchday_graph(40, 0.2, seed)
+        graph.graph['reachability'] = ReachabilityIndex.from_graph(graph).to_dict()
+        document = bson.decode(bson.encode(encode_graph(graph)))
+
+        csr_graph = decode_graph(document, csr=True)
+        assert isinstance(csr_graph, CSRGraph)
+        assert csr_graph.node_ids == list(graph.nodes)
+        assert utils.graphs_equal(csr_graph.to_digraph(), CSRGraph.from_digraph(graph).to_digraph())
+        assert csr_graph.graph['reachability'] == graph.graph['reachability']
+        # a CSRGraph is stored as the DiGraph it comes from
+        assert encode_graph(csr_graph) == encode_graph(graph)
+
+    assert len(decode_graph(encode_graph(DiGraph()), csr=True)) == 0
+
+
+def test_snapshots_round_trip_as_arrays():
+    graph = random_matchday_graph(10, 0.3, 0)
+    snapshot = {
+        'timestamps': np.arange(10, dtype=np.int64) * 900,
+        'lat': np.linspace(41, 42, 10),
+        'lon': np.linspace(2, 3, 10)
+    }
+    graph.graph['snapshot'] = snapshot
+
+    decoded = decode_graph(bson.decode(bson.encode(encode_graph(graph))))
+    assert decoded.graph['snapshot'].keys() == snapshot.keys()
+    for column, values in snapshot.items():
+        assert np.array_equal(decoded.graph['snapshot'][column], values)
+
+
+def test_encoded_graphs_are_smaller_than_adjacency_data():
+    graph = matchday_graph(1000, seed=0)
+    graph.graph['reachability'] = ReachabilityIndex.from_graph(graph).to_dict()
+
+    document_size = len(bson.encode(encode_graph(graph)))
+    assert document_size < 1024**2
+    assert document_size * 50 < len(bson.encode({'graph': readwrite.json_graph.adjacency_data(graph)}))
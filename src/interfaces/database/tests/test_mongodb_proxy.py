@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import datetime
+from unittest.mock import MagicMock
+from networkx import DiGraph
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+import pytest
+
+from interfaces.database import MongoDBDatabaseProxy
+from interfaces.database import mongodb_proxy
+from scraper.scoutingplanner_scrapy.items import Match
+
+
+@pytest.fixture
+def client(monkeypatch) -> MagicMock:
+    """ Replaces the MongoClient of the proxies by a mock whose matches collections are told apart by season """
+    client = MagicMock()
+    collections = defaultdict(MagicMock)
+    client.matches.__getitem__.side_effect = collections.__getitem__
+    client.matches.list_collection_names.return_value = []
+    client.collections = collections
+    monkeypatch.setattr(mongodb_proxy, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setattr(MongoDBDatabaseProxy, '_client', None)
+    monkeypatch.setattr(MongoDBDatabaseProxy, '_indexed_collections', set())
+    return client
+
+
+def make_match(season: str, home_team: str, **kwargs) -> Match:
+    return Match(
+        season=season, competition='LLIGA', group='GRUP 1', matchday=1,
+        home_team=home_team, away_team='B', finished=False, **kwargs)
+
+
+def test_save_matches_upserts_every_season_with_one_bulk_write(client):
+    kickoff = datetime(2023, 5, 6, 10)
+    matches = [
+        make_match('TEMPORADA 2022-2023', 'A', timestamp=kickoff, stadium='CAMP A'),
+        make_match('TEMPORADA 2022-2023', 'C', timestamp=kickoff),
+        make_match('TEMPORADA 2023-2024', 'A'),
+    ]
+    MongoDBDatabaseProxy().save_matches(matches)
+
+    def upsert(match: Match) -> UpdateOne:
+        key = {'season': match.season, 'competition': 'LLIGA', 'group': 'GRUP 1', 'matchday': 1, 'home_team': match.home_team, 'away_team': 'B'}
+        fields = {k: v for k, v in vars(match).items() if k not in key}
+        update = {'$set': {**key, **{k: v for k, v in fields.items() if v is not None}}}
+        update['$setOnInsert'] = {k: v for k, v in fields.items() if v is None}
+        return UpdateOne(key, update, upsert=True)
+
+    for season, season_matches in (('TEMPORADA 2022-2023', matches[:2]), ('TEMPORADA 2023-2024', matches[2:])):
+        collection = client.collections[season]
+        collection.bulk_write.assert_called_once_with([upsert(match) for match in season_matches], ordered=False)
+        assert collection.create_index.call_count == 2
+
+
+def test_duplicated_matches_are_deleted_before_the_natural_key_is_made_unique(client):
+    client.matches.list_collection_names.return_value = ['TEMPORADA 2022-2023']
+    collection = client.collections['TEMPORADA 2022-2023']
+    collection.create_index.side_effect = [OperationFailure('E11000 duplicate key error', code=11000), None, None]
+    collection.aggregate.return_value = [{'_id': {'home_team': 'A'}, 'ids': [3, 2, 1]}]
+
+    db_proxy = MongoDBDatabaseProxy()
+    db_proxy.save_matches([make_match('TEMPORADA 2022-2023', 'A')])
+
+    collection.delete_many.assert_called_once_with({'_id': {'$in': [2, 1]}})
+    assert collection.create_index.call_count == 3
+    collection.bulk_write.assert_called_once()
+
+    collection.create_index.side_effect = OperationFailure('not authorized', code=13)
+    MongoDBDatabaseProxy._client = None
+    with pytest.raises(OperationFailure):
+        MongoDBDatabaseProxy().get_competitions('TEMPORADA 2022-2023')
+
+
+def test_the_graph_store_is_indexed_once_per_client(client):
+    db_proxy = MongoDBDatabaseProxy()
+    for _ in range(3):
+        db_proxy.save_matchday_graph('TEMPORADA 2022-2023', datetime(2023, 5, 6), 'hash', 'router', DiGraph())
+
+    client.matchday_graphs.graph_store.create_index.assert_called_once()
+    assert client.matchday_graphs.graph_store.replace_one.call_count == 3
@@ -1,2 +1,4 @@
 from .base_proxy import AbstractRouteProxy
 from .openrouteservice_proxy import OpenRouteServiceProxy
+from .cached_proxy import CachedRouteProxy
+from .tensor_proxy import TensorRouteProxy
\ No newline at end of file
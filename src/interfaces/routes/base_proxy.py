@@ -3,7 +3,49 @@ from datetime import datetime
 
 class AbstractRouteProxy(ABC):
 
+    @property
+    def version(self) -> str:
+        """ Returns the name of the source of the travel times, so anything built from them can be told apart from what
+        another source would have returned """
+        return type(self).__name__
+
+    @property
+    def time_dependent(self) -> bool:
+        """ Returns whether the travel times depend on the departure time, proxies that ignore it return False so that
+        the legs departing at different times are asked together """
+        return True
+
     @abstractmethod
     def route_temporal_distance(self, origin: tuple[float, float], destination: tuple[float, float], departure_time: datetime | None = None) -> float:
         """ Returns the time in minutes between the origin and the destination """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def route_temporal_distance_matrix(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_time: datetime | None = None) -> list[list[float]]:
+        """ Returns a len(origins) x len(destinations) matrix with the time in minutes between every origin and every destination.
+
+        Proxies backed by a provider with a matrix endpoint should override this method, by default it falls back to one
+        route_temporal_distance call per pair.
+        """
+        return [
+            [self.route_temporal_distance(origin, destination, departure_time) for destination in destinations]
+            for origin in origins]
+
+    def route_temporal_distance_pairs(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_times: list[datetime | None]) -> list[float]:
+        """ Returns the time in minutes of every leg from origins[k] to destinations[k] departing at departure_times[k].
+
+        By default the legs that depart at the same time, or all of them if the travel times do not depend on it, are
+        asked as one route_temporal_distance_matrix call between their distinct origins and destinations.
+        """
+        legs_by_departure_time = {}
+        for k, departure_time in enumerate(departure_times):
+            legs_by_departure_time.setdefault(departure_time if self.time_dependent else None, []).append(k)
+
+        minutes = [float('inf')] * len(departure_times)
+        for departure_time, legs in legs_by_departure_time.items():
+            origin_index = {origin: i for i, origin in enumerate(dict.fromkeys(origins[k] for k in legs))}
+            destination_index = {destination: j for j, destination in enumerate(dict.fromkeys(destinations[k] for k in legs))}
+            matrix = self.route_temporal_distance_matrix(list(origin_index), list(destination_index), departure_time)
+            for k in legs:
+                minutes[k] = matrix[origin_index[origins[k]]][destination_index[destinations[k]]]
+        return minutes
+
@@ -0,0 +1,157 @@
+from os import makedirs
+from os.path import dirname, join, abspath
+from datetime import datetime, timedelta
+from threading import Lock
+import sqlite3
+import time
+
+from .base_proxy import AbstractRouteProxy
+
+
+class CachedRouteProxy(AbstractRouteProxy):
+    """ Route proxy that stores the temporal distances returned by another proxy in a local SQLite database.
+
+    Entries are keyed on the rounded coordinates of the origin and the destination and on the bucket of the week the
+    departure time falls in, so the same stadium pairs are only asked once per season and time slot.
+    """
+
+    DEFAULT_PATH = join(dirname(abspath(__file__)), '../../../var/routes_cache.sqlite3')
+    COORDINATES_PRECISION = 4 # decimals, ~10 meters
+    DEPARTURE_TIME_BUCKET = timedelta(hours=1)
+    TTL = timedelta(days=30)
+    MAX_ENTRIES = 200000
+
+    def __init__(self, routes_proxy: AbstractRouteProxy, path: str | None = None, ttl: timedelta | None = None, max_entries: int | None = None):
+        self.routes_proxy = routes_proxy
+        self.path = path or self.DEFAULT_PATH
+        self.ttl = ttl or self.TTL
+        self.max_entries = max_entries or self.MAX_ENTRIES
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.path != ':memory:':
+            makedirs(dirname(abspath(self.path)), exist_ok=True)
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS travel_times (
+                origin_lat REAL NOT NULL,
+                origin_lon REAL NOT NULL,
+                destination_lat REAL NOT NULL,
+                destination_lon REAL NOT NULL,
+                bucket INTEGER NOT NULL,
+                minutes REAL NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (origin_lat, origin_lon, bucket, destination_lat, destination_lon)
+            )""")
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS travel_times_accessed_at ON travel_times (accessed_at)')
+        self._connection.commit()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """ Returns the hit and miss counters of the cache """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    @property
+    def version(self) -> str:
+        """ Returns the version of the wrapped proxy, whose travel times are the ones stored """
+        return self.routes_proxy.version
+
+    @property
+    def time_dependent(self) -> bool:
+        return self.routes_proxy.time_dependent
+
+    def route_temporal_distance(self, origin: tuple[float, float], destination: tuple[float, float], departure_time: datetime | None = None) -> float:
+        """ Returns the time in minutes between the origin and the destination """
+        return self.route_temporal_distance_matrix([origin], [destination], departure_time)[0][0]
+
+    def route_temporal_distance_matrix(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_time: datetime | None = None) -> list[list[float]]:
+        """ Returns a len(origins) x len(destinations) matrix with the time in minutes between every origin and every destination.
+
+        Only the rows and columns with a missing pair are requested to the wrapped proxy, in a single matrix call.
+        """
+        bucket = self._bucket(departure_time)
+        origin_keys = [self._round(origin) for origin in origins]
+        destination_keys = [self._round(destination) for destination in destinations]
+
+        with self._lock:
+            cached = self._lookup(set(origin_keys), bucket)
+
+        matrix = [[cached.get((origin, destination)) for destination in destination_keys] for origin in origin_keys]
+        missing_origins = sorted({i for i, row in enumerate(matrix) for value in row if value is None})
+        missing_destinations = sorted({j for row in matrix for j, value in enumerate(row) if value is None})
+
+        n_missing = sum(value is None for row in matrix for value in row)
+        with self._lock:
+            self.misses += n_missing
+            self.hits += len(origins) * len(destinations) - n_missing
+        if not missing_origins:
+            return matrix
+
+        fetched = self.routes_proxy.route_temporal_distance_matrix(
+            [origins[i] for i in missing_origins],
+            [destinations[j] for j in missing_destinations],
+            departure_time)
+        entries = {}
+        for k, i in enumerate(missing_origins):
+            for l, j in enumerate(missing_destinations):
+                matrix[i][j] = fetched[k][l]
+                entries[(origin_keys[i], destination_keys[j])] = fetched[k][l]
+
+        with self._lock:
+            self._store(entries, bucket)
+        return matrix
+
+    def clear(self):
+        """ Removes every entry of the cache """
+        with self._lock:
+            self._connection.execute('DELETE FROM travel_times')
+            self._connection.commit()
+
+    def _lookup(self, origins: set[tuple[float, float]], bucket: int) -> dict[tuple, float]:
+        """ Returns the fresh cached temporal distances from the origins, keyed by (origin, destination) """
+        now = time.time()
+        oldest = now - self.ttl.total_seconds()
+        result = {}
+        for origin in origins:
+            rows = self._connection.execute(
+                'SELECT destination_lat, destination_lon, minutes FROM travel_times '
+                'WHERE origin_lat = ? AND origin_lon = ? AND bucket = ? AND created_at >= ?',
+                (*origin, bucket, oldest)).fetchall()
+            for destination_lat, destination_lon, minutes in rows:
+                result[(origin, (destination_lat, destination_lon))] = minutes
+
+        if result:
+            self._connection.executemany(
+                'UPDATE travel_times SET accessed_at = ? '
+                'WHERE origin_lat = ? AND origin_lon = ? AND bucket = ? AND destination_lat = ? AND destination_lon = ?',
+                [(now, *origin, bucket, *destination) for origin, destination in result])
+            self._connection.commit()
+        return result
+
+    def _store(self, entries: dict[tuple, float], bucket: int):
+        """ Stores the temporal distances and evicts the least recently used entries above max_entries """
+        now = time.time()
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO travel_times VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(*origin, *destination, bucket, minutes, now, now) for (origin, destination), minutes in entries.items()])
+        self._connection.execute(
+            'DELETE FROM travel_times WHERE created_at < ?', (now - self.ttl.total_seconds(),))
+        self._connection.execute(
+            'DELETE FROM travel_times WHERE rowid IN '
+            '(SELECT rowid FROM travel_times ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,))
+        self._connection.commit()
+
+    def _round(self, latlon: tuple[float, float]) -> tuple[float, float]:
+        return (round(latlon[0], self.COORDINATES_PRECISION), round(latlon[1], self.COORDINATES_PRECISION))
+
+    def _bucket(self, departure_time: datetime | None) -> int:
+        """ Returns the bucket of the week of the departure time, or -1 if there is no departure time """
+        if departure_time is None:
+            return -1
+        minute_of_week = (departure_time.weekday() * 24 + departure_time.hour) * 60 + departure_time.minute
+        return minute_of_week // int(self.DEPARTURE_TIME_BUCKET.total_seconds() // 60)
@@ -1,22 +1,38 @@
-from os.path import dirname, join, abspath
 from datetime import datetime
 import requests
 import json
 import time
+import random
 import logging
 
+from interfaces.config import load_config
+
 from .base_proxy import AbstractRouteProxy
 
 logging.getLogger("requests").setLevel(logging.WARNING)
 
 class OpenRouteServiceProxy(AbstractRouteProxy):
 
-    API_KEY_PATH = join(dirname(abspath(__file__)), '../../../etc/config.json')
+    API_KEY = load_config()['openrouteservice']['api_key']
+
+    MATRIX_URL = 'https://api.openrouteservice.org/v2/matrix/driving-car'
+    MATRIX_MAX_ROUTES = 3500 # maximum number of origins x destinations per matrix request
+
+    RETRY_STATUS_CODES = {429, 502, 503, 504}
+    MAX_RETRIES = 8
+    BACKOFF_BASE = 2.0 # seconds
+    MAX_BACKOFF = 60.0 # seconds
+
+    _session = None # requests.Session shared by every instance
 
-    with open(API_KEY_PATH) as json_file:
-        config = json.load(json_file)
+    @property
+    def version(self) -> str:
+        return 'openrouteservice/driving-car'
 
-    API_KEY = config['openrouteservice']['api_key']
+    @property
+    def time_dependent(self) -> bool:
+        # the matrix endpoint does not take a departure time
+        return False
 
     class Location:
         def __init__(self, lat: float, lon: float):
@@ -32,12 +48,70 @@ class OpenRouteServiceProxy(AbstractRouteProxy):
         # API request
         url = f'https://api.openrouteservice.org/v2/directions/driving-car?api_key={self.API_KEY}&start={origin.lon},{origin.lat}&end={destination.lon},{destination.lat}&departure_time={departure_time}&options=timezone:Europe/Madrid'
         
-        response = requests.get(url)
-        while response.status_code == 429:
-            time.sleep(30)
-            response = requests.get(url)
+        response = self._request('GET', url)
         data = json.loads(response.text)
 
         # Get the duration
         duration = data['features'][0]['properties']['segments'][0]['duration']
-        return duration / 60.0
\ No newline at end of file
+        return duration / 60.0
+
+    def route_temporal_distance_matrix(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_time: datetime | None = None) -> list[list[float]]:
+        """ Returns a len(origins) x len(destinations) matrix with the time in minutes between every origin and every destination.
+
+        The matrix endpoint does not take a departure time, so departure_time is ignored. Pairs without a route get an
+        infinite duration. Requests are chunked so that none of them exceeds MATRIX_MAX_ROUTES.
+        """
+        matrix = [[float('inf')] * len(destinations) for _ in origins]
+        if not origins or not destinations:
+            return matrix
+
+        destinations_chunk_size = min(len(destinations), self.MATRIX_MAX_ROUTES)
+        origins_chunk_size = max(1, self.MATRIX_MAX_ROUTES // destinations_chunk_size)
+        for i in range(0, len(origins), origins_chunk_size):
+            for j in range(0, len(destinations), destinations_chunk_size):
+                durations = self._matrix_request(
+                    origins[i:i+origins_chunk_size], destinations[j:j+destinations_chunk_size])
+                for k, row in enumerate(durations):
+                    for l, duration in enumerate(row):
+                        if duration is not None:
+                            matrix[i+k][j+l] = duration / 60.0
+        return matrix
+
+    def _matrix_request(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]]) -> list[list[float | None]]:
+        """ Returns the durations in seconds of a single matrix API request """
+        locations = [[lon, lat] for lat, lon in origins] + [[lon, lat] for lat, lon in destinations]
+        body = {
+            'locations': locations,
+            'sources': list(range(len(origins))),
+            'destinations': list(range(len(origins), len(locations))),
+            'metrics': ['duration']
+        }
+        headers = {'Authorization': self.API_KEY}
+
+        response = self._request('POST', self.MATRIX_URL, json=body, headers=headers)
+        data = json.loads(response.text)
+
+        return data['durations']
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """ Sends a request through the shared session, retrying while the API is rate limiting us """
+        if OpenRouteServiceProxy._session is None:
+            OpenRouteServiceProxy._session = requests.Session()
+
+        response = self._session.request(method, url, **kwargs)
+        attempt = 0
+        while response.status_code in self.RETRY_STATUS_CODES and attempt < self.MAX_RETRIES:
+            time.sleep(self._retry_delay(response.headers.get('Retry-After'), attempt))
+            response = self._session.request(method, url, **kwargs)
+            attempt += 1
+        response.raise_for_status()
+        return response
+
+    def _retry_delay(self, retry_after: str | None, attempt: int) -> float:
+        """ Returns the seconds to wait before retrying, honouring the Retry-After header if the API sent it """
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(self.MAX_BACKOFF, self.BACKOFF_BASE * 2 ** attempt) * (1 + random.random() / 2)
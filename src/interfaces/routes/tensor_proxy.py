@@ -0,0 +1,191 @@
+from os import makedirs, replace
+from os.path import dirname, join, abspath, exists
+from datetime import datetime, timedelta
+import json
+import logging
+import numpy as np
+
+from .base_proxy import AbstractRouteProxy
+
+logger = logging.getLogger(__name__)
+
+
+class TensorRouteProxy(AbstractRouteProxy):
+    """ Route proxy that looks the travel times up in a precomputed stadium x stadium x hour of the week tensor.
+
+    The tensor is a .npy file memory-mapped read-only, so it is not loaded into memory and a lookup only touches the
+    pages of the requested pairs, with a .json index next to it that maps the rounded coordinates of every stadium to
+    its row. The profiles are taken every hour_step hours from Monday 00:00 and the travel time at a departure time is
+    interpolated linearly between the two profiles around it, so legs departing at different times are looked up
+    together with one fancy indexing of the tensor. Pairs with a stadium that is not in the tensor are asked
+    to the fallback proxy, if there is one.
+    """
+
+    DEFAULT_DIRECTORY = join(dirname(abspath(__file__)), '../../../var/travel_times')
+    COORDINATES_PRECISION = 4 # decimals, ~10 meters
+    HOURS_PER_WEEK = 7 * 24
+
+    def __init__(self, path: str, fallback: AbstractRouteProxy | None = None):
+        """ path is the path of the tensor without extension, a missing tensor sends every pair to the fallback """
+        self.path = path
+        self.fallback = fallback
+        self.tensor = None
+        self.stadium_index = {}
+        self.hour_step = self.HOURS_PER_WEEK
+        self.index = {}
+
+        if exists(f'{path}.npy') and exists(f'{path}.json'):
+            with open(f'{path}.json') as f:
+                self.index = json.load(f)
+            self.tensor = np.load(f'{path}.npy', mmap_mode='r')
+            self.hour_step = self.index['hour_step']
+            self.stadium_index = {self._round(stadium): i for i, stadium in enumerate(self.index['stadiums'])}
+        elif fallback is None:
+            raise FileNotFoundError(f'there is no travel time tensor at {path}')
+
+    @classmethod
+    def season_path(cls, season: str) -> str:
+        return join(cls.DEFAULT_DIRECTORY, season.replace(' ', '_'))
+
+    @classmethod
+    def from_season(cls, season: str, fallback: AbstractRouteProxy | None = None) -> 'TensorRouteProxy':
+        """ Returns the proxy of the tensor built for a season """
+        return cls(cls.season_path(season), fallback)
+
+    @property
+    def version(self) -> str:
+        if self.tensor is None:
+            return self.fallback.version
+        return f"tensor/{self.index['version']}/{self.index['built_at']}"
+
+    @property
+    def time_dependent(self) -> bool:
+        return (self.tensor is not None and self.tensor.shape[2] > 1) or (self.fallback is not None and self.fallback.time_dependent)
+
+    def route_temporal_distance(self, origin: tuple[float, float], destination: tuple[float, float], departure_time: datetime | None = None) -> float:
+        """ Returns the time in minutes between the origin and the destination """
+        return self.route_temporal_distance_matrix([origin], [destination], departure_time)[0][0]
+
+    def route_temporal_distance_matrix(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_time: datetime | None = None) -> list[list[float]]:
+        """ Returns a len(origins) x len(destinations) matrix with the time in minutes between every origin and every destination.
+
+        Without a departure time the fastest profile of every pair is returned. The rows of the origins and the columns
+        of the destinations that are not in the tensor are requested to the fallback proxy, in at most two matrix calls.
+        """
+        origin_rows = np.array([self.stadium_index.get(self._round(origin), -1) for origin in origins], dtype=np.intp)
+        destination_rows = np.array([self.stadium_index.get(self._round(destination), -1) for destination in destinations], dtype=np.intp)
+        known_origins = np.flatnonzero(origin_rows >= 0)
+        known_destinations = np.flatnonzero(destination_rows >= 0)
+
+        matrix = np.full((len(origins), len(destinations)), np.inf)
+        if len(known_origins) and len(known_destinations):
+            matrix[np.ix_(known_origins, known_destinations)] = self._lookup(
+                origin_rows[known_origins], destination_rows[known_destinations], departure_time)
+
+        unknown_origins = np.flatnonzero(origin_rows < 0)
+        unknown_destinations = np.flatnonzero(destination_rows < 0)
+        if len(unknown_origins) or len(unknown_destinations):
+            if self.fallback is None:
+                unknown = origins[unknown_origins[0]] if len(unknown_origins) else destinations[unknown_destinations[0]]
+                raise KeyError(f'the stadium at {unknown} is not in the travel time tensor')
+            if len(unknown_origins) and len(destinations):
+                matrix[unknown_origins, :] = self.fallback.route_temporal_distance_matrix(
+                    [origins[i] for i in unknown_origins], destinations, departure_time)
+            if len(known_origins) and len(unknown_destinations):
+                matrix[np.ix_(known_origins, unknown_destinations)] = self.fallback.route_temporal_distance_matrix(
+                    [origins[i] for i in known_origins], [destinations[j] for j in unknown_destinations], departure_time)
+        return matrix.tolist()
+
+    def route_temporal_distance_pairs(self, origins: list[tuple[float, float]], destinations: list[tuple[float, float]], departure_times: list[datetime | None]) -> list[float]:
+        """ Returns the time in minutes of every leg from origins[k] to destinations[k] departing at departure_times[k].
+
+        The legs between stadiums of the tensor are looked up at once, each one at its own departure time, and the rest
+        are requested to the fallback proxy in a single call.
+        """
+        origin_rows = np.array([self.stadium_index.get(self._round(origin), -1) for origin in origins], dtype=np.intp)
+        destination_rows = np.array([self.stadium_index.get(self._round(destination), -1) for destination in destinations], dtype=np.intp)
+        known = (origin_rows >= 0) & (destination_rows >= 0)
+
+        minutes = np.full(len(origins), np.inf)
+        if known.any():
+            known_legs = np.flatnonzero(known)
+            minutes[known_legs] = self._lookup_pairs(
+                origin_rows[known_legs], destination_rows[known_legs], [departure_times[k] for k in known_legs])
+        if not known.all():
+            unknown_legs = np.flatnonzero(~known).tolist()
+            if self.fallback is None:
+                k = unknown_legs[0]
+                unknown = origins[k] if origin_rows[k] < 0 else destinations[k]
+                raise KeyError(f'the stadium at {unknown} is not in the travel time tensor')
+            minutes[unknown_legs] = self.fallback.route_temporal_distance_pairs(
+                [origins[k] for k in unknown_legs], [destinations[k] for k in unknown_legs], [departure_times[k] for k in unknown_legs])
+        return minutes.tolist()
+
+    def _lookup(self, origin_rows: np.ndarray, destination_rows: np.ndarray, departure_time: datetime | None) -> np.ndarray:
+        rows, columns = origin_rows[:, None], destination_rows[None, :]
+        if departure_time is None:
+            return self.tensor[rows, columns, :].min(axis=2)
+
+        before, after, weight = self._profiles(np.array([self._hour_of_week(departure_time)]))
+        return (1 - weight[0]) * self.tensor[rows, columns, before[0]] + weight[0] * self.tensor[rows, columns, after[0]]
+
+    def _lookup_pairs(self, origin_rows: np.ndarray, destination_rows: np.ndarray, departure_times: list[datetime | None]) -> np.ndarray:
+        minutes = np.empty(len(origin_rows))
+        timed = np.array([departure_time is not None for departure_time in departure_times], dtype=bool)
+        if not timed.all():
+            minutes[~timed] = self.tensor[origin_rows[~timed], destination_rows[~timed], :].min(axis=1)
+        if timed.any():
+            before, after, weight = self._profiles(np.array([
+                self._hour_of_week(departure_time) for departure_time in departure_times if departure_time is not None]))
+            rows, columns = origin_rows[timed], destination_rows[timed]
+            minutes[timed] = (1 - weight) * self.tensor[rows, columns, before] + weight * self.tensor[rows, columns, after]
+        return minutes
+
+    def _profiles(self, hours_of_week: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Returns the profiles before and after every hour of the week and the interpolation weight of the later one """
+        n_profiles = self.tensor.shape[2]
+        positions = hours_of_week / self.hour_step
+        before = positions.astype(np.intp) % n_profiles
+        return before, (before + 1) % n_profiles, positions - np.floor(positions)
+
+    def _hour_of_week(self, departure_time: datetime) -> float:
+        return departure_time.weekday() * 24 + departure_time.hour + departure_time.minute / 60 + departure_time.second / 3600
+
+    def _round(self, point: tuple[float, float]) -> tuple[float, float]:
+        return round(point[0], self.COORDINATES_PRECISION), round(point[1], self.COORDINATES_PRECISION)
+
+
+def build_travel_time_tensor(path: str, stadiums: list[tuple[float, float]], routes_proxy: AbstractRouteProxy, week: datetime | None = None, hour_step: int = 1):
+    """ Writes the tensor of the travel times between every pair of stadiums read by TensorRouteProxy.
+
+    The profile of every hour_step hours of the week starting on the Monday of week is requested to routes_proxy as
+    one matrix, or a single profile if its travel times do not depend on the departure time. The files are written next to their final path and moved there once complete, so the proxies of other
+    processes never map a half-written tensor.
+    """
+    if TensorRouteProxy.HOURS_PER_WEEK % hour_step:
+        raise ValueError(f'hour_step must divide {TensorRouteProxy.HOURS_PER_WEEK}')
+    if not routes_proxy.time_dependent:
+        logger.info(f'[build_travel_time_tensor] {routes_proxy.version} ignores the departure time, building a single profile')
+        hour_step = TensorRouteProxy.HOURS_PER_WEEK
+    week = week or datetime.now()
+    monday = datetime(week.year, week.month, week.day) - timedelta(days=week.weekday())
+    n_profiles = TensorRouteProxy.HOURS_PER_WEEK // hour_step
+
+    makedirs(dirname(abspath(path)), exist_ok=True)
+    tensor = np.lib.format.open_memmap(f'{path}.tmp.npy', mode='w+', dtype=np.float32, shape=(len(stadiums), len(stadiums), n_profiles))
+    for profile in range(n_profiles):
+        departure_time = monday + timedelta(hours=profile * hour_step)
+        logger.info(f'[build_travel_time_tensor] profile {profile+1}/{n_profiles}, departing at {departure_time}')
+        tensor[:, :, profile] = routes_proxy.route_temporal_distance_matrix(stadiums, stadiums, departure_time)
+    tensor.flush()
+    del tensor
+
+    with open(f'{path}.tmp.json', 'w') as f:
+        json.dump({
+            'stadiums': [list(stadium) for stadium in stadiums],
+            'hour_step': hour_step,
+            'version': routes_proxy.version,
+            'built_at': datetime.now().isoformat(timespec='seconds')
+        }, f)
+    replace(f'{path}.tmp.npy', f'{path}.npy')
+    replace(f'{path}.tmp.json', f'{path}.json')
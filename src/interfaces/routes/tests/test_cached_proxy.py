@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from interfaces.routes import AbstractRouteProxy, CachedRouteProxy
+
+
+class CountingRouteProxy(AbstractRouteProxy):
+    def __init__(self):
+        self.pairs = 0
+
+    def route_temporal_distance(self, origin, destination, departure_time=None) -> float:
+        self.pairs += 1
+        return abs(origin[0] - destination[0]) * 100
+
+
+DEPARTURE_TIME = datetime(2023, 5, 6, 10)
+STADIUMS = [(41.0, 2.0), (41.5, 2.0), (42.0, 2.0)]
+
+
+def test_repeated_matrix_makes_no_calls(tmp_path):
+    routes_proxy = CountingRouteProxy()
+    cached_proxy = CachedRouteProxy(routes_proxy, path=str(tmp_path / 'cache.sqlite3'))
+
+    first = cached_proxy.route_temporal_distance_matrix(STADIUMS, STADIUMS, DEPARTURE_TIME)
+    assert routes_proxy.pairs == 9
+    assert cached_proxy.stats == {'hits': 0, 'misses': 9}
+
+    # same weekday and hour bucket, another week and a reopened cache
+    reopened_proxy = CachedRouteProxy(routes_proxy, path=str(tmp_path / 'cache.sqlite3'))
+    second = reopened_proxy.route_temporal_distance_matrix(
+        STADIUMS, STADIUMS, DEPARTURE_TIME + timedelta(days=7, minutes=20))
+    assert second == first
+    assert routes_proxy.pairs == 9
+    assert reopened_proxy.stats == {'hits': 9, 'misses': 0}
+
+
+def test_only_missing_pairs_are_requested(tmp_path):
+    routes_proxy = CountingRouteProxy()
+    cached_proxy = CachedRouteProxy(routes_proxy, path=str(tmp_path / 'cache.sqlite3'))
+
+    cached_proxy.route_temporal_distance_matrix(STADIUMS[:2], STADIUMS[:2], DEPARTURE_TIME)
+    routes_proxy.pairs = 0
+    cached_proxy.route_temporal_distance_matrix(STADIUMS, STADIUMS[:2], DEPARTURE_TIME)
+    assert routes_proxy.pairs == 2
+
+
+def test_expired_and_evicted_entries(tmp_path):
+    routes_proxy = CountingRouteProxy()
+    cached_proxy = CachedRouteProxy(routes_proxy, path=str(tmp_path / 'cache.sqlite3'), max_entries=4)
+
+    cached_proxy.route_temporal_distance_matrix(STADIUMS, STADIUMS, DEPARTURE_TIME)
+    assert cached_proxy._connection.execute('SELECT COUNT(*) FROM travel_times').fetchone()[0] == 4
+
+    cached_proxy.ttl = timedelta(seconds=-1)
+    routes_proxy.pairs = 0
+    cached_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1], DEPARTURE_TIME)
+    assert routes_proxy.pairs == 1
@@ -0,0 +1,104 @@
+from datetime import datetime
+import numpy as np
+import pytest
+
+from interfaces.routes import AbstractRouteProxy, TensorRouteProxy
+from interfaces.routes.tensor_proxy import build_travel_time_tensor
+
+
+MONDAY = datetime(2023, 5, 1)
+STADIUMS = [(41.0, 2.0), (41.5, 2.0), (42.0, 2.5)]
+
+
+class RushHourRouteProxy(AbstractRouteProxy):
+    """Drives at 1 minute per 0.01 degrees, 1% slower for every hour of the week that has gone by."""
+
+    def __init__(self):
+        self.matrix_calls = 0
+
+    def route_temporal_distance(self, origin, destination, departure_time=None) -> float:
+        hour_of_week = departure_time.weekday() * 24 + departure_time.hour
+        return (abs(origin[0] - destination[0]) + abs(origin[1] - destination[1])) * 100 * (1 + hour_of_week / 100)
+
+    def route_temporal_distance_matrix(self, origins, destinations, departure_time=None) -> list[list[float]]:
+        self.matrix_calls += 1
+        return super().route_temporal_distance_matrix(origins, destinations, departure_time)
+
+
+def test_lookups_interpolate_between_the_hourly_profiles(tmp_path):
+    routes_proxy = RushHourRouteProxy()
+    build_travel_time_tensor(str(tmp_path / 'tensor'), STADIUMS, routes_proxy, datetime(2023, 5, 3), hour_step=6)
+    assert routes_proxy.matrix_calls == 28
+
+    tensor_proxy = TensorRouteProxy(str(tmp_path / 'tensor'))
+    assert isinstance(tensor_proxy.tensor, np.memmap)
+    assert tensor_proxy.version.startswith('tensor/RushHourRouteProxy/')
+
+    saturday_noon = datetime(2023, 5, 6, 12)
+    assert tensor_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1], saturday_noon) == pytest.approx(
+        routes_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1], saturday_noon), rel=1e-6)
+    # 15:00 is halfway between the profiles of 12:00 and 18:00
+    assert tensor_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1], saturday_noon.replace(hour=15)) == pytest.approx(
+        50 * (1 + 135 / 100), rel=1e-6)
+    # the profiles wrap around from Sunday to Monday
+    assert tensor_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1], datetime(2023, 5, 7, 21)) == pytest.approx(
+        50 * (1 + (162 / 100 + 0) / 2), rel=1e-6)
+    assert tensor_proxy.route_temporal_distance(STADIUMS[0], STADIUMS[1]) == pytest.approx(50, rel=1e-6)
+
+    matrix = tensor_proxy.route_temporal_distance_matrix(STADIUMS, STADIUMS[::-1], saturday_noon)
+    assert np.allclose(matrix, routes_proxy.route_temporal_distance_matrix(STADIUMS, STADIUMS[::-1], saturday_noon))
+
+
+def test_unknown_stadiums_are_routed_by_the_fallback(tmp_path):
+    build_travel_time_tensor(str(tmp_path / 'tensor'), STADIUMS, RushHourRouteProxy(), MONDAY, hour_step=168)
+    fallback = RushHourRouteProxy()
+    tensor_proxy = TensorRouteProxy(str(tmp_path / 'tensor'), fallback)
+
+    new_stadium = (41.2, 2.2)
+    origins, destinations = [STADIUMS[0], new_stadium], [new_stadium, STADIUMS[1], STADIUMS[2]]
+    matrix = tensor_proxy.route_temporal_distance_matrix(origins, destinations, MONDAY)
+    assert np.allclose(matrix, fallback.route_temporal_distance_matrix(origins, destinations, MONDAY))
+    assert fallback.matrix_calls == 3
+
+    with pytest.raises(KeyError):
+        TensorRouteProxy(str(tmp_path / 'tensor')).route_temporal_distance(STADIUMS[0], new_stadium, MONDAY)
+    with pytest.raises(FileNotFoundError):
+        TensorRouteProxy(str(tmp_path / 'missing'))
+    assert TensorRouteProxy(str(tmp_path / 'missing'), fallback).version == fallback.version
+
+
+def test_every_leg_is_looked_up_at_its_own_departure_time(tmp_path):
+    build_travel_time_tensor(str(tmp_path / 'tensor'), STADIUMS, RushHourRouteProxy(), MONDAY)
+    fallback = RushHourRouteProxy()
+    tensor_proxy = TensorRouteProxy(str(tmp_path / 'tensor'), fallback)
+    assert tensor_proxy.tensor.shape[2] == 168
+
+    new_stadium = (41.2, 2.2)
+    origins = [STADIUMS[0], STADIUMS[0], STADIUMS[2], new_stadium]
+    destinations = [STADIUMS[1], STADIUMS[1], STADIUMS[0], STADIUMS[1]]
+    departure_times = [datetime(2023, 5, 6, 10), datetime(2023, 5, 6, 19), datetime(2023, 5, 6, 21), datetime(2023, 5, 6, 12)]
+    minutes = tensor_proxy.route_temporal_distance_pairs(origins, destinations, departure_times)
+    assert minutes == pytest.approx([
+        fallback.route_temporal_distance(*leg) for leg in zip(origins, destinations, departure_times)], rel=1e-6)
+    assert minutes[0] < minutes[1]
+    assert fallback.matrix_calls == 1
+
+
+class SteadyRouteProxy(RushHourRouteProxy):
+    """Drives as RushHourRouteProxy on Monday at 00:00, whatever the departure time."""
+
+    time_dependent = False
+
+    def route_temporal_distance(self, origin, destination, departure_time=None) -> float:
+        return super().route_temporal_distance(origin, destination, MONDAY)
+
+
+def test_a_proxy_that_ignores_the_departure_time_gets_a_single_profile(tmp_path):
+    routes_proxy = SteadyRouteProxy()
+    build_travel_time_tensor(str(tmp_path / 'tensor'), STADIUMS, routes_proxy, MONDAY)
+    assert routes_proxy.matrix_calls == 1
+
+    tensor_proxy = TensorRouteProxy(str(tmp_path / 'tensor'))
+    assert tensor_proxy.tensor.shape[2] == 1 and not tensor_proxy.time_dependent
+    assert tensor_proxy.route_temporal_distance_pairs(STADIUMS, STADIUMS[::-1], [datetime(2023, 5, 6, 19)] * 3) == pytest.approx(
+        [routes_proxy.route_temporal_distance(*leg) for leg in zip(STADIUMS, STADIUMS[::-1])], rel=1e-6)
@@ -1,9 +1,39 @@
+from os.path import join, dirname, abspath
+from multiprocessing import get_context
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
+import shutil
 
 from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
 
-def run_matches_spider():
-    process = CrawlerProcess(get_project_settings())
-    process.crawl(MatchesSpider)
-    process.start()
\ No newline at end of file
+FULL_SEASON_JOBDIR = join(dirname(abspath(__file__)), '../../../var/crawls/full-season')
+
+def run_matches_spider(start_urls: list[str] | None = None, full_season: bool = False):
+    """ Crawls start_urls, or every page of MatchesSpider.start_urls, and waits for the crawl to finish.
+
+    The crawl runs in a child process because the Twisted reactor can not be restarted, so this function can be
+    called any number of times from a long-running process. With full_season, every group and jornada of the start
+    pages is crawled, checkpointing the crawl in FULL_SEASON_JOBDIR so that an interrupted crawl resumes where it
+    stopped the next time.
+    """
+    process = get_context('spawn').Process(target=_crawl, args=(start_urls, full_season))
+    process.start()
+    process.join()
+
+def _crawl(start_urls: list[str] | None, full_season: bool):
+    settings = get_project_settings()
+    if full_season:
+        settings.set('FULL_SEASON_CRAWL', True)
+        settings.set('JOBDIR', FULL_SEASON_JOBDIR)
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(MatchesSpider)
+    if start_urls is None:
+        process.crawl(crawler)
+    else:
+        process.crawl(crawler, start_urls=start_urls)
+    process.start()
+
+    # the checkpoint of a finished crawl would make the next one skip every page it has already seen
+    if full_season and crawler.stats.get_value('finish_reason') == 'finished':
+        shutil.rmtree(FULL_SEASON_JOBDIR, ignore_errors=True)
@@ -0,0 +1,63 @@
+import pytest
+
+from interfaces.scraper import matches
+
+
+class FakeCrawler:
+    def __init__(self, finish_reason: str):
+        self.stats = StatsCollector(finish_reason)
+
+
+class StatsCollector:
+    def __init__(self, finish_reason: str):
+        self.values = {'finish_reason': finish_reason}
+
+    def get_value(self, key: str):
+        return self.values.get(key)
+
+
+class FakeCrawlerProcess:
+    """Runs no crawl, the crawler finishes with the finish_reason of the class."""
+
+    finish_reason = 'finished'
+
+    def __init__(self, settings):
+        self.settings = settings
+        FakeCrawlerProcess.last = self
+
+    def create_crawler(self, spider_class):
+        return FakeCrawler(self.finish_reason)
+
+    def crawl(self, crawler, **kwargs):
+        self.crawl_kwargs = kwargs
+
+    def start(self):
+        pass
+
+
+@pytest.fixture
+def jobdir(tmp_path, monkeypatch):
+    jobdir = tmp_path / 'full-season'
+    (jobdir / 'requests.queue').mkdir(parents=True)
+    monkeypatch.setattr(matches, 'FULL_SEASON_JOBDIR', str(jobdir))
+    monkeypatch.setattr(matches, 'CrawlerProcess', FakeCrawlerProcess)
+    return jobdir
+
+
+def test_a_finished_full_season_crawl_removes_its_checkpoint(jobdir):
+    matches._crawl(None, full_season=True)
+
+    assert FakeCrawlerProcess.last.settings.getbool('FULL_SEASON_CRAWL')
+    assert FakeCrawlerProcess.last.settings.get('JOBDIR') == str(jobdir)
+    assert not jobdir.exists()
+
+
+def test_an_interrupted_full_season_crawl_keeps_its_checkpoint(jobdir, monkeypatch):
+    monkeypatch.setattr(FakeCrawlerProcess, 'finish_reason', 'shutdown')
+    matches._crawl(None, full_season=True)
+    assert jobdir.exists()
+
+    monkeypatch.setattr(FakeCrawlerProcess, 'finish_reason', 'finished')
+    matches._crawl(['https://www.fcf.cat/resultats/2223/futbol-11/segona-federacio/grup-3'], full_season=False)
+    assert not FakeCrawlerProcess.last.settings.getbool('FULL_SEASON_CRAWL')
+    assert jobdir.exists()
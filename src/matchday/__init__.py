@@ -1 +1,3 @@
-from .matchday import Matchday
\ No newline at end of file
+from .matchday import Matchday
+from .cache import MatchdayCache
+from .planner import Scout
\ No newline at end of file
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable
+import logging
+import threading
+
+from .matchday import Matchday
+from .utils import parse_matchday_date
+
+logger = logging.getLogger(__name__)
+
+
+class MatchdayCache:
+    """Process-wide LRU cache of the Matchday of every (season, date), shared by all the chats.
+
+    A Matchday is built once however many threads ask for it at the same time: the first one builds it and the rest
+    wait for its result. The least recently used matchdays are evicted while the cached ones take more than max_bytes,
+    and the matchdays built before the matches last changed are built again, which is checked against the crawl
+    states at most every FRESHNESS_CHECK_INTERVAL. Crawls that find the same matches do not drop anything.
+    """
+
+    MAX_BYTES = 512 * 1024**2
+    FRESHNESS_CHECK_INTERVAL = timedelta(minutes=1)
+
+    def __init__(self, max_bytes: int | None = None, freshness_check_interval: timedelta | None = None,
+        build: Callable[..., Matchday] = Matchday, last_changed_at: Callable[[], datetime | None] = Matchday.last_changed_at):
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.freshness_check_interval = freshness_check_interval or self.FRESHNESS_CHECK_INTERVAL
+        self.build = build
+        self.get_last_changed_at = last_changed_at
+        self.entries: OrderedDict[tuple[str, datetime], Future] = OrderedDict()
+        self.built_at: dict[tuple[str, datetime], datetime] = {}
+        self.sizes: dict[tuple[str, datetime], int] = {}
+        self.last_changed_at = None
+        self.changed_seen_at = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def get(self, date: datetime | str | None = None, season: str | None = None, **kwargs) -> Matchday:
+        """Returns the Matchday of a date, building it if it is not cached or the matches have changed since."""
+
+        key = (season or Matchday.season, parse_matchday_date(date, **kwargs))
+        self._invalidate_if_changed()
+        with self.lock:
+            if (future := self.entries.get(key)) is not None:
+                self.entries.move_to_end(key)
+                building = False
+            else:
+                future = self.entries[key] = Future()
+                building = True
+
+        if not building:
+            return future.result()
+
+        # the matches are read when the build starts, a change seen afterwards makes the matchday outdated
+        started_at = datetime.now()
+        try:
+            matchday = self.build(date=key[1], season=key[0])
+        except BaseException as e:
+            with self.lock:
+                if self.entries.get(key) is future:
+                    del self.entries[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            if self.entries.get(key) is future:
+                if self.changed_seen_at is not None and started_at < self.changed_seen_at:
+                    del self.entries[key]
+                else:
+                    self.built_at[key] = started_at
+                    self.sizes[key] = matchday.nbytes
+                    self._evict(keep=key)
+        future.set_result(matchday)
+        return matchday
+
+    def get_cached(self, date: datetime | str | None = None, season: str | None = None, **kwargs) -> Matchday | None:
+        """Returns the Matchday of a date if it is built and was up to date at the last check of the crawl states, or
+        None if it would have to be built or checked, which get does."""
+
+        key = (season or Matchday.season, parse_matchday_date(date, **kwargs))
+        with self.lock:
+            if self.checked_at is None or datetime.now() - self.checked_at >= self.freshness_check_interval:
+                return None
+            if (future := self.entries.get(key)) is None or not future.done():
+                return None
+            self.entries.move_to_end(key)
+        return future.result()
+
+    def invalidate(self, date: datetime | str | None = None, season: str | None = None, **kwargs):
+        """Drops the Matchday of a date, or every one if no date is given. Threads already waiting for it still get
+        it."""
+
+        with self.lock:
+            if date is None and season is None and not kwargs:
+                keys = list(self.entries)
+            else:
+                keys = [(season or Matchday.season, parse_matchday_date(date, **kwargs))]
+            for key in keys:
+                self._drop(key)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.sizes.values())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: tuple[str, datetime]) -> bool:
+        return key in self.entries
+
+    def _invalidate_if_changed(self):
+        now = datetime.now()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < self.freshness_check_interval:
+                return
+            first_check = self.checked_at is None
+            self.checked_at = now
+
+        last_changed_at = self.get_last_changed_at()
+        # the crawl states are saved after the matches, so the builds started from now on read the changed matches,
+        # while the ones started before may have read them before they were saved
+        seen_at = datetime.now()
+        with self.lock:
+            if last_changed_at is None or last_changed_at == self.last_changed_at:
+                return
+            self.last_changed_at = last_changed_at
+            # nothing has been built before the first check
+            if first_check:
+                return
+            self.changed_seen_at = seen_at
+            outdated = [key for key, built_at in self.built_at.items() if built_at < seen_at]
+            for key in outdated:
+                self._drop(key)
+        if outdated:
+            logger.info(f'[MatchdayCache] matches changed at {last_changed_at}, dropped {len(outdated)} matchdays')
+
+    def _evict(self, keep: tuple[str, datetime]):
+        # the matchdays that are still being built have no size yet and are never evicted
+        for key in list(self.entries):
+            if self.nbytes <= self.max_bytes:
+                return
+            if key != keep and key in self.sizes:
+                logger.info(f'[MatchdayCache] evicting the matchday of {key[1].date()}')
+                self._drop(key)
+
+    def _drop(self, key: tuple[str, datetime]):
+        self.entries.pop(key, None)
+        self.built_at.pop(key, None)
+        self.sizes.pop(key, None)
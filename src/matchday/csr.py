@@ -0,0 +1,307 @@
+from functools import cached_property
+from itertools import islice
+from typing import Iterable, Iterator
+import numpy as np
+from networkx import DiGraph
+
+from .paths import diverse_paths, flow_disjoint_paths
+
+
+class CSRGraph:
+    """Read-only matchday graph with integer node ids and its adjacency in CSR format.
+
+    The successors of node i are indices[indptr[i]:indptr[i+1]], with the weights of the edges at the same positions of
+    edge_weights, and the predecessors are kept in the same way in the transposed arrays. Nodes are also named by the
+    ids of the DiGraph they come from, so the graphs can be converted back and forth, and the attributes of the graph
+    are kept in graph as in a DiGraph.
+    """
+
+    def __init__(self, node_ids: list[str], node_weights: np.ndarray, indptr: np.ndarray, indices: np.ndarray, edge_weights: np.ndarray):
+        self.node_ids = node_ids
+        self.node_weights = node_weights
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_weights = edge_weights
+        self.graph = {}
+        self.reverse_indptr, self.reverse_indices = self._transpose()
+
+    @cached_property
+    def node_index(self) -> dict[str, int]:
+        # built on first use, as the subgraphs that the planner filters are only walked by integer id
+        return {node: i for i, node in enumerate(self.node_ids)}
+
+    @classmethod
+    def from_edges(cls, node_ids: list[str], node_weights: Iterable[float], origins: np.ndarray, destinations: np.ndarray, edge_weights: np.ndarray) -> 'CSRGraph':
+        """Returns the graph of the edges (origins[k], destinations[k]) between the integer ids of node_ids."""
+
+        origins = np.asarray(origins, dtype=np.int32)
+        order = np.argsort(origins, kind='stable')
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(origins, minlength=len(node_ids)), out=indptr[1:])
+        return cls(
+            node_ids,
+            np.asarray(node_weights, dtype=np.float64) if isinstance(node_weights, np.ndarray) else np.fromiter(node_weights, dtype=np.float64),
+            indptr,
+            np.asarray(destinations, dtype=np.int32)[order],
+            np.asarray(edge_weights, dtype=np.float64)[order])
+
+    @classmethod
+    def from_digraph(cls, graph: DiGraph, node_ids: list[str] | None = None) -> 'CSRGraph':
+        """Returns the CSR graph of a matchday DiGraph, with the node and edge 'weight' attributes. The nodes are
+        numbered in the order of node_ids, which must be the nodes of graph, if given."""
+
+        node_ids = list(graph.nodes) if node_ids is None else list(node_ids)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        edges = list(graph.edges(data='weight', default=0.0))
+        node_weights = graph.nodes(data='weight', default=0.0)
+        csr_graph = cls.from_edges(
+            node_ids,
+            (node_weights[node] for node in node_ids),
+            [node_index[origin] for origin, _, _ in edges],
+            [node_index[destination] for _, destination, _ in edges],
+            [weight for _, _, weight in edges])
+        csr_graph.graph.update(graph.graph)
+        return csr_graph
+
+    def renumbered(self, node_ids: list[str]) -> 'CSRGraph':
+        """Returns the graph with its nodes numbered in the order of node_ids, which must be its nodes."""
+
+        if node_ids == self.node_ids:
+            return self
+        old_ids = np.array([self.node_index[node] for node in node_ids], dtype=np.int32)
+        new_ids = np.empty(len(self), dtype=np.int32)
+        new_ids[old_ids] = np.arange(len(self), dtype=np.int32)
+        origins = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        csr_graph = CSRGraph.from_edges(
+            list(node_ids), self.node_weights[old_ids], new_ids[origins], new_ids[self.indices], self.edge_weights)
+        csr_graph.graph.update(self.graph)
+        return csr_graph
+
+    def to_digraph(self) -> DiGraph:
+        """Returns the graph as a networkx DiGraph."""
+
+        graph = DiGraph()
+        graph.add_nodes_from(
+            (node, {'weight': weight}) for node, weight in zip(self.node_ids, self.node_weights.tolist()))
+        origins = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        graph.add_weighted_edges_from(zip(
+            (self.node_ids[origin] for origin in origins.tolist()),
+            (self.node_ids[destination] for destination in self.indices.tolist()),
+            self.edge_weights.tolist()))
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def nodes(self) -> list[str]:
+        return self.node_ids
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the memory taken by the arrays, without the node ids."""
+
+        return sum(array.nbytes for array in (
+            self.node_weights, self.indptr, self.indices, self.edge_weights, self.reverse_indptr, self.reverse_indices))
+
+    def successors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+
+    def predecessors(self, node: int) -> np.ndarray:
+        return self.reverse_indices[self.reverse_indptr[node]:self.reverse_indptr[node+1]]
+
+    def mask(self, nodes: Iterable[str]) -> np.ndarray:
+        """Returns the boolean mask of the nodes with the given ids."""
+
+        mask = np.zeros(len(self), dtype=bool)
+        mask[[self.node_index[node] for node in nodes if node in self.node_index]] = True
+        return mask
+
+    def descendants(self, sources: np.ndarray, within: np.ndarray | None = None) -> np.ndarray:
+        """Returns the mask of the nodes reachable from the nodes of the sources mask, which are not included unless
+        they are reachable from another source, going only through the nodes of the within mask if given."""
+
+        return self._reach(sources, self.indptr, self.indices, within)
+
+    def ancestors(self, targets: np.ndarray, within: np.ndarray | None = None) -> np.ndarray:
+        """Returns the mask of the nodes that reach the nodes of the targets mask, which are not included unless they
+        reach another target, going only through the nodes of the within mask if given."""
+
+        return self._reach(targets, self.reverse_indptr, self.reverse_indices, within)
+
+    def subgraph(self, mask: np.ndarray) -> 'CSRGraph':
+        """Returns the graph induced by the nodes of mask, renumbered in the same order."""
+
+        new_ids = np.cumsum(mask, dtype=np.int32) - 1
+        origins = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        kept_edges = mask[origins] & mask[self.indices]
+        return CSRGraph.from_edges(
+            [self.node_ids[node] for node in np.flatnonzero(mask).tolist()],
+            self.node_weights[mask],
+            new_ids[origins[kept_edges]],
+            new_ids[self.indices[kept_edges]],
+            self.edge_weights[kept_edges])
+
+    def topological_order(self) -> np.ndarray:
+        """Returns the nodes in a topological order, raising ValueError if the graph has a cycle."""
+
+        return np.concatenate([np.empty(0, dtype=np.int32), *self.levels()])
+
+    def levels(self) -> list[np.ndarray]:
+        """Returns the nodes grouped in levels such that the predecessors of a node are in earlier levels, raising
+        ValueError if the graph has a cycle."""
+
+        in_degree = np.diff(self.reverse_indptr)
+        levels = []
+        frontier = np.flatnonzero(in_degree == 0)
+        while len(frontier):
+            levels.append(frontier)
+            successors, _ = _gather(self.indptr, self.indices, frontier)
+            decrements = np.bincount(successors, minlength=len(self))
+            in_degree -= decrements
+            frontier = np.flatnonzero((decrements > 0) & (in_degree == 0))
+        if sum(map(len, levels)) != len(self):
+            raise ValueError('the graph has a cycle')
+        return levels
+
+    def longest_paths(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns, for every node, the maximum total node weight of a path ending at it, and the mask of the reverse
+        adjacency arrays of the predecessors that tie for it.
+
+        The nodes of a level only depend on earlier levels, so every level is relaxed at once.
+        """
+
+        best_weight = self.node_weights.copy()
+        predecessors_weight = np.full(len(self), -np.inf)
+        for level in self.levels()[1:]:
+            predecessors, n_predecessors = _gather(self.reverse_indptr, self.reverse_indices, level)
+            predecessors_weight[level] = np.maximum.reduceat(
+                best_weight[predecessors], np.cumsum(n_predecessors) - n_predecessors)
+            best_weight[level] += predecessors_weight[level]
+
+        targets = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.reverse_indptr))
+        return best_weight, best_weight[self.reverse_indices] == predecessors_weight[targets]
+
+    def most_interesting_paths(self, max_paths: int | None = None) -> list[list[str]]:
+        """Returns the same paths as paths.most_interesting_paths on the DiGraph of this graph, possibly in another
+        order."""
+
+        if not len(self):
+            return []
+        best_weight, ties = self.longest_paths()
+        paths = (
+            [self.node_ids[node] for node in path]
+            for node in np.flatnonzero(best_weight == best_weight.max()).tolist()
+            for path in self._paths_to(node, ties))
+        return list(islice(paths, max_paths))
+
+    def k_best_paths(self, k: int, diversity: float = 0.0, candidates_factor: int = 5) -> list[tuple[float, list[str]]]:
+        """Returns the same (weight, path) tuples as paths.k_best_paths on the DiGraph of this graph, up to the order
+        of the tied paths.
+
+        The labels of every node are rows of (n_nodes, n_labels) arrays, padded with -inf weights, and the labels of
+        all the nodes of a level are merged at once: the labels of their predecessors are sorted by node and weight
+        and the first n_labels of every node are kept.
+        """
+
+        n_labels = k if not diversity else k * candidates_factor
+        if not len(self):
+            return []
+        label_weights = np.full((len(self), n_labels), -np.inf)
+        label_predecessors = np.full((len(self), n_labels), -1, dtype=np.int32)
+        label_ranks = np.full((len(self), n_labels), -1, dtype=np.int32)
+        levels = self.levels()
+        label_weights[levels[0], 0] = self.node_weights[levels[0]]
+
+        for level in levels[1:]:
+            predecessors, n_predecessors = _gather(self.reverse_indptr, self.reverse_indices, level)
+            targets = np.repeat(level, n_predecessors)
+            weights = label_weights[predecessors] + self.node_weights[targets][:, None]
+            valid = np.isfinite(weights).reshape(-1)
+            weights = weights.reshape(-1)[valid]
+            targets = np.repeat(targets, n_labels)[valid]
+            predecessors = np.repeat(predecessors, n_labels)[valid]
+            ranks = np.tile(np.arange(n_labels, dtype=np.int32), len(valid) // n_labels)[valid]
+
+            # a stable sort keeps the predecessors and their labels in order among the tied weights, as heapq.nlargest
+            order = np.lexsort((-weights, targets))
+            targets = targets[order]
+            group_starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+            positions = np.arange(len(targets)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(targets)]))
+            top = positions < n_labels
+            kept, slots = order[top], (targets[top], positions[top])
+            label_weights[slots] = weights[kept]
+            label_predecessors[slots] = predecessors[kept]
+            label_ranks[slots] = ranks[kept]
+
+        sinks = self.topological_order()
+        sinks = sinks[np.diff(self.indptr)[sinks] == 0]
+        weights = label_weights[sinks].reshape(-1)
+        nodes = np.repeat(sinks, n_labels)
+        ranks = np.tile(np.arange(n_labels), len(sinks))
+        order = np.argsort(-weights, kind='stable')[:n_labels]
+        order = order[np.isfinite(weights[order])]
+
+        candidates = []
+        for weight, node, rank in zip(weights[order].tolist(), nodes[order].tolist(), ranks[order].tolist()):
+            reversed_path = []
+            while node >= 0:
+                reversed_path.append(self.node_ids[node])
+                node, rank = int(label_predecessors[node, rank]), int(label_ranks[node, rank])
+            candidates.append((weight, reversed_path[::-1]))
+        return diverse_paths(candidates, k, diversity)
+
+    def disjoint_paths(self, start_nodes: list[set[str] | None], weight_scale: int = 1000) -> list[list[str]]:
+        """Returns the same paths as paths.disjoint_paths on the DiGraph of this graph, building the flow graph from
+        the arrays."""
+
+        origins = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        return flow_disjoint_paths(
+            zip(self.node_ids, self.node_weights.tolist()),
+            zip((self.node_ids[origin] for origin in origins.tolist()), (self.node_ids[destination] for destination in self.indices.tolist())),
+            start_nodes, weight_scale)
+
+    def _paths_to(self, node: int, ties: np.ndarray) -> Iterator[list[int]]:
+        stack = [(node, [node])]
+        while stack:
+            node, reversed_path = stack.pop()
+            start, end = self.reverse_indptr[node], self.reverse_indptr[node+1]
+            best_predecessors = self.reverse_indices[start:end][ties[start:end]].tolist()
+            if not best_predecessors:
+                yield reversed_path[::-1]
+            for predecessor in best_predecessors:
+                stack.append((predecessor, reversed_path + [predecessor]))
+
+    def _reach(self, sources: np.ndarray, indptr: np.ndarray, indices: np.ndarray, within: np.ndarray | None) -> np.ndarray:
+        reached = np.zeros(len(self), dtype=bool)
+        frontier = np.flatnonzero(sources)
+        while len(frontier):
+            neighbours, _ = _gather(indptr, indices, frontier)
+            new = np.zeros(len(self), dtype=bool)
+            new[neighbours] = True
+            new &= ~reached
+            if within is not None:
+                new &= within
+            reached |= new
+            frontier = np.flatnonzero(new)
+        return reached
+
+    def _transpose(self) -> tuple[np.ndarray, np.ndarray]:
+        origins = np.repeat(np.arange(len(self.node_ids), dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        reverse_indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.node_ids)), out=reverse_indptr[1:])
+        return reverse_indptr, origins[order]
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the concatenated neighbours of nodes in a CSR adjacency and the number of neighbours of every node."""
+
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return indices[offsets + np.arange(len(offsets))], lengths
@@ -1,35 +1,78 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 
 from interfaces.scraper import run_matches_spider
 from interfaces.database import MongoDBDatabaseProxy
-from interfaces.routes import OpenRouteServiceProxy
+from interfaces.routes import OpenRouteServiceProxy, CachedRouteProxy, TensorRouteProxy
 from scraper.scoutingplanner_scrapy.items import Match
+from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
 
-from .planner import Planner
+from .planner import Planner, Scout
+from .table import MatchTable
 from .utils import parse_matchday_date
 
 
 class Matchday:
     db_proxy = MongoDBDatabaseProxy()
-    routes_proxy = OpenRouteServiceProxy()
     season = 'TEMPORADA 2022-2023'
+    # the travel times between the stadiums of the season are precomputed by scheduler.travel_times, only the new
+    # stadiums are routed live
+    routes_proxy = TensorRouteProxy.from_season(season, fallback=CachedRouteProxy(OpenRouteServiceProxy()))
+    graph_backend = 'csr'
+    MAX_STALENESS = timedelta(hours=6)
 
-    def __init__(self, date: datetime | str = None, **kwargs):
+    def __init__(self, date: datetime | str = None, max_staleness: timedelta | None = None, season: str | None = None, **kwargs):
         self.date = parse_matchday_date(date, **kwargs)
+        self.season = season or self.season
+        self.max_staleness = max_staleness or self.MAX_STALENESS
 
-        run_matches_spider()
-        self.matches = self.db_proxy.get_matches(season=self.season, timestamp=self.date)
-        self.reachable_matches = list(filter(
-            lambda m: m.latlon is not None and m.timestamp is not None, self.matches
-        ))
-        self.reachable_matches = sorted(self.reachable_matches, key=lambda m: m.timestamp)
+        # the scheduler keeps the matches fresh, only crawl here if it has fallen behind
+        if self.is_stale():
+            run_matches_spider()
+        self.table = MatchTable.from_records(self.db_proxy.get_matches(season=self.season, timestamp=self.date, as_dict=True))
+        self.reachable_table = self.table.reachable()
 
-        self.planner = Planner(db_proxy=self.db_proxy, routes_proxy=self.routes_proxy, matches=self.reachable_matches, date=self.date, season=self.season)
+        self.planner = Planner(db_proxy=self.db_proxy, routes_proxy=self.routes_proxy, matches=self.reachable_table, date=self.date, season=self.season,
+            graph_backend=self.graph_backend)
 
         self._competitions = None
 
+    def is_stale(self) -> bool:
+        """Returns whether some competition page has not been crawled in the last max_staleness."""
+        crawl_states = self.db_proxy.get_crawl_states(MatchesSpider.start_urls)
+        oldest_allowed = datetime.now() - self.max_staleness
+        return any(
+            crawl_states.get(url, {}).get('crawled_at') is None or crawl_states[url]['crawled_at'] < oldest_allowed
+            for url in MatchesSpider.start_urls)
+
+    @classmethod
+    def last_changed_at(cls) -> datetime | None:
+        """Returns when the matches of a crawled page last changed, including the jornadas of the full-season crawls,
+        or None if no page has been crawled. Pages that are not modified, or whose rows are the same, do not change
+        it."""
+        return cls.db_proxy.get_last_changed_at()
+
+    @property
+    def nbytes(self) -> int:
+        """Returns an estimate of the memory taken by the matches and the graphs of the matchday."""
+        return self.table.nbytes + self.planner.nbytes
+
+    @property
+    def matches(self) -> list[Match]:
+        return self.table.to_matches()
+
+    @property
+    def reachable_matches(self) -> list[Match]:
+        return self.reachable_table.to_matches()
+
+    def competition_matches(self, competition: str) -> list[Match]:
+        return self.table.to_matches(np.flatnonzero(self.table.isin('competition', [competition])).tolist())
+
     def routes(self, **kwargs) -> list[list[Match]]:
         return self.planner.routes(**kwargs)
+
+    def team_routes(self, scouts: list[Scout], **kwargs) -> list[list[Match]]:
+        return self.planner.team_routes(scouts, **kwargs)
     
     @property
     def competitions(self) -> dict:
@@ -38,13 +81,4 @@ class Matchday:
         return self._competitions
     
     def _set_competitions(self):
-        self._competitions = {}
-        for match in self.matches:
-            if match.competition not in self._competitions:
-                self._competitions[match.competition] = {
-                    'matches': 1,
-                    'matchday': {str(match.matchday)}
-                    }
-            else:
-                self._competitions[match.competition]['matches'] += 1
-                self._competitions[match.competition]['matchday'].add(str(match.matchday))
+        self._competitions = self.table.competitions()
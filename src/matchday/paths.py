@@ -0,0 +1,187 @@
+from itertools import islice
+from typing import Iterable, Iterator
+import heapq
+from networkx import DiGraph, topological_sort, min_cost_flow
+
+
+def most_interesting_paths(graph: DiGraph, max_paths: int | None = None) -> list[list[str]]:
+    """Returns the paths of graph, starting at a source node, with the maximum total node weight.
+
+    The best weight of every node is computed once, in topological order, keeping only pointers to the predecessors
+    that tie for it, so the cost is O(V+E). The tied paths are rebuilt lazily from those pointers and at most
+    max_paths of them are returned.
+    """
+
+    best_weight = {}
+    best_predecessors = {}
+    for node in topological_sort(graph):
+        weight = graph.nodes[node]['weight']
+        predecessors = list(graph.predecessors(node))
+        if not predecessors:
+            best_weight[node] = weight
+            best_predecessors[node] = []
+        else:
+            predecessors_weight = max(best_weight[predecessor] for predecessor in predecessors)
+            best_weight[node] = predecessors_weight + weight
+            best_predecessors[node] = [
+                predecessor for predecessor in predecessors if best_weight[predecessor] == predecessors_weight]
+
+    if not best_weight:
+        return []
+
+    max_weight = max(best_weight.values())
+    paths = (
+        path
+        for node, weight in best_weight.items() if weight == max_weight
+        for path in _paths_to(node, best_predecessors))
+    return list(islice(paths, max_paths))
+
+
+def k_best_paths(graph: DiGraph, k: int, diversity: float = 0.0, candidates_factor: int = 5) -> list[tuple[float, list[str]]]:
+    """Returns the k paths of graph, from a source node to a sink node, with the highest total node weight, as
+    (weight, path) tuples in order of preference.
+
+    Every node keeps, in topological order, the labels (weight, predecessor, rank of the predecessor label) of its k
+    best paths, which costs O((V+E) k log k). With a positive diversity, k * candidates_factor paths are computed and
+    they are picked greedily, penalising every match already present in a picked path by diversity.
+    """
+
+    n_labels = k if not diversity else k * candidates_factor
+    labels = {}
+    for node in topological_sort(graph):
+        weight = graph.nodes[node]['weight']
+        predecessors = list(graph.predecessors(node))
+        if not predecessors:
+            labels[node] = [(weight, None, None)]
+        else:
+            labels[node] = heapq.nlargest(
+                n_labels,
+                (
+                    (label[0] + weight, predecessor, rank)
+                    for predecessor in predecessors
+                    for rank, label in enumerate(labels[predecessor])),
+                key=lambda label: label[0])
+
+    sink_labels = heapq.nlargest(
+        n_labels,
+        (
+            (label[0], node, rank)
+            for node in labels if graph.out_degree(node) == 0
+            for rank, label in enumerate(labels[node])),
+        key=lambda label: label[0])
+    candidates = [(weight, _label_path(node, rank, labels)) for weight, node, rank in sink_labels]
+    return diverse_paths(candidates, k, diversity)
+
+
+def diverse_paths(candidates: list[tuple[float, list[str]]], k: int, diversity: float = 0.0) -> list[tuple[float, list[str]]]:
+    """Returns k of the (weight, path) candidates, in order of preference, picked greedily penalising every match
+    already present in a picked path by diversity. Without diversity the candidates are returned as they are."""
+
+    if not diversity:
+        return candidates
+
+    selected = []
+    seen_nodes = set()
+    while candidates and len(selected) < k:
+        best = max(
+            range(len(candidates)),
+            key=lambda i: candidates[i][0] - diversity * len(seen_nodes.intersection(candidates[i][1])))
+        weight, path = candidates.pop(best)
+        selected.append((weight, path))
+        seen_nodes.update(path)
+    return selected
+
+
+def disjoint_paths(graph: DiGraph, start_nodes: list[set[str] | None], weight_scale: int = 1000) -> list[list[str]]:
+    """Returns one path of graph per entry of start_nodes, pairwise node-disjoint and maximising the sum of their node
+    weights. The i-th path starts at one of start_nodes[i], or at any node if it is None, and may be empty.
+
+    It is solved as a single min-cost flow: every node is split in an in and an out node joined by an arc of capacity
+    1 and cost minus its weight (scaled to an integer by weight_scale), and every path gets a unit of flow from its own
+    source node. As the graph is a DAG there are no negative cycles, and the flow decomposes into the paths.
+    """
+
+    return flow_disjoint_paths(graph.nodes(data='weight'), graph.edges, start_nodes, weight_scale)
+
+
+def flow_disjoint_paths(node_weights: Iterable[tuple[str, float]], edges: Iterable[tuple[str, str]], start_nodes: list[set[str] | None],
+    weight_scale: int = 1000) -> list[list[str]]:
+    """Returns the paths of disjoint_paths for the DAG with the given (node, weight) pairs and (origin, destination)
+    edges, so graphs that are not a DiGraph do not need to be converted to one."""
+
+    node_weights = dict(node_weights)
+    flow_graph = DiGraph()
+    flow_graph.add_node('<source>', demand=-len(start_nodes))
+    flow_graph.add_node('<sink>', demand=len(start_nodes))
+    for node, weight in node_weights.items():
+        flow_graph.add_edge((node, 'in'), (node, 'out'), capacity=1, weight=-round(weight * weight_scale))
+        flow_graph.add_edge((node, 'out'), '<sink>', capacity=1, weight=0)
+    for origin, destination in edges:
+        flow_graph.add_edge((origin, 'out'), (destination, 'in'), capacity=1, weight=0)
+    for i, nodes in enumerate(start_nodes):
+        flow_graph.add_edge('<source>', ('<path>', i), capacity=1, weight=0)
+        flow_graph.add_edge(('<path>', i), '<sink>', capacity=1, weight=0)
+        for node in node_weights if nodes is None else nodes & node_weights.keys():
+            flow_graph.add_edge(('<path>', i), (node, 'in'), capacity=1, weight=0)
+
+    flow = min_cost_flow(flow_graph)
+
+    paths = []
+    for i in range(len(start_nodes)):
+        path = []
+        current = ('<path>', i)
+        while True:
+            current = next(
+                destination for destination, units in flow[current].items()
+                if units > 0 and (destination == '<sink>' or destination[1] == 'in'))
+            if current == '<sink>':
+                break
+            path.append(current[0])
+            current = (current[0], 'out')
+        paths.append(path)
+    return paths
+
+
+def anchored_nodes(graph: DiGraph, sources: set[str] | None, sinks: set[str] | None) -> set[str]:
+    """Returns the nodes of graph on a path from one of sources to one of sinks, None meaning any node.
+
+    It is the same as adding a virtual source linked to sources and a virtual sink linked from sinks and keeping the
+    nodes between them, done with one forward sweep in topological order and one backward sweep, so O(V+E).
+    """
+
+    order = list(topological_sort(graph))
+    from_sources = set(order)
+    if sources is not None:
+        from_sources = set()
+        for node in order:
+            if node in sources or any(predecessor in from_sources for predecessor in graph.predecessors(node)):
+                from_sources.add(node)
+    to_sinks = set(order)
+    if sinks is not None:
+        to_sinks = set()
+        for node in reversed(order):
+            if node in sinks or any(successor in to_sinks for successor in graph.successors(node)):
+                to_sinks.add(node)
+    return from_sources & to_sinks
+
+
+def _label_path(node: str, rank: int, labels: dict[str, list[tuple]]) -> list[str]:
+    """Rebuilds the path of the label of node with the given rank, following the predecessor labels back."""
+
+    reversed_path = []
+    while node is not None:
+        reversed_path.append(node)
+        _, node, rank = labels[node][rank]
+    return reversed_path[::-1]
+
+
+def _paths_to(node: str, best_predecessors: dict[str, list[str]]) -> Iterator[list[str]]:
+    """Yields the best paths that end at node, following the predecessor pointers back to the source nodes."""
+
+    stack = [(node, [node])]
+    while stack:
+        node, reversed_path = stack.pop()
+        if not best_predecessors[node]:
+            yield reversed_path[::-1]
+        for predecessor in best_predecessors[node]:
+            stack.append((predecessor, reversed_path + [predecessor]))
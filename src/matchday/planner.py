@@ -1,209 +1,455 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from networkx import DiGraph, ancestors, descendants
+from networkx import DiGraph
+import logging
+import threading
+import numpy as np
 
 from interfaces.database import AbstractDatabaseProxy
 from interfaces.routes import AbstractRouteProxy
 from scraper.scoutingplanner_scrapy.items import Match
 
+from .csr import CSRGraph
+from .paths import most_interesting_paths, k_best_paths, disjoint_paths, anchored_nodes
+from .reachability import ReachabilityIndex
+from .spatial import reachable_pairs
+from .table import MatchTable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Scout:
+    """Scout of a team, optionally leaving from origin at departure_time."""
+
+    origin: tuple[float, float] = None
+    departure_time: str | datetime = None
+
 
 class Planner:
     """Planner class."""
 
     TEAM_SEP_TOKEN = '<vs>'
-    ORIGIN_TOKEN = '<start>'
-    DESTINATION_TOKEN = '<end>'
     MATCH_ESTIMATED_DURATION = timedelta(hours=2)
+    MAX_ROAD_SPEED = 130 # km/h, no route between two stadiums is faster than driving straight at this speed
+    GRAPH_BACKENDS = ('networkx', 'csr')
+    DIGRAPH_NODE_BYTES = 400 # measured with tracemalloc for a node with a weight
+    DIGRAPH_EDGE_BYTES = 250 # measured with tracemalloc for a weighted edge
+
+    def __init__(self, db_proxy: AbstractDatabaseProxy, routes_proxy: AbstractRouteProxy, matches: MatchTable | list[Match], date: datetime, season: str,
+        max_road_speed: float | None = None, graph_backend: str = 'networkx'):
+        """matches must have a location and a kick-off time and be sorted by kick-off time.
 
-    def __init__(self, db_proxy: AbstractDatabaseProxy, routes_proxy: AbstractRouteProxy, matches: list[Match], date: datetime, season: str):
+        With the 'csr' graph_backend self.graph is converted to a CSRGraph once it is built, with its nodes numbered as
+        the rows of the matches, so filtering the matches and finding the routes run on arrays and the DiGraph is not
+        kept.
+
+        A planner can be shared by several threads: the routes are computed one at a time, since every call sets the
+        routes graph.
+        """
+        if graph_backend not in self.GRAPH_BACKENDS:
+            raise ValueError(f'graph_backend must be one of {self.GRAPH_BACKENDS}')
         self.db_proxy = db_proxy
         self.routes_proxy = routes_proxy
-        self.matches = matches
+        self.matches = matches if isinstance(matches, MatchTable) else MatchTable.from_records(matches)
         self.date = date
         self.season = season
+        self.max_road_speed = max_road_speed or self.MAX_ROAD_SPEED
+        self.graph_backend = graph_backend
+        self.pruned_pairs = 0
+        self.nodes = self.matches.node_ids(self.TEAM_SEP_TOKEN)
+        self.match_index = {node: row for row, node in enumerate(self.nodes)}
+        self.start_minutes = self.matches.minutes_since(date)
+        self.routes_lock = threading.Lock()
 
         self.set_graph() # sets self.graph
 
     def set_graph(self):
-        """Sets self.graph to the graph of the matchday."""
+        """Sets self.graph to the graph of the matchday, reading it from the database if it has been stored for the
+        same matches and routes proxy, straight as a CSRGraph with the 'csr' graph_backend. The graph is built and
+        stored as a DiGraph and then converted to the graph backend.
 
-        if (graph := self.db_proxy.get_matchday_graph(self.date)) is not None:
-            self.graph = graph
+        Otherwise, if a graph of the day has been stored for other matches, only the edges of the matches that have
+        been added, moved or rescheduled since are evaluated again.
+        """
+
+        graph_key = self.graph_key()
+        csr = self.graph_backend == 'csr'
+        if (graph := self.db_proxy.get_matchday_graph(**graph_key, csr=csr)) is not None:
+            # the same matches may have been stored in another order than the rows
+            self.graph = graph.renumbered(self.nodes) if csr else graph
+            if self.set_reachability():
+                self.db_proxy.save_matchday_graph(**graph_key, graph=self.graph)
 
         else:
+            previous_graph = self.db_proxy.get_previous_matchday_graph(self.season, self.date, self.routes_proxy.version)
             self.graph = DiGraph()
             self.add_nodes()
-            self.add_edges()
+            if previous_graph is not None and previous_graph.graph.get('snapshot') is not None:
+                self.update_edges(previous_graph)
+            else:
+                self.add_edges()
+            self.graph.graph['snapshot'] = self.snapshot()
+            self.set_reachability()
+
+            self.db_proxy.save_matchday_graph(**graph_key, graph=self.graph)
+            if csr:
+                self.graph = CSRGraph.from_digraph(self.graph, self.nodes)
+
+    def graph_key(self) -> dict:
+        """Returns the key of the graph in the database, which changes with the matches, their kick-off times and
+        locations, and the source of the travel times."""
+
+        return {
+            'season': self.season,
+            'day': self.date,
+            'matches_hash': self.matches.fingerprint(),
+            'router_version': self.routes_proxy.version
+        }
 
-            self.db_proxy.save_matchday_graph(self.date, self.graph)
+    def set_reachability(self) -> bool:
+        """Sets self.reachability to the reachability index stored in the graph attributes, building and storing it if
+        it is missing or it is not the index of the graph, and returns whether it has been built."""
+
+        built = False
+        if (data := self.graph.graph.get('reachability')) is not None:
+            self.reachability = ReachabilityIndex.from_dict(data)
+        if data is None or not self.reachability.indexes(self.graph):
+            if isinstance(self.graph, CSRGraph):
+                self.reachability = ReachabilityIndex.from_csr_graph(self.graph)
+            else:
+                self.reachability = ReachabilityIndex.from_graph(self.graph)
+            self.graph.graph['reachability'] = self.reachability.to_dict()
+            built = True
+
+        # a stored index may number the nodes in another order than the rows of the matches
+        self.reachability_rows = np.array([self.match_index[node] for node in self.reachability.nodes], dtype=np.intp)
+        return built
+
+    @property
+    def nbytes(self) -> int:
+        """Returns an estimate of the memory taken by the matches, the graphs and the reachability index."""
+
+        if isinstance(self.graph, CSRGraph):
+            graph_bytes = self.graph.nbytes
+        else:
+            graph_bytes = self.DIGRAPH_NODE_BYTES * self.graph.number_of_nodes() + self.DIGRAPH_EDGE_BYTES * self.graph.number_of_edges()
+        return self.matches.nbytes + graph_bytes + 2 * len(self.nodes) * len(self.nodes) // 8
 
-    def node_weight(self, match: Match) -> float:
-        """Returns the weight of a node."""
+    def node_weight(self, row: int) -> float:
+        """Returns the weight of the node of the match in a row of self.matches."""
 
         # TODO: define the weight of the node
         return 1
 
+    def match_node(self, match: Match) -> str:
+        """Returns the name of the node of a match."""
+
+        return f"{match.home_team}{self.TEAM_SEP_TOKEN}{match.away_team}"
+
     def add_nodes(self):
         """Adds nodes to self.graph."""
 
-        for match in self.matches:
-            self.graph.add_node(
-                f"{match['home_team']}{self.TEAM_SEP_TOKEN}{match['away_team']}", weight=self.node_weight(match))
+        self.graph.add_nodes_from((node, {'weight': self.node_weight(row)}) for row, node in enumerate(self.nodes))
             
+    def candidate_pairs(self) -> np.ndarray:
+        """Returns the (origin, destination) pairs of rows of self.matches that may be linked by an edge, as an array of
+        shape (n_pairs, 2).
+
+        Pairs whose stadiums are too far away to make it in time even driving straight at max_road_speed are dropped
+        without asking the routes proxy, and their number is kept in self.pruned_pairs.
+        """
+
+        pairs, self.pruned_pairs = reachable_pairs(
+            list(zip(self.matches.lat.tolist(), self.matches.lon.tolist())),
+            self.start_minutes.tolist(),
+            self.max_road_speed)
+        logger.info(f'[Planner] pruned {self.pruned_pairs} infeasible pairs of matches, {len(pairs)} left')
+
+        return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
     def add_edges(self):
-        """Adds edges to self.graph."""
-
-        for i, origin_match in enumerate(self.matches):
-            for destination_match in self.matches[i+1:]:
-                origin_match_finish_estimation = origin_match['timestamp'] + self.MATCH_ESTIMATED_DURATION
-                matches_temporal_distance = self.routes_proxy.route_temporal_distance(
-                    origin_match['latlon'],
-                    destination_match['latlon'],
-                    origin_match_finish_estimation
-                )
-
-                if origin_match['timestamp'] + timedelta(minutes=matches_temporal_distance) < destination_match['timestamp']:
-                    self.graph.add_edge(
-                        f"{origin_match['home_team']}{self.TEAM_SEP_TOKEN}{origin_match['away_team']}",
-                        f"{destination_match['home_team']}{self.TEAM_SEP_TOKEN}{destination_match['away_team']}",
-                        weight=(destination_match['timestamp'] - origin_match['timestamp']).total_seconds() / 60.0)
-                    
-    def routes(self, **kwargs) -> list[list[Match]]:
+        """Adds edges to self.graph.
+
+        The travel times between the stadiums of the candidate pairs are requested at once, so the number of routing
+        calls depends on how the proxy groups and chunks them and not on the number of pairs of matches.
+        """
+
+        pairs = self.candidate_pairs()
+        if not len(pairs):
+            return
+
+        self.add_edges_if_reachable(pairs, self.pairs_temporal_distances(pairs))
+
+    def update_edges(self, previous_graph: DiGraph):
+        """Adds edges to self.graph reusing the ones of previous_graph, a graph of the same day built from other
+        matches, between the matches whose kick-off time and location have not changed.
+
+        Only the candidate pairs with an added or changed match are routed, as one matrix from the changed origins and
+        one to the changed destinations, so rescheduling a match costs O(n) travel times instead of O(n^2). A leg
+        departs at the estimated finish of its origin match, so the travel time of a kept edge is still valid.
+        """
+
+        if not previous_graph.number_of_nodes():
+            return self.add_edges()
+
+        snapshot = previous_graph.graph['snapshot']
+        previous_rows = {node: row for row, node in enumerate(previous_graph.nodes)}
+        rows = np.array([previous_rows.get(node, -1) for node in self.nodes], dtype=np.intp)
+        unchanged = (
+            (rows >= 0)
+            & (np.asarray(snapshot['timestamps'])[rows] == self.matches.timestamp.astype(np.int64))
+            & (np.asarray(snapshot['lat'])[rows] == self.matches.lat)
+            & (np.asarray(snapshot['lon'])[rows] == self.matches.lon))
+
+        # the weight of an edge only depends on the kick-off times of its matches, so the kept edges are still valid
+        unchanged_nodes = [node for node, node_unchanged in zip(self.nodes, unchanged.tolist()) if node_unchanged]
+        self.graph.add_weighted_edges_from(previous_graph.subgraph(unchanged_nodes).edges(data='weight'))
+
+        pairs = self.candidate_pairs()
+        changed_origins = ~unchanged[pairs[:, 0]]
+        changed_destinations = ~unchanged[pairs[:, 1]]
+        for changed_pairs in (pairs[changed_origins], pairs[~changed_origins & changed_destinations]):
+            if len(changed_pairs):
+                self.add_edges_if_reachable(changed_pairs, self.pairs_temporal_distances(changed_pairs))
+        logger.info(
+            f'[Planner] reused the edges of {len(unchanged_nodes)} matches, '
+            f'routed {changed_origins.sum() + (~changed_origins & changed_destinations).sum()} pairs of changed matches')
+
+    def pairs_temporal_distances(self, pairs: np.ndarray) -> np.ndarray:
+        """Returns the temporal distance between the stadiums of every (origin, destination) pair of rows of
+        self.matches, departing at the estimated finish of the origin match. The distinct (origin stadium, destination
+        stadium, kick-off) legs of the pairs are requested in one call to the routes proxy."""
+
+        stadiums, stadium_rows = np.unique(
+            np.stack([self.matches.lat, self.matches.lon], axis=1), axis=0, return_inverse=True)
+        stadium_rows = stadium_rows.reshape(-1)
+        legs, leg_index = np.unique(np.stack([
+            stadium_rows[pairs[:, 0]],
+            stadium_rows[pairs[:, 1]],
+            self.matches.timestamp[pairs[:, 0]].astype(np.int64)
+        ], axis=1), axis=0, return_inverse=True)
+        departure_times = legs[:, 2].astype('datetime64[s]') + np.timedelta64(self.MATCH_ESTIMATED_DURATION)
+        travel_times = np.asarray(self.routes_proxy.route_temporal_distance_pairs(
+            list(map(tuple, stadiums[legs[:, 0]].tolist())),
+            list(map(tuple, stadiums[legs[:, 1]].tolist())),
+            departure_times.tolist()
+        ), dtype=np.float64)
+
+        return travel_times[leg_index.reshape(-1)]
+
+    def snapshot(self) -> dict[str, np.ndarray]:
+        """Returns the kick-off times and locations of the matches, in the order of the nodes, which are stored with
+        the graph to tell what has changed when the graph is updated."""
+
+        return {
+            'timestamps': self.matches.timestamp.astype(np.int64),
+            'lat': self.matches.lat.copy(),
+            'lon': self.matches.lon.copy()
+        }
+
+    def add_edges_if_reachable(self, pairs: np.ndarray, matches_temporal_distances: np.ndarray):
+        """Adds to self.graph the edges between the (origin, destination) pairs of rows of self.matches whose
+        destination can be reached in time, given the temporal distance of every pair.
+
+        The feasibility of all the pairs is one vectorised comparison, an infinite temporal distance meaning that the
+        pair can not be routed, and the edges are added in bulk weighted by the minutes between the kick-offs.
+        """
+
+        available_times = self.start_minutes[pairs[:, 1]] - self.start_minutes[pairs[:, 0]]
+        reachable = matches_temporal_distances < available_times
+
+        nodes = np.array(self.nodes, dtype=object)
+        self.graph.add_weighted_edges_from(zip(
+            nodes[pairs[reachable, 0]].tolist(),
+            nodes[pairs[reachable, 1]].tolist(),
+            available_times[reachable].tolist()))
+
+    def routes(self, max_routes: int | None = None, k: int | None = None, diversity: float = 0.0, **kwargs) -> list[list[Match]] | list[tuple[float, list[Match]]]:
         """ Returns a list of lists of matches that correspond to the paths (routes) with the more weighted nodes (matches) in the graph.
+        At most max_routes of the tied routes are returned.
+
+        If k is given, the k best routes are returned instead as (score, route) tuples ranked by their total node
+        weight, and a positive diversity penalises the routes that share matches with the better ranked ones.
         """
 
-        self.set_routes_graph(**kwargs)
-        if not self.routes_graph.nodes:
-            return []
-        
-        return [
-            [
-                self.db_proxy.get_matches(
-                    season=self.season,
-                    timestamp=self.date,
-                    home_team=node.split('<vs>')[0],
-                    away_team=node.split('<vs>')[1])[0]
-                for node in path]
-            for path in self.routes_graph_most_interesting_paths()]
+        with self.routes_lock:
+            self.set_routes_graph(**kwargs)
+            if not self.routes_graph.nodes:
+                return []
+
+            if k is not None:
+                return [
+                    (score, [self.node_match(node) for node in path])
+                    for score, path in self.routes_graph_k_best_paths(k, diversity)]
+
+            return [
+                [self.node_match(node) for node in path]
+                for path in self.routes_graph_most_interesting_paths(max_routes)]
+
+    def team_routes(self, scouts: list[Scout], **kwargs) -> list[list[Match]]:
+        """ Returns one route per scout, in the same order, such that no match is visited by two scouts and the total
+        weight of the visited matches is maximum. A scout with an origin and a departure time only starts at the
+        matches that can be reached from there in time. The rest of kwargs filter the matches as in routes().
+        """
+
+        with self.routes_lock:
+            self.set_routes_graph(**kwargs)
+            if not self.routes_graph.nodes:
+                return [[] for _ in scouts]
+
+            departure_times = [
+                self._check_routes_conditions(origin=scout.origin, departure_time=scout.departure_time)['departure_time']
+                for scout in scouts]
+            anchored_scouts = [
+                i for i, scout in enumerate(scouts) if scout.origin is not None and departure_times[i] is not None]
+
+            start_nodes = [None] * len(scouts)
+            if anchored_scouts:
+                nodes = list(self.routes_graph.nodes)
+                rows = [self.match_index[node] for node in nodes]
+                travel_times = self.routes_proxy.route_temporal_distance_matrix(
+                    [scouts[i].origin for i in anchored_scouts],
+                    self.matches.latlons(rows),
+                    min(departure_times[i] for i in anchored_scouts))
+                for scout_row, i in enumerate(anchored_scouts):
+                    departure_minutes = (departure_times[i] - self.date).total_seconds() / 60.0
+                    start_nodes[i] = {
+                        node for node, row, matches_temporal_distance in zip(nodes, rows, travel_times[scout_row])
+                        if matches_temporal_distance < self.start_minutes[row] - departure_minutes}
+
+            return [
+                [self.node_match(node) for node in path]
+                for path in self.routes_graph_disjoint_paths(start_nodes)]
+
+    def node_match(self, node: str) -> Match:
+        """Returns the match of a node."""
+
+        return self.matches.match(self.match_index[node])
     
     def set_routes_graph(self, origin: None | tuple[float] = None, destination: None | tuple[float] = None,
         departure_time: str | datetime | None = None, arrival_time: str | datetime | None = None,
         wanted_matches: list[str] | str | list[tuple] | tuple | None = None, unwanted_matches: list[str] | str | list[tuple] | tuple | None = None,
         wanted_competitions: list[str] | str | None = None, unwanted_competitions: list[str] | str | None = None
         ):
-        """Sets self.routes_graph as a subgraph of self.graph that forces the specified conditions for the routes."""
+        """Sets self.routes_graph as a subgraph of self.graph that forces the specified conditions for the routes.
 
-        conditions = self._check_routes_conditions(origin, destination, departure_time, arrival_time, wanted_matches, unwanted_matches, wanted_competitions, unwanted_competitions)
+        The origin and the destination act as a virtual source linked to the matches that can be reached from the
+        origin and a virtual sink linked from the ones that reach the destination, so only the nodes on a path between
+        them are kept. With the networkx backend the routes graph is a view of self.graph, not a copy.
+        """
 
-        nodes = self.wanted_nodes(conditions['wanted_matches'], conditions['unwanted_matches'], conditions['wanted_competitions'], conditions['unwanted_competitions'])
-        self.routes_graph = self.graph.subgraph(nodes).copy()
+        conditions = self._check_routes_conditions(origin, destination, departure_time, arrival_time, wanted_matches, unwanted_matches, wanted_competitions, unwanted_competitions)
 
+        wanted = self.wanted_rows(conditions['wanted_matches'], conditions['unwanted_matches'], conditions['wanted_competitions'], conditions['unwanted_competitions'])
+        rows = np.flatnonzero(wanted)
+        sources = sinks = None
         if conditions['origin'] is not None and conditions['departure_time'] is not None:
-            self.add_origin_to_routes_graph(conditions['origin'], conditions['departure_time'])
+            sources = self.origin_rows(rows, conditions['origin'], conditions['departure_time'])
         if conditions['destination'] is not None and conditions['arrival_time'] is not None:
-            self.add_destination_to_routes_graph(conditions['destination'], conditions['arrival_time'])
-
-    def routes_graph_most_interesting_paths(self) -> list[list[str]]:
+            sinks = self.destination_rows(rows, conditions['destination'], conditions['arrival_time'])
+
+        if isinstance(self.graph, CSRGraph):
+            # the nodes of the CSR graph are numbered as the rows, so the masks of the rows are masks of its nodes
+            mask = wanted
+            if sources is not None:
+                sources_mask = np.zeros(len(self.nodes), dtype=bool)
+                sources_mask[sources] = True
+                mask &= sources_mask | self.graph.descendants(sources_mask, within=mask)
+            if sinks is not None:
+                sinks_mask = np.zeros(len(self.nodes), dtype=bool)
+                sinks_mask[sinks] = True
+                mask &= sinks_mask | self.graph.ancestors(sinks_mask, within=mask)
+            self.routes_graph = self.graph.subgraph(mask)
+        else:
+            self.routes_graph = self.graph.subgraph(self.row_nodes(rows))
+            if sources is not None or sinks is not None:
+                self.routes_graph = self.graph.subgraph(anchored_nodes(
+                    self.routes_graph,
+                    None if sources is None else set(self.row_nodes(sources)),
+                    None if sinks is None else set(self.row_nodes(sinks))))
+
+    def row_nodes(self, rows: np.ndarray) -> list[str]:
+        """Returns the nodes of the matches in the given rows of self.matches."""
+
+        return [self.nodes[row] for row in rows.tolist()]
+
+    def origin_rows(self, rows: np.ndarray, origin: tuple[float], departure_time: datetime) -> np.ndarray:
+        """Returns the rows among the given ones whose match can be reached from the origin leaving at
+        departure_time, requesting the travel times to all of them at once."""
+
+        if not len(rows):
+            return rows
+        travel_times = np.asarray(self.routes_proxy.route_temporal_distance_matrix(
+            [origin],
+            self.matches.latlons(rows),
+            departure_time
+        ), dtype=np.float64)[0]
+
+        departure_minutes = (departure_time - self.date).total_seconds() / 60.0
+        return rows[travel_times < self.start_minutes[rows] - departure_minutes]
+
+    def destination_rows(self, rows: np.ndarray, destination: tuple[float], arrival_time: datetime) -> np.ndarray:
+        """Returns the rows among the given ones from whose match the destination can be reached by arrival_time,
+        leaving at the estimated finish of the match. The travel times from all of them are requested at once,
+        departing at the earliest finish."""
+
+        if not len(rows):
+            return rows
+        finish_minutes = self.start_minutes[rows] + self.MATCH_ESTIMATED_DURATION.total_seconds() / 60.0
+        travel_times = np.asarray(self.routes_proxy.route_temporal_distance_matrix(
+            self.matches.latlons(rows),
+            [destination],
+            self.date + timedelta(minutes=float(finish_minutes.min()))
+        ), dtype=np.float64)[:, 0]
+
+        arrival_minutes = (arrival_time - self.date).total_seconds() / 60.0
+        return rows[finish_minutes + travel_times < arrival_minutes]
+
+    def routes_graph_most_interesting_paths(self, max_paths: int | None = None) -> list[list[str]]:
         """ Returns a list of paths that correspond to the most interesting paths in the graph.
         """
-        
-        source_nodes = [node for node in self.routes_graph.nodes if self.routes_graph.in_degree(node) == 0]
-        most_interesting_paths_to = {
-            node: {
-                'weight': 0,
-                'paths': set()  # set of paths
-            } if node not in source_nodes else {
-                'weight': self.routes_graph.nodes[node]['weight'],
-                'paths': {node}  # set of paths
-            } for node in self.routes_graph.nodes
-        }
-        queue = source_nodes.copy()
-
-        while len(queue) > 0:
-            orig = queue.pop(0)
-            for edge in self.routes_graph.edges(orig):
-                dest = edge[1]
-                if most_interesting_paths_to[orig]['weight'] + self.routes_graph.nodes[dest]['weight'] > most_interesting_paths_to[dest]['weight']:
-                    most_interesting_paths_to[dest]['weight'] = most_interesting_paths_to[orig]['weight'] + \
-                        self.routes_graph.nodes[dest]['weight']
-                    most_interesting_paths_to[dest]['paths'] = {
-                        '%'.join((path, dest)) for path in most_interesting_paths_to[orig]['paths']}
-                    queue.append(dest)
-                elif most_interesting_paths_to[orig]['weight'] + self.routes_graph.nodes[dest]['weight'] == most_interesting_paths_to[dest]['weight']:
-                    most_interesting_paths_to[dest]['paths'] |= {
-                        '%'.join((path, dest))
-                        for path in most_interesting_paths_to[orig]['paths']}
-                    queue.append(dest)
-
-        # get the most interesting paths with the maximum weight and return them
-        max_weight = max(most_interesting_paths_to.values(),
-                         key=lambda x: x['weight'])['weight']
-        most_interesting_paths = [list(
-            v['paths']) for v in most_interesting_paths_to.values() if v['weight'] == max_weight]
-        result = []
-        for paths in most_interesting_paths:
-            result += [path.split('%') for path in paths]
-        return result
+
+        if isinstance(self.routes_graph, CSRGraph):
+            return self.routes_graph.most_interesting_paths(max_paths)
+        return most_interesting_paths(self.routes_graph, max_paths)
+
+    def routes_graph_k_best_paths(self, k: int, diversity: float = 0.0) -> list[tuple[float, list[str]]]:
+        """ Returns the k best (weight, path) tuples of the routes graph.
+        """
+
+        if isinstance(self.routes_graph, CSRGraph):
+            return self.routes_graph.k_best_paths(k, diversity)
+        return k_best_paths(self.routes_graph, k, diversity)
+
+    def routes_graph_disjoint_paths(self, start_nodes: list[set[str] | None]) -> list[list[str]]:
+        """ Returns one disjoint path of the routes graph per entry of start_nodes.
+        """
+
+        if isinstance(self.routes_graph, CSRGraph):
+            return self.routes_graph.disjoint_paths(start_nodes)
+        return disjoint_paths(self.routes_graph, start_nodes)
 
     def wanted_nodes(self, wanted_matches: list[str], unwanted_matches: list[str], wanted_competitions: list[str], unwanted_competitions: list[str]) -> set[str]:
         """Returns a set of nodes that correspond to the wanted nodes."""
 
-        nodes = set(self.graph.nodes)
-        for node in self.graph.nodes:
-            if node in nodes and unwanted_matches is not None and node in unwanted_matches:
-                nodes.remove(node)
-            if node in nodes and wanted_matches is not None:
-                ancestors_and_descendants = ancestors(
-                    self.graph, node) | descendants(self.graph, node) | {node}
-                for wanted_match in wanted_matches:
-                    if node in nodes and wanted_match not in ancestors_and_descendants:
-                        nodes.remove(node)
-            if node in nodes and wanted_competitions is not None and self.db_proxy.get_matches(season=self.season, timestamp=self.date, home_team=node.split(self.TEAM_SEP_TOKEN)[0], away_team=node.split(self.TEAM_SEP_TOKEN)[1])[0].competition not in wanted_competitions:
-                nodes.remove(node)
-            if node in nodes and unwanted_competitions is not None and self.db_proxy.get_matches(season=self.season, timestamp=self.date, home_team=node.split(self.TEAM_SEP_TOKEN)[0], away_team=node.split(self.TEAM_SEP_TOKEN)[1])[0].competition in unwanted_competitions:
-                nodes.remove(node)
-        return nodes
-    
-    def add_origin_to_routes_graph(self, origin: tuple[float], departure_time: datetime):
-        """Leaves in the routes graph only the nodes that are reachable from the origin."""
-
-        self.routes_graph.add_node(self.ORIGIN_TOKEN, weight=0)
-        for node in self.routes_graph.nodes:
-            if node != self.ORIGIN_TOKEN:
-                match = self.db_proxy.get_matches(
-                    season=self.season, timestamp=self.date, home_team=node.split(self.TEAM_SEP_TOKEN)[0], away_team=node.split(self.TEAM_SEP_TOKEN)[1])[0]
-                matches_temporal_distance = self.routes_proxy.route_temporal_distance(
-                    origin,
-                    match.latlon,
-                    departure_time
-                )
-                if departure_time + timedelta(minutes=matches_temporal_distance) < match.timestamp:
-                    self.routes_graph.add_edge(self.ORIGIN_TOKEN, node, weight=(
-                        (match.timestamp - departure_time).total_seconds() / 60.0))
-        self.routes_graph.remove_nodes_from(
-            [node for node in self.routes_graph.nodes if node != self.ORIGIN_TOKEN and self.ORIGIN_TOKEN not in ancestors(self.routes_graph, node)])
-        self.routes_graph.remove_node(self.ORIGIN_TOKEN)
-
-    def add_destination_to_routes_graph(self, destination: tuple[float], arrival_time: datetime):
-        """Leaves in the routes graph only the nodes that can reach the destination."""
-
-        self.routes_graph.add_node(self.DESTINATION_TOKEN, weight=0)
-        for node in self.routes_graph.nodes:
-            if node != self.DESTINATION_TOKEN:
-                match = self.db_proxy.get_matches(
-                    season=self.season, timestamp=self.date, home_team=node.split(self.TEAM_SEP_TOKEN)[0], away_team=node.split(self.TEAM_SEP_TOKEN)[1])[0]
-                origin_match_finish_estimation = match.timestamp + self.MATCH_ESTIMATED_DURATION
-                matches_temporal_distance = self.routes_proxy.route_temporal_distance(
-                    match.latlon,
-                    destination,
-                    origin_match_finish_estimation
-                )
-                if origin_match_finish_estimation + timedelta(minutes=matches_temporal_distance) < arrival_time:
-                    self.routes_graph.add_edge(node, self.DESTINATION_TOKEN, weight=(
-                        (arrival_time - origin_match_finish_estimation).total_seconds() / 60.0))
-        self.routes_graph.remove_nodes_from(
-            [node for node in self.routes_graph.nodes if node != self.DESTINATION_TOKEN and self.DESTINATION_TOKEN not in descendants(self.routes_graph, node)])
-        self.routes_graph.remove_node(self.DESTINATION_TOKEN)
+        return set(self.row_nodes(np.flatnonzero(self.wanted_rows(wanted_matches, unwanted_matches, wanted_competitions, unwanted_competitions))))
+
+    def wanted_rows(self, wanted_matches: list[str], unwanted_matches: list[str], wanted_competitions: list[str], unwanted_competitions: list[str]) -> np.ndarray:
+        """Returns the mask of the rows of self.matches whose nodes are wanted, with one vectorised test per
+        condition."""
 
+        wanted = np.ones(len(self.matches), dtype=bool)
+        if wanted_competitions is not None:
+            wanted &= self.matches.isin('competition', wanted_competitions)
+        if unwanted_competitions is not None:
+            wanted &= ~self.matches.isin('competition', unwanted_competitions)
+        if unwanted_matches is not None:
+            wanted[[self.match_index[node] for node in unwanted_matches if node in self.match_index]] = False
+        if wanted_matches is not None:
+            wanted[self.reachability_rows] &= self.reachability.on_routes_with_mask(wanted_matches)
+        return wanted
+    
     def _check_routes_conditions(self, origin: None | tuple[float] = None, destination: None | tuple[float] = None,
         departure_time: str | datetime | None = None, arrival_time: str | datetime | None = None,
         wanted_matches: list[str] | str | list[tuple] | tuple | None = None, unwanted_matches: list[str] | str | list[tuple] | tuple | None = None,
@@ -0,0 +1,99 @@
+from typing import Iterable
+from networkx import DiGraph, topological_sort
+import numpy as np
+
+from .csr import CSRGraph
+
+
+class ReachabilityIndex:
+    """Transitive closure of a matchday graph as bitsets.
+
+    Bit j of descendants[i] is set if node j can be reached from node i, and bit j of ancestors[i] if node i can be
+    reached from node j, a node reaching itself. The bitsets are Python ints, so whether two nodes can be on the same
+    route is a single bitwise test.
+    """
+
+    def __init__(self, nodes: list[str], descendants: list[int], ancestors: list[int]):
+        self.nodes = nodes
+        self.descendants = descendants
+        self.ancestors = ancestors
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+
+    @classmethod
+    def from_graph(cls, graph: DiGraph) -> 'ReachabilityIndex':
+        """Returns the index of a DAG, or-ing the bitsets of the successors in reverse topological order and the ones
+        of the predecessors in topological order, so every edge is visited twice."""
+
+        nodes = list(graph.nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        order = [node_index[node] for node in topological_sort(graph)]
+        successors = [[node_index[successor] for successor in graph.successors(node)] for node in nodes]
+        predecessors = [[node_index[predecessor] for predecessor in graph.predecessors(node)] for node in nodes]
+        return cls._closure(nodes, order, successors, predecessors)
+
+    @classmethod
+    def from_csr_graph(cls, graph: CSRGraph) -> 'ReachabilityIndex':
+        """Returns the index of a CSRGraph, as from_graph does for a DiGraph."""
+
+        indptr, reverse_indptr = graph.indptr.tolist(), graph.reverse_indptr.tolist()
+        indices, reverse_indices = graph.indices.tolist(), graph.reverse_indices.tolist()
+        return cls._closure(
+            list(graph.node_ids),
+            graph.topological_order().tolist(),
+            [indices[indptr[i]:indptr[i+1]] for i in range(len(graph))],
+            [reverse_indices[reverse_indptr[i]:reverse_indptr[i+1]] for i in range(len(graph))])
+
+    @classmethod
+    def _closure(cls, nodes: list[str], order: list[int], successors: list[list[int]], predecessors: list[list[int]]) -> 'ReachabilityIndex':
+        descendants = [1 << i for i in range(len(nodes))]
+        for i in reversed(order):
+            for j in successors[i]:
+                descendants[i] |= descendants[j]
+        ancestors = [1 << i for i in range(len(nodes))]
+        for i in order:
+            for j in predecessors[i]:
+                ancestors[i] |= ancestors[j]
+        return cls(nodes, descendants, ancestors)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ReachabilityIndex':
+        return cls(
+            data['nodes'],
+            [int(bits, 16) for bits in data['descendants']],
+            [int(bits, 16) for bits in data['ancestors']])
+
+    def to_dict(self) -> dict:
+        """Returns the index with the bitsets as hexadecimal strings, so it can be stored as JSON or BSON."""
+
+        return {
+            'nodes': self.nodes,
+            'descendants': [format(bits, 'x') for bits in self.descendants],
+            'ancestors': [format(bits, 'x') for bits in self.ancestors]
+        }
+
+    def indexes(self, graph: DiGraph | CSRGraph) -> bool:
+        """Returns whether this is the index of the nodes of graph."""
+
+        return len(self.nodes) == len(graph.nodes) and set(graph.nodes).issuperset(self.nodes)
+
+    def on_routes_with(self, wanted_nodes: Iterable[str]) -> set[str]:
+        """Returns the nodes that can be on the same route as all the wanted nodes, which are among them."""
+
+        return {node for node, on_routes in zip(self.nodes, self.on_routes_with_mask(wanted_nodes).tolist()) if on_routes}
+
+    def on_routes_with_mask(self, wanted_nodes: Iterable[str]) -> np.ndarray:
+        """Returns the mask, in the order of self.nodes, of the nodes that can be on the same route as all the wanted
+        nodes.
+
+        A node is on a route with a wanted node if it is one of its descendants or ancestors, so only the bitsets of
+        the wanted nodes are and-ed, and the result is unpacked to a mask at once.
+        """
+
+        bits = (1 << len(self.nodes)) - 1
+        for node in wanted_nodes:
+            if node not in self.node_index:
+                return np.zeros(len(self.nodes), dtype=bool)
+            bits &= self.descendants[self.node_index[node]] | self.ancestors[self.node_index[node]]
+
+        packed = np.frombuffer(bits.to_bytes((len(self.nodes) + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, count=len(self.nodes), bitorder='little').astype(bool)
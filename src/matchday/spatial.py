@@ -0,0 +1,90 @@
+from bisect import bisect_left
+from collections import defaultdict
+from math import asin, cos, sqrt, radians, floor, ceil
+
+
+EARTH_RADIUS = 6371.0088 # km
+KM_PER_DEGREE = 111.195 # km per degree of latitude
+
+
+def haversine(origin: tuple[float, float], destination: tuple[float, float]) -> float:
+    """Returns the great-circle distance in km between two (lat, lon) points."""
+
+    lat1, lon1, lat2, lon2 = map(radians, (*origin, *destination))
+    a = (1 - cos(lat2 - lat1)) / 2 + cos(lat1) * cos(lat2) * (1 - cos(lon2 - lon1)) / 2
+    return 2 * EARTH_RADIUS * asin(sqrt(min(1.0, a)))
+
+
+class GridIndex:
+    """Uniform grid over (lat, lon) points that answers radius queries looking only at the cells around the center."""
+
+    def __init__(self, points: list[tuple[float, float]], cell_size: float = 10.0):
+        self.points = points
+        self.cell_size = cell_size
+        self.lat_step = cell_size / KM_PER_DEGREE
+        # the longitude step is computed at the latitude closest to a pole, so a cell is never narrower than cell_size
+        max_abs_lat = max((abs(lat) for lat, _ in points), default=0.0)
+        self.lon_step = cell_size / (KM_PER_DEGREE * max(cos(radians(max_abs_lat)), 1e-6))
+
+        self.cells = defaultdict(list)
+        for i, point in enumerate(points):
+            self.cells[self._cell(point)].append(i)
+
+    def query(self, center: tuple[float, float], radius: float) -> list[int]:
+        """Returns the indices of the points at less than radius km of center."""
+
+        n_cells = ceil(radius / self.cell_size)
+        center_lat, center_lon = self._cell(center)
+
+        result = []
+        if (2 * n_cells + 1) ** 2 > len(self.cells):
+            candidates = (i for cell in self.cells.values() for i in cell)
+        else:
+            candidates = (
+                i
+                for lat in range(center_lat - n_cells, center_lat + n_cells + 1)
+                for lon in range(center_lon - n_cells, center_lon + n_cells + 1)
+                for i in self.cells.get((lat, lon), ()))
+        for i in candidates:
+            if haversine(center, self.points[i]) < radius:
+                result.append(i)
+        return result
+
+    def _cell(self, point: tuple[float, float]) -> tuple[int, int]:
+        return floor(point[0] / self.lat_step), floor(point[1] / self.lon_step)
+
+
+def reachable_pairs(points: list[tuple[float, float]], start_minutes: list[float], max_speed: float) -> tuple[list[tuple[int, int]], int]:
+    """Returns the pairs (i, j), i < j, of events sorted by start time such that j can be reached from the start of i
+    driving in a straight line at max_speed km/h, together with the number of pairs that have been pruned.
+
+    Events that start later than the time needed to cross the whole bounding box of the points are kept without
+    looking at them, and the closer ones are looked up in a grid index, so the cost depends on how many events are
+    close in time rather than on the total number of pairs.
+    """
+
+    if not points:
+        return [], 0
+
+    # going along a meridian and then along a parallel is never shorter than the great-circle distance
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    min_abs_lat = 0.0 if min(lats) < 0 < max(lats) else min(abs(lat) for lat in lats)
+    diameter = KM_PER_DEGREE * ((max(lats) - min(lats)) + (max(lons) - min(lons)) * cos(radians(min_abs_lat)))
+    crossing_minutes = diameter / max_speed * 60.0
+    index = GridIndex(points)
+
+    pairs = []
+    pruned = 0
+    for i, point in enumerate(points):
+        window_end = bisect_left(start_minutes, start_minutes[i] + crossing_minutes, lo=i+1)
+        if window_end > i + 1:
+            radius = max_speed * (start_minutes[window_end-1] - start_minutes[i]) / 60.0
+            reachable = sorted(
+                j for j in index.query(point, radius)
+                if i < j < window_end
+                and haversine(point, points[j]) / max_speed * 60.0 < start_minutes[j] - start_minutes[i])
+            pairs += [(i, j) for j in reachable]
+            pruned += window_end - i - 1 - len(reachable)
+        pairs += [(i, j) for j in range(window_end, len(points))]
+    return pairs, pruned
@@ -0,0 +1,156 @@
+from datetime import datetime
+from typing import Iterable
+import hashlib
+import numpy as np
+
+from scraper.scoutingplanner_scrapy.items import Match
+
+
+class MatchTable:
+    """Columnar table of matches.
+
+    Every field of Match is kept in a NumPy array with one entry per match. Strings are interned in a pool shared by
+    the tables taken from the same one and stored as integer codes, and missing values are NaT, NaN or -1, so
+    filtering, sorting and grouping the matches are vectorised. Match objects are only built by match and to_matches.
+    """
+
+    STRING_COLUMNS = ('season', 'competition', 'group', 'home_team', 'away_team', 'stadium')
+    INTEGER_COLUMNS = ('matchday', 'home_goals', 'away_goals')
+
+    def __init__(self, columns: dict[str, np.ndarray], strings: list[str], string_codes: dict[str, int]):
+        self.columns = columns
+        self.strings = strings
+        self.string_codes = string_codes
+
+    @classmethod
+    def from_records(cls, records: Iterable[Match | dict]) -> 'MatchTable':
+        """Returns the table of the matches, given as Match objects or as the dicts stored in the database."""
+
+        strings = []
+        string_codes = {}
+        def intern(string: str | None) -> int:
+            if string is None:
+                return -1
+            if (code := string_codes.get(string)) is None:
+                code = string_codes[string] = len(strings)
+                strings.append(string)
+            return code
+
+        values = {column: [] for column in (*cls.STRING_COLUMNS, *cls.INTEGER_COLUMNS, 'finished', 'timestamp', 'lat', 'lon')}
+        for record in records:
+            record = record if isinstance(record, dict) else vars(record)
+            for column in cls.STRING_COLUMNS:
+                values[column].append(intern(record.get(column)))
+            for column in cls.INTEGER_COLUMNS:
+                values[column].append(-1 if record.get(column) is None else record[column])
+            values['finished'].append(bool(record.get('finished')))
+            values['timestamp'].append(record.get('timestamp'))
+            latlon = record.get('latlon')
+            values['lat'].append(np.nan if latlon is None else latlon[0])
+            values['lon'].append(np.nan if latlon is None else latlon[1])
+
+        code_dtype = np.int16 if len(strings) < np.iinfo(np.int16).max else np.int32
+        columns = {column: np.array(values[column], dtype=code_dtype) for column in cls.STRING_COLUMNS}
+        columns |= {column: np.array(values[column], dtype=np.int16) for column in cls.INTEGER_COLUMNS}
+        columns['finished'] = np.array(values['finished'], dtype=bool)
+        columns['timestamp'] = np.array(values['timestamp'], dtype='datetime64[s]')
+        columns['lat'] = np.array(values['lat'], dtype=np.float64)
+        columns['lon'] = np.array(values['lon'], dtype=np.float64)
+        return cls(columns, strings, string_codes)
+
+    def __len__(self) -> int:
+        return len(self.columns['timestamp'])
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__['columns'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the memory taken by the columns, without the string pool, which does not grow with the matches."""
+
+        return sum(column.nbytes for column in self.columns.values())
+
+    def take(self, rows: np.ndarray) -> 'MatchTable':
+        """Returns the table of the given rows, as indices or a boolean mask, sharing the string pool."""
+
+        return MatchTable({name: column[rows] for name, column in self.columns.items()}, self.strings, self.string_codes)
+
+    def reachable(self) -> 'MatchTable':
+        """Returns the table of the matches with a location and a kick-off time, sorted by kick-off time.
+
+        The matches that kick off at the same time keep their order.
+        """
+
+        rows = np.flatnonzero(~np.isnat(self.timestamp) & ~np.isnan(self.lat) & ~np.isnan(self.lon))
+        return self.take(rows[np.lexsort((rows, self.timestamp[rows].astype(np.int64)))])
+
+    def isin(self, column: str, strings: Iterable[str]) -> np.ndarray:
+        """Returns the mask of the rows whose string column is one of strings."""
+
+        return np.isin(self.columns[column], [self.string_codes[string] for string in strings if string in self.string_codes])
+
+    def minutes_since(self, date: datetime) -> np.ndarray:
+        """Returns the minutes from date to the kick-off of every match."""
+
+        return (self.timestamp - np.datetime64(date, 's')).astype(np.float64) / 60.0
+
+    def node_ids(self, separator: str) -> list[str]:
+        """Returns the "<home_team><separator><away_team>" id of every match."""
+
+        return [
+            f'{self.strings[home_team]}{separator}{self.strings[away_team]}'
+            for home_team, away_team in zip(self.home_team.tolist(), self.away_team.tolist())]
+
+    def fingerprint(self) -> str:
+        """Returns a hash of the teams, kick-off times and locations of the matches that does not depend on their
+        order."""
+
+        node_ids = self.node_ids('\x00')
+        rows = sorted(range(len(self)), key=node_ids.__getitem__)
+        digest = hashlib.sha256('\x01'.join(node_ids[row] for row in rows).encode('utf-8'))
+        digest.update(self.timestamp[rows].astype(np.int64).tobytes())
+        digest.update(np.stack([self.lat[rows], self.lon[rows]], axis=1).tobytes())
+        return digest.hexdigest()
+
+    def competitions(self) -> dict[str, dict]:
+        """Returns, for every competition in order of appearance, its number of matches and the set of its matchdays."""
+
+        codes, first_rows, counts = np.unique(self.competition, return_index=True, return_counts=True)
+        pairs = np.unique(np.stack([self.competition, self.matchday.astype(np.int32)], axis=1), axis=0)
+        matchdays = {code: set() for code in codes.tolist()}
+        for code, matchday in pairs.tolist():
+            matchdays[code].add(str(None if matchday < 0 else matchday))
+        return {
+            self._string(code): {'matches': count, 'matchday': matchdays[code]}
+            for _, code, count in sorted(zip(first_rows.tolist(), codes.tolist(), counts.tolist()))}
+
+    def latlon(self, row: int) -> tuple[float, float]:
+        return float(self.lat[row]), float(self.lon[row])
+
+    def latlons(self, rows: np.ndarray) -> list[tuple[float, float]]:
+        return list(zip(self.lat[rows].tolist(), self.lon[rows].tolist()))
+
+    def kickoff(self, row: int) -> datetime | None:
+        timestamp = self.timestamp[row]
+        return None if np.isnat(timestamp) else timestamp.astype(datetime)
+
+    def match(self, row: int) -> Match:
+        """Returns the Match of a row."""
+
+        fields = {column: self._string(self.columns[column][row]) for column in self.STRING_COLUMNS}
+        fields |= {column: None if self.columns[column][row] < 0 else int(self.columns[column][row]) for column in self.INTEGER_COLUMNS}
+        fields['finished'] = bool(self.finished[row])
+        fields['timestamp'] = self.kickoff(row)
+        fields['latlon'] = None if np.isnan(self.lat[row]) else self.latlon(row)
+        return Match(**fields)
+
+    def to_matches(self, rows: Iterable[int] | None = None) -> list[Match]:
+        """Returns the Match objects of the given rows, or of every row."""
+
+        return [self.match(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def _string(self, code: int) -> str | None:
+        return None if code < 0 else self.strings[code]
@@ -0,0 +1,62 @@
+"""Compares the memory and the query times of a dense matchday graph as a networkx DiGraph and as a CSRGraph.
+
+    python -m matchday.tests.benchmark_csr [--nodes N]
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+import tracemalloc
+from networkx import ancestors, descendants
+
+from matchday.csr import CSRGraph
+from matchday.paths import most_interesting_paths
+from matchday.tests.helpers import matchday_graph
+
+
+def timed(function, repeat: int = 5) -> float:
+    """Returns the best time in ms of repeat calls to function."""
+    times = []
+    for _ in range(repeat):
+        started_at = perf_counter()
+        function()
+        times.append(perf_counter() - started_at)
+    return 1000 * min(times)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=1000)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    graph = matchday_graph(args.nodes, seed=0)
+    graph_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    csr_graph = CSRGraph.from_digraph(graph)
+
+    nodes = list(graph.nodes)
+    sampled = nodes[::len(nodes) // 10]
+    kept = nodes[::2]
+    results = {
+        'memory (KiB)': (graph_bytes / 1024, csr_graph.nbytes / 1024),
+        'reachability (ms)': (
+            timed(lambda: [ancestors(graph, node) | descendants(graph, node) for node in sampled]),
+            timed(lambda: [
+                csr_graph.ancestors(csr_graph.mask([node])) | csr_graph.descendants(csr_graph.mask([node]))
+                for node in sampled])),
+        'subgraph (ms)': (
+            timed(lambda: graph.subgraph(kept).copy()),
+            timed(lambda: csr_graph.subgraph(csr_graph.mask(kept)))),
+        'longest paths (ms)': (
+            timed(lambda: most_interesting_paths(graph, 100)),
+            timed(lambda: csr_graph.most_interesting_paths(100)))
+    }
+
+    print(f'{args.nodes} nodes, {graph.number_of_edges()} edges')
+    print(f'{"":<20}{"networkx":>12}{"csr":>12}{"ratio":>10}')
+    for name, (networkx_value, csr_value) in results.items():
+        print(f'{name:<20}{networkx_value:>12.2f}{csr_value:>12.2f}{networkx_value / csr_value:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
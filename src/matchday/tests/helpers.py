@@ -0,0 +1,23 @@
+"""Builders of the matchday graphs shared by the tests and the benchmarks."""
+
+from networkx import DiGraph
+import numpy as np
+
+
+def matchday_graph(n_nodes: int, seed: int) -> DiGraph:
+    """Returns the graph of n_nodes matches kicking off every 15 minutes from 9:00 to 21:00 at stadiums spread over a
+    square degree, driving at 1 minute per 0.01 degrees of latitude or longitude."""
+    rng = np.random.default_rng(seed)
+    kickoffs = np.sort(rng.integers(0, 49, n_nodes)) * 15.0
+    latlons = rng.random((n_nodes, 2))
+    travel_times = np.abs(latlons[:, None, :] - latlons[None, :, :]).sum(axis=2) * 100
+    available_times = kickoffs[None, :] - kickoffs[:, None]
+    origins, destinations = np.nonzero(travel_times < available_times)
+
+    graph = DiGraph()
+    graph.add_nodes_from((f'H{i}<vs>A{i}', {'weight': 1}) for i in range(n_nodes))
+    graph.add_weighted_edges_from(zip(
+        (f'H{i}<vs>A{i}' for i in origins.tolist()),
+        (f'H{j}<vs>A{j}' for j in destinations.tolist()),
+        available_times[origins, destinations].tolist()))
+    return graph
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Event
+from time import sleep
+import pytest
+
+from matchday.cache import MatchdayCache
+
+
+SEASON = 'TEMPORADA 2022-2023'
+
+
+class FakeMatchday:
+    def __init__(self, date: datetime, season: str, nbytes: int = 100):
+        self.date = date
+        self.season = season
+        self.nbytes = nbytes
+
+
+class FakeBuilder:
+    def __init__(self, nbytes: int = 100, delay: float = 0.0):
+        self.nbytes = nbytes
+        self.delay = delay
+        self.builds = []
+
+    def __call__(self, date: datetime, season: str) -> FakeMatchday:
+        self.builds.append(date)
+        sleep(self.delay)
+        return FakeMatchday(date, season, self.nbytes)
+
+
+def test_concurrent_requests_for_a_date_build_one_matchday():
+    build = FakeBuilder(delay=0.2)
+    cache = MatchdayCache(build=build, last_changed_at=lambda: None)
+
+    with ThreadPoolExecutor(10) as executor:
+        matchdays = list(executor.map(lambda _: cache.get('06-05-2023', season=SEASON), range(10)))
+
+    assert build.builds == [datetime(2023, 5, 6)]
+    assert all(matchday is matchdays[0] for matchday in matchdays)
+    assert cache.get(datetime(2023, 5, 6), season=SEASON) is matchdays[0]
+
+
+def test_least_recently_used_matchdays_are_evicted_past_max_bytes():
+    build = FakeBuilder(nbytes=100)
+    cache = MatchdayCache(max_bytes=250, build=build, last_changed_at=lambda: None)
+
+    cache.get(day=6, month=5, year=2023)
+    cache.get(day=7, month=5, year=2023)
+    cache.get(day=6, month=5, year=2023)
+    cache.get(day=13, month=5, year=2023)
+
+    assert len(cache) == 2 and cache.nbytes == 200
+    assert (SEASON, datetime(2023, 5, 6)) in cache
+    assert (SEASON, datetime(2023, 5, 7)) not in cache
+
+
+def test_matchdays_are_rebuilt_once_the_matches_change():
+    build = FakeBuilder()
+    changed_at = [datetime.now() - timedelta(hours=1)]
+    cache = MatchdayCache(freshness_check_interval=timedelta(microseconds=1), build=build, last_changed_at=lambda: changed_at[0])
+
+    first = cache.get('06-05-2023')
+    sleep(0.01)
+    # crawls that find the same matches keep the changed_at of the pages
+    assert cache.get('06-05-2023') is first
+
+    changed_at[0] = datetime.now()
+    sleep(0.01)
+    assert cache.get('06-05-2023') is not first
+    assert len(build.builds) == 2
+
+
+def test_a_matchday_built_while_the_matches_change_is_not_kept():
+    changed_at = [datetime.now() - timedelta(hours=1)]
+    cache = MatchdayCache(freshness_check_interval=timedelta(microseconds=1), last_changed_at=lambda: changed_at[0])
+    def build(date: datetime, season: str) -> FakeMatchday:
+        # the matches change while they are being read, and another request sees it before the build ends
+        if date == datetime(2023, 5, 6):
+            changed_at[0] = datetime.now()
+            sleep(0.01)
+            cache.get('07-05-2023')
+        return FakeMatchday(date, season)
+    cache.build = build
+
+    cache.get('06-05-2023')
+    assert (SEASON, datetime(2023, 5, 6)) not in cache
+    assert (SEASON, datetime(2023, 5, 7)) in cache
+
+
+def test_a_failed_build_is_retried():
+    failed = Event()
+    def build(date: datetime, season: str) -> FakeMatchday:
+        if not failed.is_set():
+            failed.set()
+            raise ConnectionError()
+        return FakeMatchday(date, season)
+    cache = MatchdayCache(build=build, last_changed_at=lambda: None)
+
+    with pytest.raises(ConnectionError):
+        cache.get('06-05-2023')
+    assert cache.get('06-05-2023').date == datetime(2023, 5, 6)
+
+
+def test_only_matchdays_built_and_checked_are_served_without_building():
+    build = FakeBuilder()
+    changed_at = [datetime.now() - timedelta(hours=1)]
+    cache = MatchdayCache(freshness_check_interval=timedelta(milliseconds=50), build=build, last_changed_at=lambda: changed_at[0])
+
+    assert cache.get_cached('06-05-2023') is None
+    matchday = cache.get('06-05-2023')
+    assert cache.get_cached('06-05-2023') is matchday
+    assert cache.get_cached('07-05-2023') is None
+
+    # once the crawl states have to be checked again, only get answers
+    sleep(0.06)
+    assert cache.get_cached('06-05-2023') is None
+    assert cache.get('06-05-2023') is matchday
+    assert len(build.builds) == 1
@@ -0,0 +1,106 @@
+from networkx import ancestors, descendants
+import numpy as np
+
+from matchday.csr import CSRGraph
+from matchday.paths import most_interesting_paths, k_best_paths, disjoint_paths
+from matchday.tests.test_paths import random_matchday_graph
+from matchday.planner import Planner, Scout
+from matchday.tests.test_planner import DATE, SEASON, make_match, make_planner
+
+
+def test_csr_graph_round_trips_digraph():
+    graph = random_matchday_graph(40, 0.2, 0)
+    csr_graph = CSRGraph.from_digraph(graph)
+
+    assert csr_graph.n_edges == graph.number_of_edges()
+    assert set(csr_graph.to_digraph().edges(data='weight')) == set(graph.edges(data='weight'))
+    assert dict(csr_graph.to_digraph().nodes(data='weight')) == dict(graph.nodes(data='weight'))
+
+    node_ids = list(graph.nodes)[::-1]
+    csr_graph = CSRGraph.from_digraph(graph, node_ids)
+    assert csr_graph.node_ids == node_ids
+    assert csr_graph.node_weights.tolist() == [graph.nodes[node]['weight'] for node in node_ids]
+    assert set(csr_graph.to_digraph().edges(data='weight')) == set(graph.edges(data='weight'))
+
+    renumbered = CSRGraph.from_digraph(graph).renumbered(node_ids)
+    assert renumbered.node_ids == node_ids
+    assert renumbered.node_weights.tolist() == csr_graph.node_weights.tolist()
+    assert set(renumbered.to_digraph().edges(data='weight')) == set(graph.edges(data='weight'))
+
+
+def test_csr_graph_kernels_match_networkx():
+    for seed in range(10):
+        graph = random_matchday_graph(40, 0.2, seed)
+        csr_graph = CSRGraph.from_digraph(graph)
+        node_ids = np.array(csr_graph.node_ids)
+
+        assert sorted(csr_graph.most_interesting_paths()) == sorted(most_interesting_paths(graph))
+        for node in list(graph.nodes)[::7]:
+            assert set(node_ids[csr_graph.descendants(csr_graph.mask([node]))]) == descendants(graph, node)
+            assert set(node_ids[csr_graph.ancestors(csr_graph.mask([node]))]) == ancestors(graph, node)
+
+        kept = [node for i, node in enumerate(graph.nodes) if i % 3]
+        subgraph = csr_graph.subgraph(csr_graph.mask(kept)).to_digraph()
+        assert set(subgraph.nodes) == set(kept)
+        assert set(subgraph.edges) == set(graph.subgraph(kept).edges)
+
+
+def test_planner_csr_backend_finds_the_same_routes():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0), competition='LLIGA'),
+        make_match('C', 'D', 11, (41.5, 2.0), competition='COPA'),
+        make_match('E', 'F', 13, (41.5, 2.0), competition='LLIGA'),
+        make_match('G', 'H', 16, (41.0, 2.0), competition='LLIGA'),
+    ]
+    networkx_planner = make_planner(matches)
+    csr_planner = make_planner(matches, graph_backend='csr')
+    assert isinstance(csr_planner.graph, CSRGraph)
+
+    for kwargs in [{}, {'wanted_competitions': 'LLIGA'}, {'origin': (41.5, 2.0), 'departure_time': '10:00'},
+                   {'destination': (41.5, 2.0), 'arrival_time': '15:00'}, {'wanted_matches': ['C<vs>D']},
+                   {'unwanted_matches': ['E<vs>F'], 'unwanted_competitions': ['COPA']}]:
+        assert sorted(map(repr, csr_planner.routes(**kwargs))) == sorted(map(repr, networkx_planner.routes(**kwargs)))
+        assert csr_planner.routes(k=3, **kwargs) == networkx_planner.routes(k=3, **kwargs)
+        assert csr_planner.team_routes([Scout(), Scout()], **kwargs) == networkx_planner.team_routes([Scout(), Scout()], **kwargs)
+
+
+def test_planner_csr_backend_reads_stored_graphs_without_a_digraph(monkeypatch):
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 10, (41.5, 2.0)),
+        make_match('E', 'F', 13, (41.5, 2.0)),
+        make_match('G', 'H', 16, (41.0, 2.0)),
+    ]
+    networkx_planner = make_planner(matches)
+
+    def from_digraph(*args, **kwargs):
+        raise AssertionError('a stored graph is converted from a DiGraph')
+    monkeypatch.setattr(CSRGraph, 'from_digraph', from_digraph)
+    # the matches that kick off at the same time are stored in the other order
+    csr_planner = Planner(
+        db_proxy=networkx_planner.db_proxy, routes_proxy=networkx_planner.routes_proxy, matches=[matches[1], matches[0], *matches[2:]],
+        date=DATE, season=SEASON, graph_backend='csr')
+
+    assert isinstance(csr_planner.graph, CSRGraph)
+    assert csr_planner.graph.node_ids == csr_planner.nodes != networkx_planner.nodes
+    assert sorted(map(repr, csr_planner.routes())) == sorted(map(repr, networkx_planner.routes()))
+    assert csr_planner.routes(wanted_matches=['C<vs>D']) == networkx_planner.routes(wanted_matches=['C<vs>D'])
+
+
+def test_csr_graph_path_solvers_match_networkx():
+    for seed in range(10):
+        graph = random_matchday_graph(40, 0.2, seed)
+        csr_graph = CSRGraph.from_digraph(graph)
+
+        for k in (10, 50):
+            result = csr_graph.k_best_paths(k)
+            assert [weight for weight, _ in result] == [weight for weight, _ in k_best_paths(graph, k)]
+            assert all(graph.has_edge(*edge) for _, path in result for edge in zip(path, path[1:]))
+            assert all(weight == sum(graph.nodes[node]['weight'] for node in path) for weight, path in result)
+        # the diverse paths are picked among tied candidates, which may be other paths of the same weights
+        assert len(csr_graph.k_best_paths(10, diversity=1.0)) == len(k_best_paths(graph, 10, diversity=1.0))
+
+        start_nodes = [{node for i, node in enumerate(graph.nodes) if i % 5 == 0}, None]
+        def total_weight(paths):
+            return sum(graph.nodes[node]['weight'] for path in paths for node in path)
+        assert total_weight(csr_graph.disjoint_paths(start_nodes)) == total_weight(disjoint_paths(graph, start_nodes))
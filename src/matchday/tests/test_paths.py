@@ -0,0 +1,143 @@
+import random
+from networkx import DiGraph, ancestors, descendants
+
+from matchday.paths import most_interesting_paths, k_best_paths, disjoint_paths, anchored_nodes
+
+
+def label_correcting_paths(graph: DiGraph) -> list[list[str]]:
+    """Previous implementation of Planner.routes_graph_most_interesting_paths, kept as a reference."""
+
+    source_nodes = [node for node in graph.nodes if graph.in_degree(node) == 0]
+    most_interesting_paths_to = {
+        node: {'weight': 0, 'paths': set()} if node not in source_nodes else {
+            'weight': graph.nodes[node]['weight'], 'paths': {node}}
+        for node in graph.nodes
+    }
+    queue = source_nodes.copy()
+
+    while len(queue) > 0:
+        orig = queue.pop(0)
+        for edge in graph.edges(orig):
+            dest = edge[1]
+            if most_interesting_paths_to[orig]['weight'] + graph.nodes[dest]['weight'] > most_interesting_paths_to[dest]['weight']:
+                most_interesting_paths_to[dest]['weight'] = most_interesting_paths_to[orig]['weight'] + graph.nodes[dest]['weight']
+                most_interesting_paths_to[dest]['paths'] = {
+                    '%'.join((path, dest)) for path in most_interesting_paths_to[orig]['paths']}
+                queue.append(dest)
+            elif most_interesting_paths_to[orig]['weight'] + graph.nodes[dest]['weight'] == most_interesting_paths_to[dest]['weight']:
+                most_interesting_paths_to[dest]['paths'] |= {
+                    '%'.join((path, dest)) for path in most_interesting_paths_to[orig]['paths']}
+                queue.append(dest)
+
+    max_weight = max(most_interesting_paths_to.values(), key=lambda x: x['weight'])['weight']
+    result = []
+    for v in most_interesting_paths_to.values():
+        if v['weight'] == max_weight:
+            result += [path.split('%') for path in v['paths']]
+    return result
+
+
+def random_matchday_graph(n_nodes: int, edge_probability: float, seed: int) -> DiGraph:
+    rng = random.Random(seed)
+    graph = DiGraph()
+    for i in range(n_nodes):
+        graph.add_node(f'H{i}<vs>A{i}', weight=rng.choice([1, 1, 2]))
+    for i in range(n_nodes):
+        for j in range(i + 1, n_nodes):
+            if rng.random() < edge_probability:
+                graph.add_edge(f'H{i}<vs>A{i}', f'H{j}<vs>A{j}', weight=1)
+    return graph
+
+
+def test_most_interesting_paths_matches_label_correcting_search():
+    for seed in range(20):
+        graph = random_matchday_graph(25, 0.2, seed)
+        assert sorted(most_interesting_paths(graph)) == sorted(label_correcting_paths(graph))
+
+
+def test_most_interesting_paths_is_capped():
+    graph = DiGraph()
+    graph.add_nodes_from(['a', 'b', 'c', 'd'], weight=1)
+    graph.add_edges_from([('a', 'c'), ('b', 'c'), ('a', 'd'), ('b', 'd')])
+
+    assert len(most_interesting_paths(graph)) == 4
+    assert len(most_interesting_paths(graph, max_paths=3)) == 3
+    assert most_interesting_paths(DiGraph()) == []
+
+
+def all_source_to_sink_paths(graph: DiGraph) -> list[tuple[float, list[str]]]:
+    paths = []
+    stack = [[node] for node in graph.nodes if graph.in_degree(node) == 0]
+    while stack:
+        path = stack.pop()
+        if graph.out_degree(path[-1]) == 0:
+            paths.append((sum(graph.nodes[node]['weight'] for node in path), path))
+        stack += [path + [successor] for successor in graph.successors(path[-1])]
+    return paths
+
+
+def test_k_best_paths_matches_exhaustive_enumeration():
+    for seed in range(10):
+        graph = random_matchday_graph(15, 0.3, seed)
+        expected = sorted(all_source_to_sink_paths(graph), key=lambda x: -x[0])
+
+        result = k_best_paths(graph, 10)
+        assert [weight for weight, _ in result] == [weight for weight, _ in expected[:10]]
+        assert all(weight == sum(graph.nodes[node]['weight'] for node in path) for weight, path in result)
+        assert len({tuple(path) for _, path in result}) == len(result)
+        assert k_best_paths(graph, 1)[0][0] == max(
+            sum(graph.nodes[node]['weight'] for node in path) for path in most_interesting_paths(graph))
+
+
+def test_k_best_paths_diversity_avoids_shared_matches():
+    graph = DiGraph()
+    graph.add_nodes_from(['a', 'b', 'c', 'x', 'y'], weight=1)
+    graph.add_edges_from([('a', 'b'), ('b', 'c'), ('x', 'b'), ('x', 'y')])
+
+    assert [path for _, path in k_best_paths(graph, 2)] == [['a', 'b', 'c'], ['x', 'b', 'c']]
+    assert [path for _, path in k_best_paths(graph, 2, diversity=1.0)] == [['a', 'b', 'c'], ['x', 'y']]
+
+
+def test_disjoint_paths_maximise_total_weight():
+    for seed in range(10):
+        graph = random_matchday_graph(8, 0.4, seed)
+        paths = disjoint_paths(graph, [None, None])
+
+        assert not set(paths[0]) & set(paths[1])
+        for path in paths:
+            assert all(graph.has_edge(u, v) for u, v in zip(path, path[1:]))
+        # no pair of disjoint paths is better
+        candidates = [[]] + [path for _, path in all_source_to_sink_paths(graph)]
+        candidates += [path[i:j] for path in candidates for i in range(len(path)) for j in range(i + 1, len(path) + 1)]
+        best = max(
+            sum(graph.nodes[node]['weight'] for node in first + second)
+            for first in candidates for second in candidates if not set(first) & set(second))
+        assert sum(graph.nodes[node]['weight'] for path in paths for node in path) == best
+
+
+def test_disjoint_paths_respect_start_nodes():
+    graph = DiGraph()
+    graph.add_nodes_from(['a', 'b', 'c', 'd'], weight=1)
+    graph.add_edges_from([('a', 'b'), ('b', 'c'), ('c', 'd')])
+
+    first, second = disjoint_paths(graph, [{'c'}, None])
+    assert first in ([], ['c'], ['c', 'd']) and len(first) + len(second) == 4
+    assert disjoint_paths(graph, [{'d'}, {'d'}]) in ([['d'], []], [[], ['d']])
+    assert disjoint_paths(graph, [set(), None]) == [[], ['a', 'b', 'c', 'd']]
+
+
+def test_anchored_nodes_matches_virtual_source_and_sink():
+    rng = random.Random(0)
+    for seed in range(10):
+        graph = random_matchday_graph(30, 0.1, seed)
+        sources = set(rng.sample(list(graph.nodes), 3))
+        sinks = set(rng.sample(list(graph.nodes), 3))
+
+        anchored = graph.copy()
+        anchored.add_edges_from(('<start>', node) for node in sources)
+        anchored.add_edges_from((node, '<end>') for node in sinks)
+        expected = descendants(anchored, '<start>') & ancestors(anchored, '<end>')
+
+        assert anchored_nodes(graph, sources, sinks) == expected
+        assert anchored_nodes(graph, sources, None) == descendants(anchored, '<start>') - {'<end>'}
+        assert anchored_nodes(graph, None, None) == set(graph.nodes)
@@ -1,4 +1,271 @@
-from matchday.planner import Planner
+from datetime import datetime, timedelta
+import random
+import numpy as np
+from networkx import is_frozen
+
+from interfaces.database import AbstractDatabaseProxy
+from interfaces.database.graph_codec import encode_graph, decode_graph
+from interfaces.routes import AbstractRouteProxy
+from matchday.planner import Planner, Scout
+from scraper.scoutingplanner_scrapy.items import Match
+
+
+DATE = datetime(2023, 5, 6)
+SEASON = 'TEMPORADA 2022-2023'
+
+
+class FakeDatabaseProxy(AbstractDatabaseProxy):
+    def __init__(self, matches: list[Match]):
+        self.matches = matches
+        self.saved_graphs = {}
+
+    def get_matches(self, season: str, as_dict: bool = False, **kwargs) -> list[Match]:
+        return [
+            match for match in self.matches
+            if all(getattr(match, k) == v for k, v in kwargs.items() if k != 'timestamp')]
+
+    def save_match(self, match: Match):
+        self.matches.append(match)
+
+    def save_matches(self, matches):
+        self.matches += matches
+
+    def get_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, csr: bool = False):
+        document = self.saved_graphs.get((season, day, matches_hash, router_version))
+        return None if document is None else decode_graph(document, csr)
+
+    def get_previous_matchday_graph(self, season: str, day: datetime, router_version: str):
+        return next((
+            decode_graph(document) for (graph_season, graph_day, _, graph_router_version), document in self.saved_graphs.items()
+            if (graph_season, graph_day, graph_router_version) == (season, day, router_version)), None)
+
+    def save_matchday_graph(self, season: str, day: datetime, matches_hash: str, router_version: str, graph):
+        self.saved_graphs = {key: document for key, document in self.saved_graphs.items() if key[:2] != (season, day)}
+        self.saved_graphs[(season, day, matches_hash, router_version)] = encode_graph(graph)
+
+    def get_competitions(self, season: str) -> list[str]:
+        return list({match.competition for match in self.matches})
+
+    def get_crawl_states(self, urls: list[str]) -> dict[str, dict]:
+        return {}
+
+    def save_crawl_states(self, states: dict[str, dict]):
+        pass
+
+    def get_last_changed_at(self) -> datetime | None:
+        return None
+
+
+class FakeRouteProxy(AbstractRouteProxy):
+    """Drives at 1 minute per 0.01 degrees of latitude or longitude."""
+
+    time_dependent = False
+
+    def __init__(self):
+        self.calls = 0
+
+    def route_temporal_distance(self, origin, destination, departure_time=None) -> float:
+        self.calls += 1
+        return (abs(origin[0] - destination[0]) + abs(origin[1] - destination[1])) * 100
+
+
+class MatrixRouteProxy(FakeRouteProxy):
+    """Drives as FakeRouteProxy, computing the whole matrix at once."""
+
+    def route_temporal_distance_matrix(self, origins, destinations, departure_time=None) -> list[list[float]]:
+        self.calls += 1
+        origins, destinations = np.array(origins), np.array(destinations)
+        return (np.abs(origins[:, None, :] - destinations[None, :, :]).sum(axis=2) * 100).tolist()
+
+
+def make_match(home_team: str, away_team: str, hour: int, latlon: tuple[float, float], competition: str = 'LLIGA') -> Match:
+    return Match(
+        season=SEASON, competition=competition, group='GRUP 1', matchday=1,
+        home_team=home_team, away_team=away_team, finished=False,
+        timestamp=DATE.replace(hour=hour), latlon=latlon)
+
+
+def make_planner(matches: list[Match], routes_proxy: AbstractRouteProxy | None = None, **kwargs) -> Planner:
+    return Planner(
+        db_proxy=FakeDatabaseProxy(matches),
+        routes_proxy=routes_proxy or FakeRouteProxy(),
+        matches=matches, date=DATE, season=SEASON, **kwargs)
+
 
 def test_planner():
-    pass
\ No newline at end of file
+    pass
+
+
+def test_add_edges_uses_travel_time_matrix():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 11, (41.5, 2.0)),  # 50 minutes away from A-B
+        make_match('E', 'F', 11, (43.0, 2.0)),  # 200 minutes away from A-B
+        make_match('G', 'H', 16, (41.0, 2.0)),
+    ]
+    routes_proxy = FakeRouteProxy()
+    planner = make_planner(matches, routes_proxy)
+
+    assert set(planner.graph.edges) == {
+        ('A<vs>B', 'C<vs>D'), ('A<vs>B', 'G<vs>H'),
+        ('C<vs>D', 'G<vs>H'), ('E<vs>F', 'G<vs>H')}
+    assert planner.graph.edges['A<vs>B', 'G<vs>H']['weight'] == 360
+    # A-B to E-F is 222 km away in 1 hour, and C-D and E-F kick off at the same time
+    assert planner.pruned_pairs == 2
+    # one call per pair of distinct stadiums of the candidate pairs instead of one per pair of matches
+    assert routes_proxy.calls == 6
+
+
+def test_add_edges_matches_pairwise_feasibility():
+    rng = random.Random(0)
+    matches = sorted([
+        make_match(f'H{i}', f'A{i}', 9, (41 + rng.random(), 1 + 2 * rng.random()))
+        for i in range(300)], key=lambda match: match.timestamp)
+    for i, match in enumerate(matches):
+        match.timestamp += timedelta(minutes=i)
+    planner = make_planner(matches, MatrixRouteProxy())
+
+    expected = {
+        (f'{origin.home_team}<vs>{origin.away_team}', f'{destination.home_team}<vs>{destination.away_team}')
+        for i, origin in enumerate(matches) for destination in matches[i+1:]
+        if origin.timestamp + timedelta(minutes=FakeRouteProxy().route_temporal_distance(origin.latlon, destination.latlon)) < destination.timestamp}
+    assert set(planner.graph.edges) == expected
+    assert planner.routes_proxy.calls == 1
+
+
+def test_team_routes_are_disjoint_and_anchored():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 10, (42.0, 2.0)),
+        make_match('E', 'F', 13, (41.0, 2.0)),
+        make_match('G', 'H', 16, (41.0, 2.0)),
+    ]
+    planner = make_planner(matches)
+
+    routes = planner.team_routes([Scout(origin=(42.0, 2.0), departure_time='9:00'), Scout()])
+    assert [[match.home_team for match in route] for route in routes] == [['C', 'E'], ['A', 'G']]
+
+
+def test_routes_make_no_database_lookups():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0), competition='LLIGA'),
+        make_match('C', 'D', 13, (41.5, 2.0), competition='COPA'),
+        make_match('E', 'F', 16, (41.0, 2.0), competition='LLIGA'),
+    ]
+    planner = make_planner(matches)
+
+    def get_matches(*args, **kwargs):
+        raise AssertionError('the planner should not query the database')
+    planner.db_proxy.get_matches = get_matches
+
+    routes = planner.routes(
+        origin=(41.5, 2.0), departure_time='9:00', destination=(41.0, 2.0), arrival_time='20:00',
+        wanted_competitions='LLIGA')
+    assert routes == [[matches[0], matches[2]]]
+
+
+def test_origin_and_destination_take_one_routing_call_each():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 10, (42.0, 2.0)),
+        make_match('E', 'F', 13, (41.0, 2.0)),
+        make_match('G', 'H', 16, (42.0, 2.0)),
+    ]
+    planner = make_planner(matches, MatrixRouteProxy())
+    planner.routes_proxy.calls = 0
+
+    routes = planner.routes(origin=(42.0, 2.0), departure_time='9:00', destination=(41.0, 2.0), arrival_time='19:00')
+    assert [[match.home_team for match in route] for route in routes] == [['C', 'E']]
+    assert planner.routes_proxy.calls == 2
+    assert is_frozen(planner.routes_graph)
+
+
+def test_stored_graphs_are_only_served_for_the_same_matches():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 14, (43.0, 2.0)),  # 200 minutes away from A-B
+    ]
+    planner = make_planner(matches)
+    assert make_planner(matches[::-1]).graph_key() == planner.graph_key()
+
+    moved = [matches[0], make_match('C', 'D', 11, (43.0, 2.0))]
+    moved_planner = Planner(
+        db_proxy=planner.db_proxy, routes_proxy=FakeRouteProxy(), matches=moved, date=DATE, season=SEASON)
+    assert moved_planner.graph_key() != planner.graph_key()
+    assert planner.routes() == [matches]
+    assert moved_planner.routes() == [[matches[0]], [moved[1]]]
+    assert MatrixRouteProxy().version != FakeRouteProxy().version
+
+
+class CountingMatrixRouteProxy(MatrixRouteProxy):
+    """Drives as MatrixRouteProxy, counting the travel times it is asked for."""
+
+    def __init__(self):
+        super().__init__()
+        self.travel_times = 0
+
+    def route_temporal_distance_matrix(self, origins, destinations, departure_time=None) -> list[list[float]]:
+        self.travel_times += len(origins) * len(destinations)
+        return super().route_temporal_distance_matrix(origins, destinations, departure_time)
+
+
+def test_rescheduling_a_match_only_routes_its_pairs():
+    rng = random.Random(1)
+    matches = [
+        make_match(f'H{i}', f'A{i}', rng.randint(9, 20), (41 + rng.random(), 1 + 2 * rng.random()))
+        for i in range(200)]
+    matches.sort(key=lambda match: match.timestamp)
+    planner = make_planner(matches, CountingMatrixRouteProxy())
+
+    rescheduled = [*matches[:100], make_match('H_new', 'A_new', 12, (41.5, 2.0)), *matches[101:]]
+    rescheduled[50] = make_match(matches[50].home_team, matches[50].away_team, 20, matches[50].latlon)
+    rescheduled.sort(key=lambda match: match.timestamp)
+    routes_proxy = CountingMatrixRouteProxy()
+    updated = Planner(
+        db_proxy=planner.db_proxy, routes_proxy=routes_proxy, matches=rescheduled, date=DATE, season=SEASON)
+    rebuilt = make_planner(rescheduled, CountingMatrixRouteProxy())
+
+    assert dict(updated.graph.edges) == dict(rebuilt.graph.edges)
+    assert updated.reachability.to_dict() == rebuilt.reachability.to_dict()
+    assert routes_proxy.travel_times <= 4 * len(rescheduled)
+    assert rebuilt.routes_proxy.travel_times > 10 * routes_proxy.travel_times
+
+
+def test_updating_an_empty_graph_adds_every_edge():
+    planner = make_planner([])
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 14, (41.0, 2.0)),
+    ]
+    updated = Planner(
+        db_proxy=planner.db_proxy, routes_proxy=FakeRouteProxy(), matches=matches, date=DATE, season=SEASON)
+
+    assert set(updated.graph.edges) == {('A<vs>B', 'C<vs>D')}
+
+
+class RushHourRouteProxy(MatrixRouteProxy):
+    """Drives as MatrixRouteProxy, one hour slower departing from 12:00."""
+
+    time_dependent = True
+
+    def route_temporal_distance_matrix(self, origins, destinations, departure_time=None) -> list[list[float]]:
+        delay = 60 if departure_time is not None and departure_time.hour >= 12 else 0
+        return (np.asarray(super().route_temporal_distance_matrix(origins, destinations, departure_time)) + delay).tolist()
+
+
+def test_every_leg_departs_at_the_estimated_finish_of_its_origin_match():
+    matches = [
+        make_match('A', 'B', 9, (41.0, 2.0)),
+        make_match('C', 'D', 11, (41.0, 2.0)),
+        make_match('E', 'F', 12, (41.5, 2.0)),  # 50 minutes away from A-B and C-D, 110 departing in the rush hour
+    ]
+    planner = make_planner(matches, RushHourRouteProxy())
+
+    assert ('A<vs>B', 'E<vs>F') in planner.graph.edges
+    assert ('C<vs>D', 'E<vs>F') not in planner.graph.edges
+
+    moved = [make_match('A', 'B', 8, (41.0, 2.0)), *matches[1:]]
+    updated = Planner(
+        db_proxy=planner.db_proxy, routes_proxy=RushHourRouteProxy(), matches=moved, date=DATE, season=SEASON)
+    assert dict(updated.graph.edges) == dict(make_planner(moved, RushHourRouteProxy()).graph.edges)
+
@@ -0,0 +1,41 @@
+import random
+from networkx import ancestors, descendants
+
+from matchday.reachability import ReachabilityIndex
+from matchday.tests.test_paths import random_matchday_graph
+from matchday.tests.test_planner import make_match, make_planner
+
+
+def test_on_routes_with_matches_ancestors_and_descendants():
+    rng = random.Random(0)
+    for seed in range(10):
+        graph = random_matchday_graph(60, 0.05, seed)
+        index = ReachabilityIndex.from_dict(ReachabilityIndex.from_graph(graph).to_dict())
+
+        for n_wanted in (1, 2, 3):
+            wanted = rng.sample(list(graph.nodes), n_wanted)
+            expected = {
+                node for node in graph.nodes
+                if all(w in ancestors(graph, node) | descendants(graph, node) | {node} for w in wanted)}
+            assert index.on_routes_with(wanted) == expected
+            assert {node for node, kept in zip(index.nodes, index.on_routes_with_mask(wanted)) if kept} == expected
+        assert index.on_routes_with(['unknown<vs>match']) == set()
+        assert not index.on_routes_with_mask(['unknown<vs>match']).any()
+
+
+def test_planner_stores_the_reachability_index_with_the_graph():
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 10, (42.0, 2.0)),
+        make_match('E', 'F', 13, (41.0, 2.0)),
+    ]
+    planner = make_planner(matches)
+    stored_graph = planner.db_proxy.get_matchday_graph(**planner.graph_key())
+    assert stored_graph.graph['reachability'] == planner.reachability.to_dict()
+
+    assert planner.wanted_nodes(['C<vs>D'], None, None, None) == {'C<vs>D', 'E<vs>F'}
+
+    del stored_graph.graph['reachability']
+    planner.db_proxy.save_matchday_graph(**planner.graph_key(), graph=stored_graph)
+    planner.set_graph()
+    assert planner.db_proxy.get_matchday_graph(**planner.graph_key()).graph['reachability'] == planner.reachability.to_dict()
@@ -0,0 +1,34 @@
+import random
+
+from matchday.spatial import GridIndex, haversine, reachable_pairs
+
+
+def test_haversine():
+    barcelona, lleida = (41.3851, 2.1734), (41.6176, 0.6200)
+    assert 130 < haversine(barcelona, lleida) < 132
+    assert haversine(barcelona, barcelona) == 0
+
+
+def test_grid_index_query_matches_brute_force():
+    rng = random.Random(0)
+    points = [(rng.uniform(40.5, 42.8), rng.uniform(0.2, 3.3)) for _ in range(300)]
+    index = GridIndex(points)
+
+    for center in points[:20]:
+        for radius in (5, 30, 120):
+            assert sorted(index.query(center, radius)) == [
+                i for i, point in enumerate(points) if haversine(center, point) < radius]
+
+
+def test_reachable_pairs_matches_brute_force():
+    rng = random.Random(1)
+    points = [(rng.uniform(40.5, 42.8), rng.uniform(0.2, 3.3)) for _ in range(200)]
+    start_minutes = sorted(rng.choice(range(540, 1260, 15)) for _ in points)
+
+    pairs, pruned = reachable_pairs(points, start_minutes, 130)
+
+    expected = [
+        (i, j) for i in range(len(points)) for j in range(i + 1, len(points))
+        if haversine(points[i], points[j]) / 130 * 60 < start_minutes[j] - start_minutes[i]]
+    assert sorted(pairs) == expected
+    assert pruned == len(points) * (len(points) - 1) // 2 - len(expected)
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import random
+import tracemalloc
+
+from matchday.table import MatchTable
+from scraper.scoutingplanner_scrapy.items import Match
+
+
+def random_matches(n_matches: int, seed: int) -> list[Match]:
+    rng = random.Random(seed)
+    matches = []
+    for i in range(n_matches):
+        finished = rng.random() < 0.3
+        matches.append(Match(
+            season='TEMPORADA 2022-2023', competition=rng.choice(['LLIGA', 'COPA', 'JUVENIL']),
+            group=f'GRUP {rng.randint(1, 4)}', matchday=None if rng.random() < 0.05 else rng.randint(1, 30),
+            home_team=f'H{i}', away_team=f'A{i}', finished=finished,
+            timestamp=None if rng.random() < 0.1 else datetime(2023, 5, 6, 9) + timedelta(minutes=15 * rng.randint(0, 40)),
+            stadium=None if rng.random() < 0.1 else f'CAMP {rng.randint(0, 50)}',
+            latlon=None if rng.random() < 0.1 else (41 + rng.random(), 2 + rng.random()),
+            home_goals=rng.randint(0, 5) if finished else None,
+            away_goals=rng.randint(0, 5) if finished else None))
+    return matches
+
+
+def test_match_table_round_trips_matches():
+    matches = random_matches(200, 0)
+    table = MatchTable.from_records(matches)
+
+    assert len(table) == 200
+    assert table.to_matches() == matches
+    assert MatchTable.from_records(vars(match) for match in matches).to_matches() == matches
+    assert MatchTable.from_records([]).to_matches() == []
+
+
+def test_match_table_filters_sorts_and_groups_as_the_match_lists():
+    matches = random_matches(500, 1)
+    table = MatchTable.from_records(matches)
+
+    reachable = sorted(
+        filter(lambda m: m.latlon is not None and m.timestamp is not None, matches), key=lambda m: m.timestamp)
+    assert table.reachable().to_matches() == reachable
+
+    competitions = {}
+    for match in matches:
+        competitions.setdefault(match.competition, {'matches': 0, 'matchday': set()})
+        competitions[match.competition]['matches'] += 1
+        competitions[match.competition]['matchday'].add(str(match.matchday))
+    assert table.competitions() == competitions
+    assert list(table.competitions()) == list(competitions)
+
+    assert table.to_matches(table.isin('competition', ['COPA', 'UNKNOWN']).nonzero()[0]) == [
+        match for match in matches if match.competition == 'COPA']
+
+
+def test_match_table_is_smaller_than_the_match_list():
+    tracemalloc.start()
+    matches = random_matches(2000, 2)
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    table = MatchTable.from_records(matches)
+    assert table.nbytes * 10 < list_bytes
@@ -0,0 +1,25 @@
+"""Keeps the matches of the competition pages fresh, re-crawling every page on its own schedule.
+
+    python -m scheduler [--full-season]
+"""
+
+from argparse import ArgumentParser
+import logging
+
+from interfaces.database import MongoDBDatabaseProxy
+from interfaces.scraper import run_matches_spider
+from scheduler.refresh import RefreshScheduler
+
+
+parser = ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--full-season', action='store_true', help='crawl every group and jornada of the pages once and exit')
+args = parser.parse_args()
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO)
+
+if args.full_season:
+    run_matches_spider(full_season=True)
+else:
+    RefreshScheduler(MongoDBDatabaseProxy()).run_forever()
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from os.path import exists
+from typing import Callable
+import logging
+import time
+
+from interfaces.database import AbstractDatabaseProxy
+from interfaces.scraper import run_matches_spider, FULL_SEASON_JOBDIR
+from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """Re-crawls every competition page on its own schedule, so readers only have to query the latest snapshot.
+
+    A page is refreshed every DEFAULT_INTERVAL, every CLOSE_TO_KICKOFF_INTERVAL while one of its matches kicks off
+    within CLOSE_TO_KICKOFF, and once more RESULTS_DELAY after the estimated full time of each of its matches. Every
+    group and jornada of the pages, which catches the matches rescheduled to other jornadas, is crawled every
+    FULL_SEASON_INTERVAL, and again until an interrupted full-season crawl has finished.
+    """
+
+    DEFAULT_INTERVAL = timedelta(hours=12)
+    CLOSE_TO_KICKOFF = timedelta(days=2)
+    CLOSE_TO_KICKOFF_INTERVAL = timedelta(hours=1)
+    MATCH_ESTIMATED_DURATION = timedelta(hours=2)
+    RESULTS_DELAY = timedelta(minutes=15)
+    FULL_SEASON_INTERVAL = timedelta(days=7)
+    MAX_SLEEP = timedelta(minutes=5)
+
+    def __init__(self, db_proxy: AbstractDatabaseProxy, urls: list[str] | None = None, crawl: Callable[..., None] = run_matches_spider,
+        full_season_jobdir: str = FULL_SEASON_JOBDIR):
+        self.db_proxy = db_proxy
+        self.urls = urls or MatchesSpider.start_urls
+        self.crawl = crawl
+        self.full_season_jobdir = full_season_jobdir
+
+    def next_refresh(self, state: dict | None, now: datetime) -> datetime:
+        """Returns when the page with the given crawl state has to be crawled again."""
+
+        if state is None or state.get('crawled_at') is None or state.get('season') is None:
+            return now
+
+        crawled_at = state['crawled_at']
+        matches = self.db_proxy.get_matches(
+            season=state['season'], competition=state['competition'], group=state['group'],
+            timestamp={
+                '$gte': crawled_at - self.MATCH_ESTIMATED_DURATION - self.RESULTS_DELAY,
+                '$lt': now + self.CLOSE_TO_KICKOFF})
+
+        if any(now <= match.timestamp for match in matches):
+            next_refresh = crawled_at + self.CLOSE_TO_KICKOFF_INTERVAL
+        else:
+            next_refresh = crawled_at + self.DEFAULT_INTERVAL
+
+        results_refreshes = [
+            match.timestamp + self.MATCH_ESTIMATED_DURATION + self.RESULTS_DELAY for match in matches]
+        results_refreshes = [refresh for refresh in results_refreshes if refresh > crawled_at]
+        return min([next_refresh] + results_refreshes)
+
+    def next_full_season_crawl(self, states: dict[str, dict], now: datetime) -> datetime:
+        """Returns when every group and jornada of the pages with the given crawl states has to be crawled again."""
+
+        discovered_at = [states.get(url, {}).get('discovered_at') for url in self.urls]
+        if exists(self.full_season_jobdir) or None in discovered_at:
+            return now
+        return min(discovered_at) + self.FULL_SEASON_INTERVAL
+
+    def run_pending(self, now: datetime | None = None) -> datetime:
+        """Crawls the pages that are due, or the whole season if it is due, and returns when the next crawl will
+        be."""
+
+        now = now or datetime.now()
+        states = self.db_proxy.get_crawl_states(self.urls)
+        full_season = self.next_full_season_crawl(states, now) <= now
+        if full_season:
+            logger.info(f'[RefreshScheduler] crawling every group and jornada of {len(self.urls)} pages')
+            self.crawl(self.urls, full_season=True)
+            states = self.db_proxy.get_crawl_states(self.urls)
+
+        # the full-season crawl has refreshed the pages as well, unless it failed
+        due = [url for url in self.urls if self.next_refresh(states.get(url), now) <= now]
+        if due:
+            logger.info(f'[RefreshScheduler] refreshing {len(due)} pages: {due}')
+            self.crawl(due)
+            states = self.db_proxy.get_crawl_states(self.urls)
+
+        # a page whose crawl failed is due again, wait a little instead of retrying it in a tight loop
+        return max(
+            min([self.next_full_season_crawl(states, now)] + [self.next_refresh(states.get(url), now) for url in self.urls]),
+            now + timedelta(minutes=1) if due or full_season else now)
+
+    def run_forever(self):
+        while True:
+            next_run = self.run_pending()
+            time.sleep(min(max(next_run - datetime.now(), timedelta()), self.MAX_SLEEP).total_seconds())
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+from scheduler.refresh import RefreshScheduler
+from scraper.scoutingplanner_scrapy.items import Match
+
+
+NOW = datetime(2023, 5, 6, 12)
+URL = 'https://www.fcf.cat/resultats/2223/futbol-11/segona-federacio/grup-3'
+
+
+class FakeDatabaseProxy:
+    def __init__(self, kickoffs: list[datetime], crawled_at: datetime | None):
+        self.matches = [
+            Match(season='TEMPORADA 2022-2023', competition='SEGONA FEDERACIÓ', group='GRUP 3', matchday=30,
+                  home_team=f'H{i}', away_team=f'A{i}', finished=False, timestamp=kickoff)
+            for i, kickoff in enumerate(kickoffs)]
+        self.states = {} if crawled_at is None else {URL: {
+            'crawled_at': crawled_at, 'discovered_at': crawled_at, 'season': 'TEMPORADA 2022-2023',
+            'competition': 'SEGONA FEDERACIÓ', 'group': 'GRUP 3'}}
+        self.crawls = []
+        self.full_season_crawls = []
+
+    def get_matches(self, season: str, timestamp: dict, **kwargs) -> list[Match]:
+        return [match for match in self.matches if timestamp['$gte'] <= match.timestamp < timestamp['$lt']]
+
+    def get_crawl_states(self, urls: list[str]) -> dict[str, dict]:
+        return self.states
+
+    def crawl(self, urls: list[str], full_season: bool = False):
+        (self.full_season_crawls if full_season else self.crawls).append(urls)
+        self.states[URL]['crawled_at'] = NOW
+        if full_season:
+            self.states[URL]['discovered_at'] = NOW
+
+
+def make_scheduler(kickoffs: list[datetime], crawled_at: datetime | None, full_season_jobdir: str = '/nonexistent') -> RefreshScheduler:
+    db_proxy = FakeDatabaseProxy(kickoffs, crawled_at)
+    return RefreshScheduler(db_proxy, urls=[URL], crawl=db_proxy.crawl, full_season_jobdir=full_season_jobdir)
+
+
+def test_never_crawled_pages_are_due():
+    scheduler = make_scheduler([], None)
+    assert scheduler.next_refresh(None, NOW) == NOW
+
+
+def test_refresh_interval_depends_on_next_kickoff():
+    crawled_at = NOW - timedelta(minutes=30)
+    far = make_scheduler([NOW + timedelta(days=5)], crawled_at)
+    close = make_scheduler([NOW + timedelta(hours=5)], crawled_at)
+
+    assert far.next_refresh(far.db_proxy.states[URL], NOW) == crawled_at + RefreshScheduler.DEFAULT_INTERVAL
+    assert close.next_refresh(close.db_proxy.states[URL], NOW) == crawled_at + RefreshScheduler.CLOSE_TO_KICKOFF_INTERVAL
+
+
+def test_results_are_refreshed_after_full_time():
+    kickoff = NOW - timedelta(hours=3)
+    scheduler = make_scheduler([kickoff], NOW - timedelta(hours=1, minutes=30))
+
+    next_run = scheduler.run_pending(NOW)
+    assert scheduler.db_proxy.crawls == [[URL]]
+    assert next_run == NOW + RefreshScheduler.DEFAULT_INTERVAL
+
+
+def test_the_whole_season_is_crawled_every_full_season_interval():
+    scheduler = make_scheduler([], NOW - RefreshScheduler.FULL_SEASON_INTERVAL - timedelta(hours=1))
+
+    next_run = scheduler.run_pending(NOW)
+    assert scheduler.db_proxy.full_season_crawls == [[URL]]
+    # the full-season crawl has refreshed the page as well
+    assert scheduler.db_proxy.crawls == []
+    assert next_run == NOW + RefreshScheduler.DEFAULT_INTERVAL
+
+    scheduler.run_pending(NOW + timedelta(days=1))
+    assert scheduler.db_proxy.full_season_crawls == [[URL]]
+
+
+def test_an_interrupted_full_season_crawl_is_resumed(tmp_path):
+    crawled_at = NOW - timedelta(minutes=30)
+    scheduler = make_scheduler([], crawled_at, full_season_jobdir=str(tmp_path))
+    assert scheduler.next_full_season_crawl(scheduler.db_proxy.states, NOW) == NOW
+
+    scheduler.full_season_jobdir = str(tmp_path / 'full-season')
+    assert scheduler.next_full_season_crawl(scheduler.db_proxy.states, NOW) == crawled_at + RefreshScheduler.FULL_SEASON_INTERVAL
@@ -0,0 +1,34 @@
+from matchday.planner import Planner
+from matchday.tests.test_planner import DATE, SEASON, FakeDatabaseProxy, MatrixRouteProxy, make_match
+from interfaces.routes import TensorRouteProxy
+from scheduler.travel_times import build_season_tensor, season_stadiums
+
+
+class DictDatabaseProxy(FakeDatabaseProxy):
+    def get_matches(self, season: str, as_dict: bool = False, **kwargs):
+        matches = super().get_matches(season, **kwargs)
+        return [vars(match) for match in matches] if as_dict else matches
+
+
+def test_graphs_of_the_season_need_no_routing_calls(tmp_path):
+    matches = [
+        make_match('A', 'B', 10, (41.0, 2.0)),
+        make_match('C', 'D', 10, (42.0, 2.0)),
+        make_match('E', 'F', 13, (41.00001, 2.0)),
+        make_match('G', 'H', 16, (41.5, 2.0)),
+        make_match('I', 'J', 18, None),
+    ]
+    db_proxy = DictDatabaseProxy(matches)
+    assert season_stadiums(db_proxy, SEASON) == [(41.0, 2.0), (41.5, 2.0), (42.0, 2.0)]
+
+    build_season_tensor(db_proxy, MatrixRouteProxy(), SEASON, hour_step=24, path=str(tmp_path / 'tensor'))
+    fallback = MatrixRouteProxy()
+    reachable = [match for match in matches if match.latlon is not None]
+    planner = Planner(
+        db_proxy=db_proxy, routes_proxy=TensorRouteProxy(str(tmp_path / 'tensor'), fallback),
+        matches=reachable, date=DATE, season=SEASON)
+    live_planner = Planner(
+        db_proxy=FakeDatabaseProxy(reachable), routes_proxy=MatrixRouteProxy(), matches=reachable, date=DATE, season=SEASON)
+
+    assert fallback.calls == 0
+    assert dict(planner.graph.edges) == dict(live_planner.graph.edges)
@@ -0,0 +1,53 @@
+"""Builds the stadium x stadium x hour of the week travel time tensor of a season, read by TensorRouteProxy.
+
+    python -m scheduler.travel_times [--season SEASON] [--hour-step HOURS] [--week DD-MM-YYYY]
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime
+import logging
+
+from interfaces.database import AbstractDatabaseProxy, MongoDBDatabaseProxy
+from interfaces.routes import AbstractRouteProxy, CachedRouteProxy, OpenRouteServiceProxy, TensorRouteProxy
+from interfaces.routes.tensor_proxy import build_travel_time_tensor
+from matchday import Matchday
+
+logger = logging.getLogger(__name__)
+
+
+def season_stadiums(db_proxy: AbstractDatabaseProxy, season: str) -> list[tuple[float, float]]:
+    """Returns the distinct locations of the matches of a season, rounded as TensorRouteProxy looks them up."""
+
+    precision = TensorRouteProxy.COORDINATES_PRECISION
+    return sorted({
+        (round(match['latlon'][0], precision), round(match['latlon'][1], precision))
+        for match in db_proxy.get_matches(season=season, as_dict=True)
+        if match.get('latlon') is not None})
+
+
+def build_season_tensor(db_proxy: AbstractDatabaseProxy, routes_proxy: AbstractRouteProxy, season: str,
+    hour_step: int = 1, week: datetime | None = None, path: str | None = None):
+    """Builds the tensor of the stadiums of a season, at TensorRouteProxy.season_path(season) unless path is given."""
+
+    stadiums = season_stadiums(db_proxy, season)
+    logger.info(f'[build_season_tensor] {len(stadiums)} stadiums in {season}')
+    build_travel_time_tensor(path or TensorRouteProxy.season_path(season), stadiums, routes_proxy, week, hour_step)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--season', default=Matchday.season)
+    # a routes proxy that ignores the departure time gets a single profile whatever the hour step
+    parser.add_argument('--hour-step', type=int, default=1)
+    parser.add_argument('--week', type=lambda week: datetime.strptime(week, '%d-%m-%Y'), default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO)
+    build_season_tensor(
+        MongoDBDatabaseProxy(), CachedRouteProxy(OpenRouteServiceProxy()), args.season, args.hour_step, args.week)
+
+
+if __name__ == '__main__':
+    main()
@@ -31,3 +31,10 @@ class Match:
 
     def __str__(self) -> str:
         return self.__repr__()
+
+
+@dataclass
+class PageCrawlState:
+    """State of the crawl of a results page, yielded after its matches."""
+    url: str
+    state: dict
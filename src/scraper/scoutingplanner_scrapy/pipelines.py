@@ -4,35 +4,122 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
-# useful for handling different item types with a single interface
-from pymongo import MongoClient
+from time import monotonic
+from twisted.internet import defer, task, threads
+import logging
 
-from interfaces.database import MongoDBDatabaseProxy
+from interfaces.database import AbstractDatabaseProxy, MongoDBDatabaseProxy
+from scraper.scoutingplanner_scrapy.items import PageCrawlState
+
+logger = logging.getLogger(__name__)
 
 class MatchesPipeline:
+    """Buffers the scraped matches and upserts them in bulk when the buffer holds buffer_size items, when its oldest
+    item is flush_interval seconds old and when the spider closes. The writes run in the reactor thread pool, so the
+    crawl never waits for the database.
+
+    The flushes run one after another, in the order of the items, and the crawl states of the pages are saved in the
+    same flush, after the matches that precede them. Once the matches of a flush could not be written no more crawl
+    states are saved, so a page is never marked as crawled if its matches, or earlier ones, are missing."""
+
+    def __init__(self, stats, buffer_size, flush_interval, db_proxy: AbstractDatabaseProxy | None = None, clock=None):
+        self.stats = stats
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.db_proxy = db_proxy
+        self.clock = clock
 
-    def __init__(self, mongo_uri, mongo_db, mongo_certificate_path):
-        self.mongo_uri = mongo_uri
-        self.mongo_db = mongo_db
-        self.mongo_certificate_path = mongo_certificate_path
+        self.buffer = []
+        self.crawl_states = {}
+        self.buffered_at = None
+        self.pending_flushes = set()
+        self.flush_lock = defer.DeferredLock()
+        self.write_failed = False
+        self.written_items = 0
+        self.flushes = 0
+        self.total_flush_latency = 0.0
 
     @classmethod
     def from_crawler(cls, crawler):
         return cls(
-            mongo_uri=crawler.settings.get('MONGO_URI'),
-            mongo_db=crawler.settings.get('MONGO_DB', 'matches'),
-            mongo_certificate_path=crawler.settings.get('MONGO_CERTIFICATE_PATH')
+            stats=crawler.stats,
+            buffer_size=crawler.settings.getint('MATCHES_PIPELINE_BUFFER_SIZE', 500),
+            flush_interval=crawler.settings.getfloat('MATCHES_PIPELINE_FLUSH_INTERVAL', 5.0)
         )
 
     def open_spider(self, spider):
-        self.client = MongoClient(self.mongo_uri,
-                     tls=True,
-                     tlsCertificateKeyFile=self.mongo_certificate_path)
-        self.db = self.client[self.mongo_db]
+        self.db_proxy = self.db_proxy or MongoDBDatabaseProxy()
+        self.opened_at = monotonic()
+        self.age_check = task.LoopingCall(self._flush_if_old)
+        if self.clock is not None:
+            self.age_check.clock = self.clock
+        self.age_check.start(self.flush_interval, now=False)
 
     def close_spider(self, spider):
-        self.client.close()
+        if self.age_check.running:
+            self.age_check.stop()
+        self.flush()
+        return defer.DeferredList(list(self.pending_flushes))
 
     def process_item(self, item, spider):
-        MongoDBDatabaseProxy().save_match(item)
+        if not self.buffer and not self.crawl_states:
+            self.buffered_at = monotonic()
+        if isinstance(item, PageCrawlState):
+            self.crawl_states[item.url] = item.state
+        else:
+            self.buffer.append(item)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
         return item
+
+    def flush(self):
+        """Writes the buffered items in a worker thread, once the previous flushes have finished."""
+        if not self.buffer and not self.crawl_states:
+            return
+        items, self.buffer = self.buffer, []
+        crawl_states, self.crawl_states = self.crawl_states, {}
+
+        started_at = monotonic()
+        flush = self.flush_lock.run(threads.deferToThread, self._write, items, crawl_states)
+        self.pending_flushes.add(flush)
+        flush.addCallbacks(self._flushed, self._flush_failed, callbackArgs=(items, started_at), errbackArgs=(items,))
+        flush.addBoth(lambda _: self.pending_flushes.discard(flush))
+
+    def _write(self, items, crawl_states) -> int:
+        """Saves the items and the crawl states, returning the number of crawl states skipped after a failed write."""
+        # write_failed is set in the worker thread, before the next flush can start
+        try:
+            if items:
+                self.db_proxy.save_matches(items)
+        except Exception:
+            self.write_failed = True
+            raise
+        if self.write_failed:
+            return len(crawl_states)
+        if crawl_states:
+            self.db_proxy.save_crawl_states(crawl_states)
+        return 0
+
+    def _flush_if_old(self):
+        if (self.buffer or self.crawl_states) and monotonic() - self.buffered_at >= self.flush_interval:
+            self.flush()
+
+    def _flushed(self, skipped_crawl_states, items, started_at):
+        if skipped_crawl_states:
+            self.stats.inc_value('matches_pipeline/skipped_crawl_states', skipped_crawl_states)
+            logger.warning(f'[MatchesPipeline] not saving {skipped_crawl_states} crawl states after a failed write')
+        latency = monotonic() - started_at
+        self.flushes += 1
+        self.written_items += len(items)
+        self.total_flush_latency += latency
+
+        self.stats.inc_value('matches_pipeline/flushes')
+        self.stats.inc_value('matches_pipeline/items', len(items))
+        self.stats.max_value('matches_pipeline/flush_latency_max', latency)
+        self.stats.set_value('matches_pipeline/flush_latency_avg', self.total_flush_latency / self.flushes)
+        self.stats.set_value(
+            'matches_pipeline/items_per_sec', self.written_items / max(monotonic() - self.opened_at, 1e-9))
+
+    def _flush_failed(self, failure, items):
+        self.stats.inc_value('matches_pipeline/failed_items', len(items))
+        logger.error(f'[MatchesPipeline] could not save {len(items)} matches: {failure.getErrorMessage()}')
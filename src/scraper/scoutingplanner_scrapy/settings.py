@@ -1,5 +1,6 @@
-from os.path import join, dirname, abspath
-import json
+from os.path import join
+
+from interfaces.config import ROOT_DIR, load_config
 
 # Scrapy settings for scoutingplanner_scrapy project
 #
@@ -25,14 +26,14 @@ NEWSPIDER_MODULE = "scoutingplanner_scrapy.spiders"
 ROBOTSTXT_OBEY = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
+CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -73,14 +74,14 @@ ITEM_PIPELINES = {
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 0.5
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 10
 # The average number of requests Scrapy should be sending in parallel to
 # each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+AUTOTHROTTLE_TARGET_CONCURRENCY = 8.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
@@ -98,8 +99,18 @@ TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
 
 # MongoDB settings
-root_dir = dirname(dirname(dirname(dirname(abspath(__file__)))))
-with open(join(root_dir, "etc/config.json"), "r") as f:
-    config = json.load(f)
-    MONGO_URI = config["mongoDB"]["uri"]
-    MONGO_CERTIFICATE_PATH = join(root_dir, config["mongoDB"]["certificate_path"])
+config = load_config()
+MONGO_URI = config["mongoDB"]["uri"]
+MONGO_CERTIFICATE_PATH = join(ROOT_DIR, config["mongoDB"]["certificate_path"])
+
+# MatchesPipeline settings
+MATCHES_PIPELINE_BUFFER_SIZE = 500 # items written per bulk upsert
+MATCHES_PIPELINE_FLUSH_INTERVAL = 5.0 # seconds an item may wait in the buffer
+
+# Incremental crawl: conditional requests and skipping of the rows that have not changed since the last crawl
+INCREMENTAL_CRAWL = True
+
+# Full-season crawl: follow every group and jornada of the dropdowns of the start pages, and every competition too
+# with FULL_SEASON_ALL_COMPETITIONS. run_matches_spider(full_season=True) sets a JOBDIR so that it can be resumed.
+FULL_SEASON_CRAWL = False
+FULL_SEASON_ALL_COMPETITIONS = False
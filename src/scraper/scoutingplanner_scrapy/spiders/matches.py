@@ -1,8 +1,41 @@
+from scrapy import Request
 from scrapy.spiders import Spider
+from twisted.internet import threads
+from datetime import datetime
+import hashlib
+import json
+from lxml import etree
 
-from scraper.scoutingplanner_scrapy.items import Match
+from interfaces.database import AbstractDatabaseProxy, MongoDBDatabaseProxy
+from scraper.scoutingplanner_scrapy.items import Match, PageCrawlState
 from scraper.scoutingplanner_scrapy.utils import *
 
+# the XPath expressions are compiled once, and the ones of a match are evaluated on its cells rather than on the page
+SEASON_XPATH = etree.XPath('//div[@class="col-md-12 p-0 p-impr d-n_impr"]/p[@class="bigtitle fs-18_ml p-10 m-0 mt-30"]/span[@class="apex"]/text()')
+COMPETITION_XPATH = etree.XPath('//select[@id="select_competi"]/option[@selected]/text()')
+GROUP_XPATH = etree.XPath('//select[@id="select_grupo"]/option[@selected]/text()')
+MATCHDAY_XPATH = etree.XPath('//select[@id="select_jornada"]/option[@selected]/text()')
+RESULTS_TABLE_XPATH = etree.XPath('//table[@class="uppercase w-100 fs-12_tp fs-11_ml table_resultats"]')
+
+RESULT_CELL = 'p-5 resultats-w-resultat tc'
+HOME_TEAM_CELL = 'p-5 resultats-w-equip tr'
+AWAY_TEAM_CELL = 'p-5 resultats-w-equip tl'
+STADIUM_CELL = 'p-5 resultats-w-text2 tr fs-9 lh-20 d-n_ml'
+MAPS_CELL = 'p-0 resultats-w-text1 tc fs-9 capitalize ml-20 d-n_ml'
+
+FINISHED_XPATH = etree.XPath('a/div[@class="tc fs-9 white bg-darkgrey mb-2 lh-data"]/text()')
+RESULT_XPATH = etree.XPath('a/div[@class="tc fs-17 white bg-darkgrey p-r"]/text()')
+DATE_XPATH = etree.XPath('normalize-space(a/div[@class="tc fs-9 white bg-grey mb-2 lh-data"]/text())')
+TIME_XPATH = etree.XPath('normalize-space(a/div[@class="tc fs-17 white bg-grey"]/text())')
+LINK_TEXT_XPATH = etree.XPath('a/text()')
+LINK_HREF_XPATH = etree.XPath('a/@href')
+
+def _cell_xpath(xpath: etree.XPath, cell) -> list:
+    return xpath(cell) if cell is not None else []
+
+def _first(results: list) -> str | None:
+    return str(results[0]) if results else None
+
 class MatchesSpider(Spider):
     name = 'matches'
     start_urls = ['https://www.fcf.cat/resultats/2223/futbol-11/divisio-honor-cadet/grup-1',
@@ -10,48 +43,150 @@ class MatchesSpider(Spider):
                   'https://www.fcf.cat/resultats/2223/futbol-11/tercera-federacio/grup-v',
                   'https://www.fcf.cat/resultats/2223/futbol-11/segona-federacio/grup-3',
                   'https://www.fcf.cat/resultats/2223/futbol-11/primera-federacio/grup-2']
-    items = []
+    handle_httpstatus_list = [304]
+    db_proxy: AbstractDatabaseProxy | None = None
+
+    def start_requests(self):
+        """With INCREMENTAL_CRAWL, pages are requested conditionally on the validators of their last crawl. With
+        FULL_SEASON_CRAWL, the start pages are always downloaded, as every group and jornada is discovered from them.
+
+        The crawl states are read in a single query before the first request, as the jornadas are only discovered
+        during the crawl and reading their states then would block the reactor, so a full season crawl reads them
+        all."""
+        self.incremental = self.settings.getbool('INCREMENTAL_CRAWL')
+        self.full_season = self.settings.getbool('FULL_SEASON_CRAWL')
+        self.not_modified = {}
+        self.crawl_states = {}
+        if self.incremental:
+            self.db_proxy = self.db_proxy or MongoDBDatabaseProxy()
+            self.crawl_states = self.db_proxy.get_crawl_states(None if self.full_season else self.start_urls)
+
+        for url in self.start_urls:
+            yield self.page_request(url, discover=self.full_season, dont_filter=True)
+
+    def page_request(self, url: str, discover: bool = False, dont_filter: bool = False) -> Request:
+        """Returns the request of a results page, conditional unless its dropdowns have to be followed."""
+        state = self.crawl_states.get(url, {})
+        headers = {}
+        if not discover and state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if not discover and state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return Request(url, headers=headers, meta={'discover': discover}, dont_filter=dont_filter)
+
+    def follow_season(self, response):
+        """Yields the requests of the other groups of the competition, and of the other competitions with
+        FULL_SEASON_ALL_COMPETITIONS, which are followed in turn, and of every jornada of the group."""
+        selects = ['select_grupo'] + (['select_competi'] if self.settings.getbool('FULL_SEASON_ALL_COMPETITIONS') else [])
+        # the page lists itself among the groups, and was requested without the duplicates filter
+        discover_urls = [url for url in self._select_urls(response, *selects) if url != response.url]
+        jornada_urls = self._select_urls(response, 'select_jornada')
+
+        for url in discover_urls:
+            yield self.page_request(url, discover=True)
+        for url in jornada_urls:
+            yield self.page_request(url)
+
+    def _select_urls(self, response, *select_ids: str) -> list[str]:
+        urls = (
+            response.urljoin(value.strip())
+            for select_id in select_ids
+            for value in response.xpath(f'//select[@id="{select_id}"]/option/@value').getall())
+        return list(dict.fromkeys(url for url in urls if '/resultats/' in url))
+
+    def row_hash(self, match_dict: dict) -> str:
+        return hashlib.sha1(json.dumps(match_dict, sort_keys=True, default=str).encode()).hexdigest()
+
+    def parse_row(self, match) -> dict:
+        """Returns the fields of the match in a results table, looking up its cells in a single pass over the row."""
+        cells = {}
+        for cell in match.iter('td'):
+            cells.setdefault(cell.get('class'), cell)
+        result_cell = cells.get(RESULT_CELL)
+
+        match_dict = {'finished': bool(_first(_cell_xpath(FINISHED_XPATH, result_cell)))}
+        if match_dict['finished']:
+            # Result
+            result = _first(_cell_xpath(RESULT_XPATH, result_cell))
+            if result is not None:
+                match_dict['home_goals'], match_dict['away_goals'] = parse_result(result)
+        else:
+            # Temporal data
+            date = DATE_XPATH(result_cell) if result_cell is not None else ''
+            time = TIME_XPATH(result_cell) if result_cell is not None else ''
+            parsed_timestamp = parse_timestamp(date, time)
+            if parsed_timestamp is not None: # Parsing has been successful
+                match_dict['timestamp'] = parsed_timestamp
+
+        # Teams
+        match_dict['home_team'] = _first(_cell_xpath(LINK_TEXT_XPATH, cells.get(HOME_TEAM_CELL)))
+        match_dict['away_team'] = _first(_cell_xpath(LINK_TEXT_XPATH, cells.get(AWAY_TEAM_CELL)))
+
+        # Location data
+        stadium = _first(_cell_xpath(LINK_TEXT_XPATH, cells.get(STADIUM_CELL)))
+        if stadium is not None:
+            match_dict['stadium'] = stadium
+        google_maps_link = _first(_cell_xpath(LINK_HREF_XPATH, cells.get(MAPS_CELL)))
+        if google_maps_link is not None:
+            match_dict['latlon'] = parse_google_maps_link(google_maps_link)
+        return match_dict
 
     def parse(self, response, **kwargs):
-        season = response.xpath('//div[@class="col-md-12 p-0 p-impr d-n_impr"]/p[@class="bigtitle fs-18_ml p-10 m-0 mt-30"]/span[@class="apex"]/text()').get()
-        competition = response.xpath('//select[@id="select_competi"]/option[@selected]/text()').get()
-        group = response.xpath('//select[@id="select_grupo"]/option[@selected]/text()').get()
-        matchday = int(response.xpath('//select[@id="select_jornada"]/option[@selected]/text()').get()[-2:])
+        url = response.meta.get('redirect_urls', [response.url])[0]
+        # only the previous states of the pages that have not been parsed yet are kept in memory
+        previous_state = self.crawl_states.pop(url, {})
+        if response.status == 304:
+            self.crawler.stats.inc_value('incremental/pages_not_modified')
+            # nothing but the crawl time changes, and it is saved with the others when the spider closes
+            self.not_modified[url] = datetime.now()
+            return
+        previous_row_hashes = set(previous_state.get('row_hashes', []))
+        row_hashes = []
+
+        root = response.selector.root
+        season = _first(SEASON_XPATH(root))
+        competition = _first(COMPETITION_XPATH(root))
+        group = _first(GROUP_XPATH(root))
+        matchday = int(_first(MATCHDAY_XPATH(root))[-2:])
 
-        for match in response.xpath('//table[@class="uppercase w-100 fs-12_tp fs-11_ml table_resultats"]'):
+        for match in RESULTS_TABLE_XPATH(root):
             match_dict = {
                 'season': season,
                 'competition': competition,
                 'group': group,
                 'matchday': matchday
             }
-            match_dict['finished'] = bool(match.xpath('.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-9 white bg-darkgrey mb-2 lh-data"]/text()').get())
-
-            if match_dict['finished']:
-                # Result
-                result = match.xpath('.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-17 white bg-darkgrey p-r"]/text()').get()
-                if result is not None:
-                    match_dict['home_goals'], match_dict['away_goals'] = parse_result(result)
-            else:
-                # Temporal data
-                date = match.xpath('normalize-space(.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-9 white bg-grey mb-2 lh-data"]/text())').get()
-                time = match.xpath('normalize-space(.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-17 white bg-grey"]/text())').get()
-                if date is not None and time is not None:
-                    parsed_timestamp = parse_timestamp(date, time)
-                    if parsed_timestamp is not None: # Parsing has been successful
-                        match_dict['timestamp'] = parsed_timestamp
-
-            # Teams
-            match_dict['home_team'] = match.xpath('.//td[@class="p-5 resultats-w-equip tr"]/a/text()').get()
-            match_dict['away_team'] = match.xpath('.//td[@class="p-5 resultats-w-equip tl"]/a/text()').get()
-            
-            # Location data
-            stadium = match.xpath('.//td[@class="p-5 resultats-w-text2 tr fs-9 lh-20 d-n_ml"]/a/text()').get()
-            if stadium is not None:
-                match_dict['stadium'] = stadium
-            google_maps_link = match.xpath('.//td[@class="p-0 resultats-w-text1 tc fs-9 capitalize ml-20 d-n_ml"]/a/@href').get()
-            if google_maps_link is not None:
-                match_dict['latlon'] = parse_google_maps_link(google_maps_link)
-
-            self.items.append(match_dict)
-            yield Match(**match_dict)
\ No newline at end of file
+            match_dict.update(self.parse_row(match))
+
+            row_hashes.append(self.row_hash(match_dict))
+            if row_hashes[-1] in previous_row_hashes:
+                self.crawler.stats.inc_value('incremental/rows_unchanged')
+                continue
+
+            self.crawler.stats.inc_value(f'matches/competition/{competition}')
+            yield Match(**match_dict)
+
+        state = {
+            'crawled_at': datetime.now(),
+            'season': season,
+            'competition': competition,
+            'group': group,
+            'etag': response.headers.get('ETag', b'').decode() or None,
+            'last_modified': response.headers.get('Last-Modified', b'').decode() or None,
+            'row_hashes': row_hashes
+        }
+        # the stored changed_at is kept when the rows are the same, so it only moves when the matches do
+        if row_hashes != previous_state.get('row_hashes'):
+            state['changed_at'] = state['crawled_at']
+        if response.meta.get('discover'):
+            state['discovered_at'] = state['crawled_at']
+        yield PageCrawlState(url, state)
+
+        if response.meta.get('discover'):
+            yield from self.follow_season(response)
+
+    def closed(self, reason):
+        """Saves the crawl time of the pages that were not modified in a single write, in a worker thread."""
+        if self.not_modified:
+            states = {url: {'crawled_at': crawled_at} for url, crawled_at in self.not_modified.items()}
+            return threads.deferToThread(self.db_proxy.save_crawl_states, states)
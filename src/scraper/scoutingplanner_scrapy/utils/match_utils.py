@@ -1,6 +1,8 @@
 from datetime import datetime
 import re
 
+GOOGLE_MAPS_LOCATION = re.compile(r"loc:(\-?\d+\.\d+)\+(\-?\d+\.\d+)")
+
 def parse_timestamp(date: str, time: str) -> datetime:
     """Parse a timestamp from the website.
     
@@ -32,8 +34,7 @@ def parse_google_maps_link(link: str) -> tuple[float, float]:
     if not link.startswith('http://maps.google.com/maps') or not 'loc:' in link:
         raise ValueError("Invalid Google Maps link")
     
-    pattern = r"loc:(\-?\d+\.\d+)\+(\-?\d+\.\d+)"
-    match = re.search(pattern, link)
+    match = GOOGLE_MAPS_LOCATION.search(link)
     if match:
         latitude = match.group(1)
         longitude = match.group(2)
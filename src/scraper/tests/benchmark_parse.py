@@ -0,0 +1,73 @@
+"""Replays the fixture corpus through MatchesSpider.parse, and through the reference parse it replaced, without network
+access, and reports rows per second, time per page and allocations per page.
+
+    python -m scraper.tests.benchmark_parse [--repeat N]
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+import tracemalloc
+from scrapy.http import HtmlResponse
+
+from scraper.scoutingplanner_scrapy.items import Match
+from scraper.tests.helpers import FIXTURES, fixture_response, make_spider, reference_parse
+
+
+def benchmark(parse, responses: list[HtmlResponse], repeat: int) -> dict:
+    """Parses every response repeat times with parse, which returns the matches of a response."""
+    n_rows = 0
+    started_at = perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            n_rows += len(parse(response))
+    elapsed = perf_counter() - started_at
+
+    tracemalloc.start()
+    for response in responses:
+        parse(response)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'rows/s': n_rows / elapsed,
+        'ms/page': 1000 * elapsed / (repeat * len(responses)),
+        'peak KiB/page': allocated / len(responses) / 1024
+    }
+
+
+def build_documents(repeat: int) -> float:
+    """Returns the ms per page spent building the documents of the responses, which is the same for both parses."""
+    started_at = perf_counter()
+    for _ in range(repeat):
+        for path in FIXTURES:
+            fixture_response(path).selector
+    return 1000 * (perf_counter() - started_at) / (repeat * len(FIXTURES))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    spider = make_spider()
+    # the documents are built once, so that only the extraction of the matches is measured
+    responses = [fixture_response(path) for path in FIXTURES]
+    for response in responses:
+        response.selector
+    results = {
+        'reference': benchmark(reference_parse, responses, args.repeat),
+        'spider': benchmark(
+            lambda response: [item for item in spider.parse(response) if isinstance(item, Match)],
+            responses, args.repeat)
+    }
+
+    print(f'{len(FIXTURES)} pages x {args.repeat}')
+    print(f'{"":<10}' + ''.join(f'{metric:>16}' for metric in results['reference']))
+    for name, metrics in results.items():
+        print(f'{name:<10}' + ''.join(f'{value:>16.2f}' for value in metrics.values()))
+    print(f'document building: {build_documents(args.repeat):.2f} ms/page')
+    print(f'speedup: {results["spider"]["rows/s"] / results["reference"]["rows/s"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Builders of the responses and the spider shared by the tests and the benchmarks of the scraper."""
+
+from glob import glob
+from os.path import join, dirname, basename
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from scraper.scoutingplanner_scrapy.items import Match
+from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
+from scraper.scoutingplanner_scrapy.utils import parse_result, parse_timestamp, parse_google_maps_link
+
+
+FIXTURES = sorted(glob(join(dirname(__file__), 'fixtures', '*.html')))
+
+
+def fixture_response(path: str, url: str | None = None) -> HtmlResponse:
+    """Returns the response of a saved results page, served from the url of its start page by default."""
+    slug = basename(path).rsplit('_', 1)[0].replace('_', '/')
+    url = url or f'https://www.fcf.cat/resultats/2223/futbol-11/{slug}'
+    with open(path, 'rb') as f:
+        body = f.read()
+    return HtmlResponse(url, body=body, encoding='utf-8', request=Request(url, meta={'discover': False}))
+
+
+def reference_parse(response: HtmlResponse) -> list[Match]:
+    """Previous implementation of MatchesSpider.parse, with an XPath query over the whole row for every field, kept as
+    a reference."""
+
+    season = response.xpath('//div[@class="col-md-12 p-0 p-impr d-n_impr"]/p[@class="bigtitle fs-18_ml p-10 m-0 mt-30"]/span[@class="apex"]/text()').get()
+    competition = response.xpath('//select[@id="select_competi"]/option[@selected]/text()').get()
+    group = response.xpath('//select[@id="select_grupo"]/option[@selected]/text()').get()
+    matchday = int(response.xpath('//select[@id="select_jornada"]/option[@selected]/text()').get()[-2:])
+
+    matches = []
+    for match in response.xpath('//table[@class="uppercase w-100 fs-12_tp fs-11_ml table_resultats"]'):
+        match_dict = {'season': season, 'competition': competition, 'group': group, 'matchday': matchday}
+        match_dict['finished'] = bool(match.xpath('.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-9 white bg-darkgrey mb-2 lh-data"]/text()').get())
+        if match_dict['finished']:
+            result = match.xpath('.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-17 white bg-darkgrey p-r"]/text()').get()
+            if result is not None:
+                match_dict['home_goals'], match_dict['away_goals'] = parse_result(result)
+        else:
+            date = match.xpath('normalize-space(.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-9 white bg-grey mb-2 lh-data"]/text())').get()
+            time = match.xpath('normalize-space(.//td[@class="p-5 resultats-w-resultat tc"]/a/div[@class="tc fs-17 white bg-grey"]/text())').get()
+            if date is not None and time is not None:
+                parsed_timestamp = parse_timestamp(date, time)
+                if parsed_timestamp is not None:
+                    match_dict['timestamp'] = parsed_timestamp
+        match_dict['home_team'] = match.xpath('.//td[@class="p-5 resultats-w-equip tr"]/a/text()').get()
+        match_dict['away_team'] = match.xpath('.//td[@class="p-5 resultats-w-equip tl"]/a/text()').get()
+        stadium = match.xpath('.//td[@class="p-5 resultats-w-text2 tr fs-9 lh-20 d-n_ml"]/a/text()').get()
+        if stadium is not None:
+            match_dict['stadium'] = stadium
+        google_maps_link = match.xpath('.//td[@class="p-0 resultats-w-text1 tc fs-9 capitalize ml-20 d-n_ml"]/a/@href').get()
+        if google_maps_link is not None:
+            match_dict['latlon'] = parse_google_maps_link(google_maps_link)
+        matches.append(Match(**match_dict))
+    return matches
+
+
+def make_spider(**settings) -> MatchesSpider:
+    crawler = get_crawler(MatchesSpider, {'INCREMENTAL_CRAWL': False, **settings})
+    spider = crawler._create_spider()
+    crawler.stats.open_spider()
+    spider.incremental = False
+    spider.full_season = False
+    spider.crawl_states = {}
+    spider.not_modified = {}
+    return spider
@@ -0,0 +1,143 @@
+from os.path import join, dirname, abspath
+import subprocess
+import sys
+from scrapy.http import HtmlResponse, Request
+from twisted.internet import threads
+
+from scraper.scoutingplanner_scrapy.items import Match, PageCrawlState
+from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
+from scraper.tests.helpers import FIXTURES, fixture_response, make_spider, reference_parse
+
+
+class FakeDatabaseProxy:
+    def __init__(self, states: dict[str, dict]):
+        self.states = states
+        self.reads = []
+        self.writes = []
+
+    def get_crawl_states(self, urls: list[str] | None = None) -> dict[str, dict]:
+        self.reads.append(urls)
+        return {url: state for url, state in self.states.items() if urls is None or url in urls}
+
+    def save_crawl_states(self, states: dict[str, dict]):
+        self.writes.append(states)
+
+
+def test_parse_streams_matches_and_page_state():
+    spider = make_spider()
+    items = list(spider.parse(fixture_response(FIXTURES[0])))
+
+    assert all(isinstance(item, Match) for item in items[:-1])
+    assert isinstance(items[-1], PageCrawlState)
+    assert len(items[-1].state['row_hashes']) == len(items) - 1 == 9
+    assert not hasattr(MatchesSpider, 'items')
+    competition = items[0].competition
+    assert spider.crawler.stats.get_value(f'matches/competition/{competition}') == 9
+
+
+def test_page_state_only_records_a_change_when_the_rows_change():
+    spider = make_spider()
+    response = fixture_response(FIXTURES[0])
+    state = list(spider.parse(response))[-1].state
+    assert state['changed_at'] == state['crawled_at']
+
+    spider.crawl_states = {response.url: {'row_hashes': state['row_hashes'], 'changed_at': state['changed_at']}}
+    items = list(spider.parse(response))
+    assert len(items) == 1 and 'changed_at' not in items[0].state
+
+    spider.crawl_states = {response.url: {'row_hashes': state['row_hashes'][1:]}}
+    assert 'changed_at' in list(spider.parse(response))[-1].state
+
+    not_modified = HtmlResponse(response.url, status=304, request=response.request)
+    assert list(spider.parse(not_modified)) == []
+    assert list(spider.not_modified) == [response.url]
+
+
+def test_incremental_crawl_reads_the_states_once_and_saves_the_not_modified_pages_at_close(monkeypatch):
+    jornada_url = f'{MatchesSpider.start_urls[0]}/jornada-2'
+    db_proxy = FakeDatabaseProxy({url: {'etag': f'"{url}"'} for url in (*MatchesSpider.start_urls, jornada_url)})
+    spider = make_spider(INCREMENTAL_CRAWL=True, FULL_SEASON_CRAWL=True)
+    spider.db_proxy = db_proxy
+    list(spider.start_requests())
+    # a full season crawl reads every state up front, so the jornadas it discovers are requested conditionally
+    assert db_proxy.reads == [None]
+    assert spider.page_request(jornada_url).headers['If-None-Match'] == f'"{jornada_url}"'.encode()
+
+    for url in MatchesSpider.start_urls:
+        assert list(spider.parse(HtmlResponse(url, status=304, request=Request(url)))) == []
+    assert db_proxy.writes == []
+
+    monkeypatch.setattr(threads, 'deferToThread', lambda f, *args: f(*args))
+    spider.closed('finished')
+    assert len(db_proxy.writes) == 1 and list(db_proxy.writes[0]) == MatchesSpider.start_urls
+    assert all(set(state) == {'crawled_at'} for state in db_proxy.writes[0].values())
+
+
+def test_full_season_crawl_follows_every_group_and_jornada():
+    spider = make_spider(FULL_SEASON_CRAWL=True)
+    response = fixture_response(FIXTURES[0])
+    response.request.meta['discover'] = True
+    items = list(spider.parse(response))
+
+    requests = [item for item in items if isinstance(item, Request)]
+    groups = [request.url for request in requests if request.meta['discover']]
+    jornadas = [request.url for request in requests if not request.meta['discover']]
+    assert groups == [f'{response.url[:-len("grup-1")]}{group}' for group in ('grup-2', 'grup-3', 'grup-v')]
+    assert len(jornadas) == 38 and all(url.startswith(f'{response.url}/jornada-') for url in jornadas)
+    assert 'discovered_at' in next(item for item in items if isinstance(item, PageCrawlState)).state
+
+    # the jornada pages are parsed without following their dropdowns again
+    jornada_response = fixture_response(FIXTURES[0], url=jornadas[0])
+    assert not any(isinstance(item, Request) for item in spider.parse(jornada_response))
+
+
+def test_full_season_crawl_follows_the_other_competitions_if_asked():
+    spider = make_spider(FULL_SEASON_CRAWL=True, FULL_SEASON_ALL_COMPETITIONS=True)
+    response = fixture_response(FIXTURES[0])
+    response.request.meta['discover'] = True
+
+    groups = {item.url for item in spider.parse(response) if isinstance(item, Request) and item.meta['discover']}
+    assert {fixture_response(path).url for path in FIXTURES[1:]} <= groups
+
+
+def test_start_requests_only_discover_in_a_full_season_crawl():
+    for full_season in (False, True):
+        spider = make_spider(FULL_SEASON_CRAWL=full_season)
+        requests = list(spider.start_requests())
+        assert [request.url for request in requests] == MatchesSpider.start_urls
+        assert all(request.meta['discover'] is full_season and request.dont_filter for request in requests)
+
+
+def test_parse_matches_reference_parse():
+    spider = make_spider()
+    for path in FIXTURES:
+        response = fixture_response(path)
+        matches = [item for item in spider.parse(response) if isinstance(item, Match)]
+        assert matches == reference_parse(response)
+        assert all(type(match.home_team) is str and type(match.stadium) in (str, type(None)) for match in matches)
+
+
+PEAK_RSS_SCRIPT = """
+import resource, sys
+from scraper.tests.helpers import FIXTURES, fixture_response, make_spider
+
+spider = make_spider()
+responses = [fixture_response(path) for path in FIXTURES]
+for i in range(int(sys.argv[1])):
+    for _ in spider.parse(responses[i % len(responses)]):
+        pass
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_rss_after(n_pages: int) -> int:
+    """Returns the peak resident set size in KiB of a fresh process that parses n_pages pages."""
+    output = subprocess.run(
+        [sys.executable, '-c', PEAK_RSS_SCRIPT, str(n_pages)],
+        cwd=join(dirname(abspath(__file__)), '../..'), capture_output=True, text=True, check=True).stdout
+    return int(output.split()[-1])
+
+
+def test_parse_peak_memory_does_not_grow_with_the_crawl():
+    # keeping the 9000 matches of 1000 pages would raise the peak by more than 6 MiB
+    assert peak_rss_after(1000) - peak_rss_after(len(FIXTURES)) < 3 * 1024
@@ -0,0 +1,153 @@
+from datetime import datetime
+from twisted.internet import defer, task
+import pytest
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scraper.scoutingplanner_scrapy import pipelines
+from scraper.scoutingplanner_scrapy.items import Match, PageCrawlState
+from scraper.scoutingplanner_scrapy.pipelines import MatchesPipeline
+from scraper.scoutingplanner_scrapy.spiders import MatchesSpider
+
+
+class FakeDatabaseProxy:
+    def __init__(self, failing_saves: int = 0):
+        self.failing_saves = failing_saves
+        self.matches = []
+        self.crawl_states = {}
+
+    def save_matches(self, matches):
+        if self.failing_saves:
+            self.failing_saves -= 1
+            raise ConnectionError('the database is down')
+        self.matches += matches
+
+    def save_crawl_states(self, states):
+        self.crawl_states.update(states)
+
+
+class ManualThreads:
+    """Stands in for the reactor thread pool, running every write when the test says so."""
+
+    def __init__(self):
+        self.writes = []
+
+    def deferToThread(self, f, *args):
+        deferred = defer.Deferred()
+        self.writes.append((deferred, f, args))
+        return deferred
+
+    def run_next(self):
+        deferred, f, args = self.writes.pop(0)
+        try:
+            result = f(*args)
+        except Exception as e:
+            deferred.errback(e)
+        else:
+            deferred.callback(result)
+
+
+def make_match(i: int) -> Match:
+    return Match(
+        season='TEMPORADA 2022-2023', competition='SEGONA FEDERACIÓ', group='GRUP 3', matchday=30,
+        home_team=f'H{i}', away_team=f'A{i}', finished=False, timestamp=datetime(2023, 5, 6, 12))
+
+
+def make_pipeline(db_proxy: FakeDatabaseProxy, buffer_size: int = 2) -> MatchesPipeline:
+    stats = MemoryStatsCollector(get_crawler(MatchesSpider))
+    return MatchesPipeline(stats, buffer_size=buffer_size, flush_interval=60.0, db_proxy=db_proxy)
+
+
+@pytest.fixture
+def manual_threads(monkeypatch) -> ManualThreads:
+    manual_threads = ManualThreads()
+    monkeypatch.setattr(pipelines, 'threads', manual_threads)
+    return manual_threads
+
+
+def test_flushes_run_one_after_another(manual_threads):
+    db_proxy = FakeDatabaseProxy()
+    pipeline = make_pipeline(db_proxy)
+    for i in range(4):
+        pipeline.process_item(make_match(i), None)
+        pipeline.process_item(PageCrawlState(f'page{i}', {'row_hashes': [i]}), None)
+
+    # the second flush only starts once the first one has finished
+    assert len(manual_threads.writes) == 1
+    manual_threads.run_next()
+    assert len(manual_threads.writes) == 1
+    manual_threads.run_next()
+    assert [match.home_team for match in db_proxy.matches] == ['H0', 'H1', 'H2', 'H3']
+    assert not pipeline.pending_flushes
+
+
+def test_crawl_states_are_not_saved_after_a_failed_write(manual_threads):
+    db_proxy = FakeDatabaseProxy(failing_saves=1)
+    pipeline = make_pipeline(db_proxy)
+    pipeline.process_item(make_match(0), None)
+    pipeline.process_item(PageCrawlState('page0', {'row_hashes': [0]}), None)
+    pipeline.process_item(make_match(1), None)
+    pipeline.process_item(PageCrawlState('page1', {'row_hashes': [1]}), None)
+    pipeline.process_item(make_match(2), None)
+    pipeline.process_item(make_match(3), None)
+
+    manual_threads.run_next()
+    manual_threads.run_next()
+    assert [match.home_team for match in db_proxy.matches] == ['H2', 'H3']
+    # the state of page1 was in the flush after the failed one, its matches may be missing too
+    assert db_proxy.crawl_states == {}
+    assert pipeline.stats.get_value('matches_pipeline/failed_items') == 2
+    assert pipeline.stats.get_value('matches_pipeline/skipped_crawl_states') == 1
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_buffer_is_flushed_when_full_old_or_closed(manual_threads, monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr(pipelines, 'monotonic', fake_time)
+    clock = task.Clock()
+    db_proxy = FakeDatabaseProxy()
+    pipeline = MatchesPipeline(
+        MemoryStatsCollector(get_crawler(MatchesSpider)), buffer_size=3, flush_interval=5.0, db_proxy=db_proxy, clock=clock)
+    pipeline.open_spider(None)
+
+    # full buffer
+    for i in range(3):
+        pipeline.process_item(make_match(i), None)
+    assert len(manual_threads.writes) == 1 and not pipeline.buffer
+    fake_time.now += 2.0
+    manual_threads.run_next()
+
+    # old buffer, checked every flush_interval
+    pipeline.process_item(make_match(3), None)
+    fake_time.now += 4.0
+    clock.advance(5.0)
+    assert not manual_threads.writes
+    fake_time.now += 1.0
+    clock.advance(5.0)
+    assert len(manual_threads.writes) == 1
+    manual_threads.run_next()
+
+    # closing spider
+    pipeline.process_item(make_match(4), None)
+    pipeline.process_item(PageCrawlState('page', {'row_hashes': []}), None)
+    closed = pipeline.close_spider(None)
+    assert not pipeline.age_check.running
+    manual_threads.run_next()
+    assert closed.called
+
+    assert [match.home_team for match in db_proxy.matches] == ['H0', 'H1', 'H2', 'H3', 'H4']
+    assert db_proxy.crawl_states == {'page': {'row_hashes': []}}
+    stats = pipeline.stats
+    assert stats.get_value('matches_pipeline/flushes') == 3
+    assert stats.get_value('matches_pipeline/items') == 5
+    assert stats.get_value('matches_pipeline/flush_latency_max') == 2.0
+    assert stats.get_value('matches_pipeline/flush_latency_avg') == pytest.approx(2.0 / 3)
+    assert stats.get_value('matches_pipeline/items_per_sec') == pytest.approx(5 / 7.0)
+    assert stats.get_value('matches_pipeline/failed_items') is None